@@ -0,0 +1,81 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEVERITY_LEVELS = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+INCIDENT_STATUSES = ('DETECTED', 'ANALYZING', 'RESOLVING', 'RESOLVED', 'FAILED')
+
+
+def upgrade() -> None:
+    # Databases bootstrapped with create_tables.py already have these tables
+    existing = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'incidents' not in existing:
+        op.create_table(
+            'incidents',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.Text()),
+            sa.Column('severity', sa.Enum(*SEVERITY_LEVELS, name='severitylevel')),
+            sa.Column('status', sa.Enum(*INCIDENT_STATUSES, name='incidentstatus')),
+            sa.Column('source', sa.String(length=100)),
+            sa.Column('service_name', sa.String(length=100)),
+            sa.Column('error_type', sa.String(length=100)),
+            sa.Column('incident_metadata', sa.JSON()),
+            sa.Column('stack_trace', sa.Text()),
+            sa.Column('root_cause', sa.Text()),
+            sa.Column('resolution_steps', sa.JSON()),
+            sa.Column('resolution_code', sa.Text()),
+            sa.Column('detected_at', sa.DateTime()),
+            sa.Column('resolved_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_incidents_id', 'incidents', ['id'])
+
+    if 'incident_actions' not in existing:
+        op.create_table(
+            'incident_actions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('incident_id', sa.Integer(), sa.ForeignKey('incidents.id')),
+            sa.Column('action_type', sa.String(length=50)),
+            sa.Column('description', sa.Text()),
+            sa.Column('result', sa.JSON()),
+            sa.Column('success', sa.Integer()),
+            sa.Column('created_at', sa.DateTime()),
+        )
+        op.create_index('ix_incident_actions_id', 'incident_actions', ['id'])
+
+    if 'knowledge_base' not in existing:
+        op.create_table(
+            'knowledge_base',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('incident_id', sa.Integer(), sa.ForeignKey('incidents.id')),
+            sa.Column('error_pattern', sa.Text()),
+            sa.Column('solution', sa.Text()),
+            sa.Column('embedding', sa.JSON()),
+            sa.Column('success_rate', sa.Integer()),
+            sa.Column('created_at', sa.DateTime()),
+        )
+        op.create_index('ix_knowledge_base_id', 'knowledge_base', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('knowledge_base')
+    op.drop_table('incident_actions')
+    op.drop_table('incidents')
+    sa.Enum(name='incidentstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='severitylevel').drop(op.get_bind(), checkfirst=True)
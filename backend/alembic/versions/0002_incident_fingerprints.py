@@ -0,0 +1,35 @@
+"""incident fingerprints for alert deduplication
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('incidents', sa.Column('fingerprint', sa.String(length=64)))
+    op.add_column('incidents', sa.Column('occurrence_count', sa.Integer(), server_default='1'))
+    op.add_column('incidents', sa.Column('last_seen_at', sa.DateTime()))
+    op.create_index('ix_incidents_fingerprint', 'incidents', ['fingerprint'])
+
+    # Existing incidents were last seen when they were detected
+    op.execute('UPDATE incidents SET last_seen_at = detected_at WHERE last_seen_at IS NULL')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_incidents_fingerprint', table_name='incidents')
+    op.drop_column('incidents', 'last_seen_at')
+    op.drop_column('incidents', 'occurrence_count')
+    op.drop_column('incidents', 'fingerprint')
@@ -0,0 +1,93 @@
+"""store knowledge base embeddings as packed float32 bytes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+knowledge_base = sa.table(
+    'knowledge_base',
+    sa.column('id', sa.Integer()),
+    sa.column('embedding', sa.JSON()),
+    sa.column('embedding_vector', sa.LargeBinary()),
+)
+
+
+def _batches(bind, column):
+    """Yield (id, value) rows in primary-key order, BATCH_SIZE at a time"""
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(knowledge_base.c.id, column)
+            .where(knowledge_base.c.id > last_id)
+            .order_by(knowledge_base.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column('knowledge_base', sa.Column('embedding_vector', sa.LargeBinary()))
+
+    bind = op.get_bind()
+    for rows in _batches(bind, knowledge_base.c.embedding):
+        updates = [
+            {'row_id': row_id, 'vector': np.asarray(
+                json.loads(embedding) if isinstance(embedding, str) else embedding,
+                dtype='<f4'
+            ).tobytes()}
+            for row_id, embedding in rows if embedding is not None
+        ]
+        if updates:
+            bind.execute(
+                knowledge_base.update()
+                .where(knowledge_base.c.id == sa.bindparam('row_id'))
+                .values(embedding_vector=sa.bindparam('vector')),
+                updates
+            )
+
+    with op.batch_alter_table('knowledge_base') as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_vector', new_column_name='embedding')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('knowledge_base') as batch_op:
+        batch_op.alter_column('embedding', new_column_name='embedding_vector')
+    op.add_column('knowledge_base', sa.Column('embedding', sa.JSON()))
+
+    bind = op.get_bind()
+    for rows in _batches(bind, knowledge_base.c.embedding_vector):
+        updates = [
+            {'row_id': row_id, 'values': np.frombuffer(vector, dtype='<f4').tolist()}
+            for row_id, vector in rows if vector is not None
+        ]
+        if updates:
+            bind.execute(
+                knowledge_base.update()
+                .where(knowledge_base.c.id == sa.bindparam('row_id'))
+                .values(embedding=sa.bindparam('values')),
+                updates
+            )
+
+    with op.batch_alter_table('knowledge_base') as batch_op:
+        batch_op.drop_column('embedding_vector')
@@ -0,0 +1,28 @@
+"""incident correlation ids for grouped root-cause analysis
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('incidents', sa.Column('correlation_id', sa.String(length=36)))
+    op.create_index('ix_incidents_correlation_id', 'incidents', ['correlation_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_incidents_correlation_id', table_name='incidents')
+    op.drop_column('incidents', 'correlation_id')
@@ -0,0 +1,40 @@
+"""composite indexes for keyset pagination of the incident list
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# One index per filter combination of GET /incidents, each ending in the
+# (detected_at, id) sort key
+LIST_INDEXES = {
+    'ix_incidents_list': ['detected_at', 'id'],
+    'ix_incidents_list_status': ['status', 'detected_at', 'id'],
+    'ix_incidents_list_severity': ['severity', 'detected_at', 'id'],
+    'ix_incidents_list_service': ['service_name', 'detected_at', 'id'],
+    'ix_incidents_list_status_severity': ['status', 'severity', 'detected_at', 'id'],
+    'ix_incidents_list_service_status': ['service_name', 'status', 'detected_at', 'id'],
+    'ix_incidents_list_service_severity': ['service_name', 'severity', 'detected_at', 'id'],
+    'ix_incidents_list_service_status_severity': ['service_name', 'status', 'severity', 'detected_at', 'id'],
+}
+
+
+def upgrade() -> None:
+    for name, columns in LIST_INDEXES.items():
+        op.create_index(name, 'incidents', columns)
+
+
+def downgrade() -> None:
+    for name in reversed(list(LIST_INDEXES)):
+        op.drop_index(name, table_name='incidents')
@@ -0,0 +1,38 @@
+"""incident rollup counters for the analytics endpoints
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:00:00.000000
+
+Run `python scripts/backfill_rollups.py` after upgrading to count the
+incidents that already exist.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'incident_rollups',
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('value', sa.String(length=100), nullable=False),
+        sa.Column('incidents', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('resolved', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('resolution_seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'dimension', 'value'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('incident_rollups')
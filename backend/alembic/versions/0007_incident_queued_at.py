@@ -0,0 +1,30 @@
+"""incident queued_at for durable job dispatch
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('incidents', sa.Column('queued_at', sa.DateTime(), nullable=True))
+    # Existing incidents were dispatched before the column existed
+    op.execute("UPDATE incidents SET queued_at = detected_at")
+    op.create_index('ix_incidents_queued_at', 'incidents', ['queued_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_incidents_queued_at', table_name='incidents')
+    op.drop_column('incidents', 'queued_at')
@@ -0,0 +1,77 @@
+"""count resolutions by detection hour in the analytics rollups
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+incidents = sa.table(
+    'incidents',
+    sa.column('id', sa.Integer()),
+    sa.column('status', sa.String()),
+    sa.column('detected_at', sa.DateTime()),
+    sa.column('resolved_at', sa.DateTime()),
+)
+
+incident_rollups = sa.table(
+    'incident_rollups',
+    sa.column('granularity', sa.String()),
+    sa.column('bucket_start', sa.DateTime()),
+    sa.column('dimension', sa.String()),
+    sa.column('value', sa.String()),
+    sa.column('incidents', sa.Integer()),
+    sa.column('resolved', sa.Integer()),
+    sa.column('resolution_seconds', sa.Float()),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    hours = defaultdict(lambda: [0, 0, 0.0])
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(incidents.c.id, incidents.c.status, incidents.c.detected_at, incidents.c.resolved_at)
+            .where(incidents.c.id > last_id)
+            .order_by(incidents.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for _, status, detected_at, resolved_at in rows:
+            if detected_at is None:
+                continue
+            counters = hours[detected_at.replace(minute=0, second=0, microsecond=0)]
+            counters[0] += 1
+            if status == 'RESOLVED' and resolved_at is not None:
+                counters[1] += 1
+                counters[2] += (resolved_at - detected_at).total_seconds()
+        last_id = rows[-1][0]
+
+    if hours:
+        op.bulk_insert(incident_rollups, [
+            {
+                'granularity': 'hour', 'bucket_start': hour, 'dimension': 'detected', 'value': '',
+                'incidents': count, 'resolved': resolved, 'resolution_seconds': seconds
+            }
+            for hour, (count, resolved, seconds) in sorted(hours.items())
+        ])
+
+
+def downgrade() -> None:
+    op.execute(incident_rollups.delete().where(incident_rollups.c.dimension == 'detected'))
@@ -12,6 +12,11 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 50  # per process, shared by every request
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # PING connections idle this long before reuse
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 5.0
+    REDIS_RETRIES: int = 3  # on timeouts and connection errors, with exponential backoff
     
     # AI Services
     #TOGETHER_API_KEY: str
@@ -21,9 +26,57 @@ class Settings(BaseSettings):
     TOGETHER_API_KEY: str = ""
     OUMI_MODEL: str = "llama-3.1-70b-versatile"
     
+    # LLM request scheduling
+    LLM_BASE_URL: str = ""  # overrides the provider API, e.g. a local stub server
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_REQUESTS_PER_SECOND: float = 2.0
+    LLM_BURST: int = 5
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = 30.0
+    LLM_STREAMING: bool = True  # stream analyses and push partial results
+    LLM_STREAM_PUSH_INTERVAL: float = 0.25
+    LLM_PROMPT_TOKEN_BUDGET: int = 1200  # incident context sent per analysis
+    LLM_PROMPT_MAX_FRAMES: int = 20
+    
+    # LLM provider routing (hedging + circuit breakers)
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_DEFAULT_DELAY: float = 10.0  # until a provider has enough samples for its p95
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_STATS_WINDOW: int = 200
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_MIN_REQUESTS: int = 5
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    
+    # LLM analysis cache
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_TTL_SECONDS: int = 86400
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 500
+    ANALYSIS_CACHE_SIMILARITY: float = 0.92
+    
+    # Incident read cache (detail, actions and list pages)
+    INCIDENT_CACHE_ENABLED: bool = True
+    INCIDENT_CACHE_TTL_SECONDS: int = 300
+    INCIDENT_CACHE_LOCK_SECONDS: float = 5.0  # single-flight lock lifetime
+    INCIDENT_CACHE_LOCK_WAIT_SECONDS: float = 2.0  # then waiters read the database
+    INCIDENT_CACHE_POLL_INTERVAL: float = 0.05
+    
+    # Embeddings
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_BATCH_WAIT_MS: float = 5.0
+    KB_INDEX_MODE: str = "exact"  # or "hnsw" (needs hnswlib)
+    KB_INDEX_HNSW_M: int = 16
+    KB_INDEX_HNSW_EF_CONSTRUCTION: int = 200
+    KB_INDEX_HNSW_EF: int = 64
+    KB_INDEX_SYNC_LOOKBACK: int = 1000  # ids below the sync watermark re-checked for late commits
+    
     # Kestra
     KESTRA_URL: str
     KESTRA_API_KEY: str
+    KESTRA_POLL_INTERVAL: float = 2.0
+    KESTRA_POLL_PAGE_SIZE: int = 100  # executions per search page
+    # Shared with the flows' completion callbacks; callbacks are rejected while empty
+    KESTRA_CALLBACK_SECRET: str = ""
     
     # Security
     SECRET_KEY: str
@@ -36,6 +89,55 @@ class Settings(BaseSettings):
     # Monitoring
     WEBHOOK_SECRET: str
     SLACK_WEBHOOK_URL: str = ""
+    WEBHOOK_BATCH_MAX_SIZE: int = 1000
+    
+    # Analytics rollups - counters kept in step with incident changes.
+    # When disabled, analytics aggregate the incidents table on every call;
+    # run scripts/backfill_rollups.py after turning them (back) on
+    ANALYTICS_ROLLUPS_ENABLED: bool = True
+    
+    # Deduplication
+    DEDUP_WINDOW_SECONDS: int = 900
+    
+    # Correlation - one analysis for incidents fanning out of one failure
+    CORRELATION_ENABLED: bool = True
+    CORRELATION_WINDOW_SECONDS: int = 300
+    CORRELATION_SIMILARITY: float = 0.85
+    CORRELATION_MAX_CANDIDATES: int = 200
+    CORRELATION_MAX_GROUP_PROMPT: int = 10  # incidents described in a group prompt
+    CORRELATION_GATHER_SECONDS: float = 2.0  # leader waits for the rest of the burst
+    CORRELATION_FOLLOWER_TIMEOUT: float = 60.0
+    CORRELATION_POLL_INTERVAL: float = 0.5
+    SERVICE_DEPENDENCIES: str = "{}"  # JSON: {"checkout": ["payments", "postgres"]}
+    
+    # Outbound HTTP (LLM, Kestra, Slack)
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_TIMEOUT: float = 30.0
+    LLM_TIMEOUT: float = 30.0
+    KESTRA_TIMEOUT: float = 60.0
+    SLACK_TIMEOUT: float = 10.0
+    
+    # Worker queue (Redis Streams)
+    JOB_STREAM: str = "incidents:jobs"
+    JOB_CONSUMER_GROUP: str = "incident-workers"
+    JOB_STREAM_MAXLEN: int = 100000
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_CLAIM_IDLE_SECONDS: int = 900
+    JOB_DISPATCH_GRACE_SECONDS: int = 30  # incidents without a queued job this long are queued by the sweep
+    WORKER_CONCURRENCY: int = 4
+    
+    # WebSocket subscriptions
+    WS_MAX_TOPICS_PER_CLIENT: int = 200
+    WS_SEND_QUEUE_SIZE: int = 100  # messages buffered per client
+    WS_SLOW_CLIENT_POLICY: str = "coalesce"  # on a full queue: "coalesce" drops the oldest message, "evict" disconnects
+    WS_RELAY_PATTERN: str = "incidents:*"  # Redis channels relayed to this node's clients
+    WS_RELAY_RETRY_SECONDS: float = 1.0
+    WS_RELAY_RETRY_MAX_SECONDS: float = 30.0
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0  # a client stuck on one send this long is disconnected on the next message
     
     class Config:
         env_file = ".env"
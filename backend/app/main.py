@@ -1,18 +1,19 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-import asyncio
 
 from app.config import get_settings
 from app.routes import incidents, webhooks, analytics
 from app.services.redis_service import RedisService
-from app.services.websocket_manager import ConnectionManager
+from app.services.http_client import http_clients
+from app.services.kestra_service import execution_tracker
+from app.services.analysis_cache import analysis_cache
+from app.services.incident_cache import incident_cache
+from app.services.websocket_manager import manager
+from app.services.event_relay import EventRelay
 
 settings = get_settings()
 
-# WebSocket manager
-manager = ConnectionManager()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -22,14 +23,24 @@ async def lifespan(app: FastAPI):
     redis_service = RedisService()
     await redis_service.connect()
     app.state.redis = redis_service
+    execution_tracker.attach_redis(redis_service)
+    analysis_cache.attach_redis(redis_service)
+    incident_cache.attach_redis(redis_service)
+    
+    # Shared outbound HTTP connection pools
+    await http_clients.start()
     
-    # Start background tasks
-    asyncio.create_task(redis_service.listen_for_incidents())
+    # Relay incident events published by any process to this node's WebSocket clients
+    relay = EventRelay(redis_service, manager)
+    relay.start()
+    app.state.event_relay = relay
     
     yield
     
     # Shutdown
     print("👋 Shutting down...")
+    await relay.stop()
+    await http_clients.close()
     await redis_service.disconnect()
 
 app = FastAPI(
@@ -45,6 +56,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Routes
@@ -70,6 +82,7 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_text()
-            # Handle incoming messages if needed
+            # Subscribe/unsubscribe requests, e.g. {"action": "subscribe", "topics": ["incident:42"]}
+            await manager.handle_message(websocket, data)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
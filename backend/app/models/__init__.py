@@ -1,3 +1,3 @@
-from app.models.incident import Base, Incident, IncidentAction, KnowledgeBase
+from app.models.incident import Base, Incident, IncidentAction, IncidentRollup, KnowledgeBase
 
-__all__ = ["Base", "Incident", "IncidentAction", "KnowledgeBase"]
+__all__ = ["Base", "Incident", "IncidentAction", "IncidentRollup", "KnowledgeBase"]
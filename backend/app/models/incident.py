@@ -94,14 +94,35 @@
     
 #     created_at = Column(DateTime, default=datetime.utcnow)
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, JSON, ForeignKey, LargeBinary, Index, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 import enum
+import numpy as np
 
 Base = declarative_base()
 
+class Float32Vector(TypeDecorator):
+    """
+    Embedding stored as packed little-endian float32 bytes
+    4 bytes per dimension instead of ~20 for JSON text. Values load back as
+    read-only numpy arrays via np.frombuffer, without any parsing or copy.
+    """
+    impl = LargeBinary
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.asarray(value, dtype="<f4").tobytes()
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype="<f4")
+
 class SeverityLevel(str, enum.Enum):
     CRITICAL = "critical"
     HIGH = "high"
@@ -138,6 +159,17 @@ class Incident(Base):
     resolution_steps = Column(JSON, default=[])
     resolution_code = Column(Text)
     
+    # Deduplication - repeat alerts are coalesced into the open incident
+    fingerprint = Column(String(64), index=True)
+    occurrence_count = Column(Integer, default=1)
+    last_seen_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Correlation - incidents sharing a root cause get one analysis
+    correlation_id = Column(String(36), index=True)
+    
+    # Dispatch - set once the process_incident job is on the queue
+    queued_at = Column(DateTime, nullable=True, index=True)
+    
     # Timestamps
     detected_at = Column(DateTime, default=datetime.utcnow)
     resolved_at = Column(DateTime, nullable=True)
@@ -145,6 +177,20 @@ class Incident(Base):
     # Relationships
     actions = relationship("IncidentAction", back_populates="incident")
     
+    # Keyset pagination of the incident list: one index per filter
+    # combination the list endpoint supports, each ending in the
+    # (detected_at, id) sort key so a page is a single index range scan
+    __table_args__ = (
+        Index("ix_incidents_list", "detected_at", "id"),
+        Index("ix_incidents_list_status", "status", "detected_at", "id"),
+        Index("ix_incidents_list_severity", "severity", "detected_at", "id"),
+        Index("ix_incidents_list_service", "service_name", "detected_at", "id"),
+        Index("ix_incidents_list_status_severity", "status", "severity", "detected_at", "id"),
+        Index("ix_incidents_list_service_status", "service_name", "status", "detected_at", "id"),
+        Index("ix_incidents_list_service_severity", "service_name", "severity", "detected_at", "id"),
+        Index("ix_incidents_list_service_status_severity", "service_name", "status", "severity", "detected_at", "id"),
+    )
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -158,7 +204,10 @@ class Incident(Base):
             "metadata": self.incident_metadata,  # Still return as 'metadata' in API
             "root_cause": self.root_cause,
             "resolution_steps": self.resolution_steps,
+            "occurrence_count": self.occurrence_count,
+            "correlation_id": self.correlation_id,
             "detected_at": self.detected_at.isoformat(),
+            "last_seen_at": self.last_seen_at.isoformat() if self.last_seen_at else None,
             "resolved_at": self.resolved_at.isoformat() if self.resolved_at else None
         }
 
@@ -185,7 +234,26 @@ class KnowledgeBase(Base):
     
     error_pattern = Column(Text)
     solution = Column(Text)
-    embedding = Column(JSON)  # Vector embedding for similarity search
+    embedding = Column(Float32Vector)  # Vector embedding for similarity search
     success_rate = Column(Integer, default=0)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class IncidentRollup(Base):
+    """
+    Incrementally maintained incident counters for the analytics endpoints
+    One row per (granularity, bucket, dimension, value): "hour"/"day"
+    buckets count the incidents detected and resolved in that period by
+    severity and service; the single "all" bucket holds all-time totals,
+    plus current counts by status.
+    """
+    __tablename__ = "incident_rollups"
+    
+    granularity = Column(String(8), primary_key=True)  # "all", "hour", "day"
+    bucket_start = Column(DateTime, primary_key=True)
+    dimension = Column(String(16), primary_key=True)  # "severity", "service", "status"
+    value = Column(String(100), primary_key=True)
+    
+    incidents = Column(Integer, nullable=False, default=0)  # detected (status: currently in it)
+    resolved = Column(Integer, nullable=False, default=0)
+    resolution_seconds = Column(Float, nullable=False, default=0.0)  # summed over `resolved`
@@ -1,79 +1,154 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, func, desc, select
+from collections import defaultdict
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import sqlite3
 
-from app.services.database import get_db
+from app.services.database import dialect_name, get_db
+from app.services.analysis_cache import analysis_cache
+from app.services.ai_agent import get_llm_router
+from app.services.rollup_service import DETECTED, RollupService
 from app.models.incident import Incident, SeverityLevel, IncidentStatus
 
 router = APIRouter()
 
+ACTIVE_STATUSES = [IncidentStatus.DETECTED, IncidentStatus.ANALYZING, IncidentStatus.RESOLVING]
+
+def resolution_seconds(dialect: str):
+    """Seconds from detection to resolution, in the database's own date arithmetic"""
+    if dialect == "sqlite":
+        return (func.julianday(Incident.resolved_at) - func.julianday(Incident.detected_at)) * 86400
+    return func.extract("epoch", Incident.resolved_at - Incident.detected_at)
+
+def supports_aggregate_filter(dialect: str) -> bool:
+    """`agg(...) FILTER (WHERE ...)` is PostgreSQL and SQLite >= 3.30 only"""
+    if dialect == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 30)
+    return dialect == "postgresql"
+
+def count_where(condition, use_filter: bool):
+    if use_filter:
+        return func.count().filter(condition)
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def avg_where(expression, condition, use_filter: bool):
+    if use_filter:
+        return func.avg(expression).filter(condition)
+    # avg() skips the NULLs of rows outside the condition
+    return func.avg(case((condition, expression)))
+
 @router.get("/dashboard")
 async def get_dashboard_stats(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get dashboard statistics"""
+    if RollupService.enabled():
+        return await rollup_dashboard_stats(db)
+    return await live_dashboard_stats(db)
+
+async def rollup_dashboard_stats(db: AsyncSession) -> dict:
+    """
+    Dashboard statistics from the rollup counters
+    Reads the all-time rows plus eight daily buckets, so the cost depends
+    on the number of services and statuses, not on incident history.
+    """
+    totals = await RollupService.totals(db)
+    by_status = {row.value: row.incidents for row in totals if row.dimension == "status"}
+    by_severity = [row for row in totals if row.dimension == "severity"]
+    by_service = sorted(
+        (row for row in totals if row.dimension == "service" and row.incidents > 0),
+        key=lambda row: row.incidents,
+        reverse=True
+    )
     
-    # Total incidents
-    total_incidents = db.query(func.count(Incident.id)).scalar()
+    resolved = sum(row.resolved for row in by_severity)
+    resolution_seconds = sum(row.resolution_seconds for row in by_severity)
+    avg_resolution_time = resolution_seconds / resolved / 60 if resolved else 0
     
-    # Active incidents
-    active_incidents = db.query(func.count(Incident.id)).filter(
-        Incident.status.in_([IncidentStatus.DETECTED, IncidentStatus.ANALYZING, IncidentStatus.RESOLVING])
-    ).scalar()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    days = defaultdict(lambda: [0, 0])
+    for row in await RollupService.series(db, "day", datetime.utcnow() - timedelta(days=7)):
+        days[row.bucket_start][0] += row.incidents
+        days[row.bucket_start][1] += row.resolved
     
-    # Resolved today
-    today = datetime.utcnow().date()
-    resolved_today = db.query(func.count(Incident.id)).filter(
-        Incident.status == IncidentStatus.RESOLVED,
-        func.date(Incident.resolved_at) == today
-    ).scalar()
+    return {
+        "total_incidents": sum(by_status.values()),
+        "active_incidents": sum(by_status.get(status.value, 0) for status in ACTIVE_STATUSES),
+        "resolved_today": days[today][1] if today in days else 0,
+        "avg_resolution_time_minutes": round(avg_resolution_time, 2),
+        "severity_distribution": {
+            str(SeverityLevel(row.value)) if row.value else str(None): row.incidents
+            for row in by_severity if row.incidents > 0
+        },
+        "top_services": [
+            {"service": row.value or None, "count": row.incidents}
+            for row in by_service[:10]
+        ],
+        "daily_trend": [
+            {"date": day.date().isoformat(), "count": detected}
+            for day, (detected, _) in sorted(days.items()) if detected > 0
+        ]
+    }
+
+async def live_dashboard_stats(db: AsyncSession) -> dict:
+    """
+    Dashboard statistics aggregated from the incidents table
+    Counts, average resolution time and the severity split come from one
+    aggregate query; only the top services and the 7-day trend need their
+    own GROUP BY. No incident rows are loaded into Python.
+    """
+    dialect = dialect_name(db)
+    use_filter = supports_aggregate_filter(dialect)
     
-    # Average resolution time (in minutes)
-    resolved_incidents = db.query(Incident).filter(
-        Incident.status == IncidentStatus.RESOLVED,
-        Incident.resolved_at.isnot(None)
-    ).all()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    resolved = (Incident.status == IncidentStatus.RESOLVED) & Incident.resolved_at.isnot(None)
     
-    if resolved_incidents:
-        resolution_times = [
-            (i.resolved_at - i.detected_at).total_seconds() / 60
-            for i in resolved_incidents
+    summary = (await db.execute(select(
+        func.count().label("total"),
+        count_where(Incident.status.in_(ACTIVE_STATUSES), use_filter).label("active"),
+        count_where(
+            (Incident.status == IncidentStatus.RESOLVED)
+            & (Incident.resolved_at >= today)
+            & (Incident.resolved_at < today + timedelta(days=1)),
+            use_filter
+        ).label("resolved_today"),
+        avg_where(resolution_seconds(dialect), resolved, use_filter).label("avg_resolution_seconds"),
+        *[
+            count_where(Incident.severity == severity, use_filter).label(severity.value)
+            for severity in SeverityLevel
         ]
-        avg_resolution_time = sum(resolution_times) / len(resolution_times)
-    else:
-        avg_resolution_time = 0
-    
-    # Incidents by severity
-    severity_counts = db.query(
-        Incident.severity,
-        func.count(Incident.id)
-    ).group_by(Incident.severity).all()
+    ).select_from(Incident))).one()
     
     # Incidents by service (top 10)
-    service_counts = db.query(
+    service_counts = (await db.execute(select(
         Incident.service_name,
         func.count(Incident.id)
     ).group_by(Incident.service_name).order_by(
         desc(func.count(Incident.id))
-    ).limit(10).all()
+    ).limit(10))).all()
     
     # Incident trend (last 7 days)
     seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    daily_counts = db.query(
+    daily_counts = (await db.execute(select(
         func.date(Incident.detected_at).label('date'),
         func.count(Incident.id).label('count')
-    ).filter(
+    ).where(
         Incident.detected_at >= seven_days_ago
-    ).group_by(func.date(Incident.detected_at)).all()
+    ).group_by(func.date(Incident.detected_at)))).all()
+    
+    # PostgreSQL returns numeric (Decimal) averages
+    avg_resolution_time = float(summary.avg_resolution_seconds or 0) / 60
     
     return {
-        "total_incidents": total_incidents,
-        "active_incidents": active_incidents,
-        "resolved_today": resolved_today,
+        "total_incidents": summary.total,
+        "active_incidents": summary.active,
+        "resolved_today": summary.resolved_today,
         "avg_resolution_time_minutes": round(avg_resolution_time, 2),
         "severity_distribution": {
-            str(severity): count for severity, count in severity_counts
+            str(severity): getattr(summary, severity.value)
+            for severity in SeverityLevel if getattr(summary, severity.value)
         },
         "top_services": [
             {"service": service, "count": count}
@@ -88,30 +163,68 @@ async def get_dashboard_stats(
 @router.get("/mttr")
 async def get_mttr(
     days: int = 30,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Calculate Mean Time To Resolution"""
-    
+    """
+    Calculate Mean Time To Resolution
+    Averages the resolved incidents detected in the last `days`, whether
+    read from the rollups or the incidents table.
+    """
+    if RollupService.enabled():
+        return await rollup_mttr(db, days)
+    return await live_mttr(db, days)
+
+async def rollup_mttr(db: AsyncSession, days: int) -> dict:
+    """
+    MTTR of the resolved incidents detected in the last `days`, like live_mttr
+    Whole hours come from the detection-hour rollups; only the partial hour
+    the window starts in is read from the incidents table.
+    """
     since = datetime.utcnow() - timedelta(days=days)
-    
-    incidents = db.query(Incident).filter(
+    first_full_hour = since.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    rows = await RollupService.series(db, "hour", first_full_hour, dimension=DETECTED)
+    sample_size, total_seconds = await resolved_detected_between(db, since, first_full_hour)
+    sample_size += sum(row.resolved for row in rows)
+    total_seconds += sum(row.resolution_seconds for row in rows)
+    return mttr_response(sample_size, total_seconds, days)
+
+async def live_mttr(db: AsyncSession, days: int) -> dict:
+    """MTTR of the resolved incidents detected in the last `days`"""
+    since = datetime.utcnow() - timedelta(days=days)
+    return mttr_response(*await resolved_detected_between(db, since), days)
+
+async def resolved_detected_between(db: AsyncSession, since: datetime, until: Optional[datetime] = None) -> Tuple[int, float]:
+    """Count and total resolution seconds of the resolved incidents detected in [since, until)"""
+    query = select(
+        func.count(),
+        func.sum(resolution_seconds(dialect_name(db)))
+    ).where(
         Incident.status == IncidentStatus.RESOLVED,
         Incident.detected_at >= since,
         Incident.resolved_at.isnot(None)
-    ).all()
-    
-    if not incidents:
+    )
+    if until is not None:
+        query = query.where(Incident.detected_at < until)
+    sample_size, total_seconds = (await db.execute(query)).one()
+    # PostgreSQL returns numeric (Decimal) sums
+    return sample_size, float(total_seconds or 0)
+
+def mttr_response(sample_size: int, total_seconds: float, days: int) -> dict:
+    if not sample_size:
         return {"mttr_minutes": 0, "sample_size": 0}
     
-    resolution_times = [
-        (i.resolved_at - i.detected_at).total_seconds() / 60
-        for i in incidents
-    ]
-    
-    mttr = sum(resolution_times) / len(resolution_times)
-    
     return {
-        "mttr_minutes": round(mttr, 2),
-        "sample_size": len(incidents),
+        "mttr_minutes": round(total_seconds / sample_size / 60, 2),
+        "sample_size": sample_size,
         "period_days": days
     }
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats():
+    """Hit-rate metrics of the LLM analysis cache"""
+    return await analysis_cache.stats()
+
+@router.get("/llm-providers")
+async def get_llm_provider_health():
+    """Rolling latency, error rate and circuit state per LLM provider"""
+    return get_llm_router().snapshot()
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select, tuple_
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
+import base64
+import json
 
 from app.services.database import get_db
 from app.models.incident import Incident, IncidentAction, IncidentStatus, SeverityLevel
+from app.services.incident_cache import incident_cache
+from app.services.rollup_service import RollupService
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -21,7 +26,10 @@ class IncidentResponse(BaseModel):
     error_type: str
     root_cause: Optional[str]
     resolution_steps: List[str]
+    occurrence_count: int = 1
+    correlation_id: Optional[str] = None
     detected_at: str
+    last_seen_at: Optional[str] = None
     resolved_at: Optional[str]
     
     class Config:
@@ -38,102 +46,205 @@ class IncidentActionResponse(BaseModel):
     class Config:
         from_attributes = True
 
-@router.get("/", response_model=List[IncidentResponse])
+# Column behind each IncidentResponse field. Queries select only these
+# (or the `fields=` subset), never stack_trace, metadata or resolution_code
+INCIDENT_COLUMNS = {
+    "id": Incident.id,
+    "title": Incident.title,
+    "description": Incident.description,
+    "severity": Incident.severity,
+    "status": Incident.status,
+    "service_name": Incident.service_name,
+    "error_type": Incident.error_type,
+    "root_cause": Incident.root_cause,
+    "resolution_steps": Incident.resolution_steps,
+    "occurrence_count": Incident.occurrence_count,
+    "correlation_id": Incident.correlation_id,
+    "detected_at": Incident.detected_at,
+    "last_seen_at": Incident.last_seen_at,
+    "resolved_at": Incident.resolved_at,
+}
+ALL_INCIDENT_FIELDS = tuple(INCIDENT_COLUMNS)
+
+def _enum_value(value):
+    return value.value if value is not None else None
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+# Per-field converters from column values to JSON values; identity otherwise
+FIELD_ENCODERS: Dict[str, Callable[[Any], Any]] = {
+    "severity": _enum_value,
+    "status": _enum_value,
+    "resolution_steps": lambda value: value or [],
+    "occurrence_count": lambda value: value or 1,
+    "detected_at": _isoformat,
+    "last_seen_at": _isoformat,
+    "resolved_at": _isoformat,
+}
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """`fields=id,title,status` as IncidentResponse field names; every field when omitted"""
+    if not fields:
+        return ALL_INCIDENT_FIELDS
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in INCIDENT_COLUMNS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown) or fields}. Allowed: {', '.join(ALL_INCIDENT_FIELDS)}"
+        )
+    return names
+
+def row_encoder(fields: Sequence[str]) -> Callable[[Sequence[Any]], dict]:
+    """Build a function turning a projected row (in `fields` order) into a response dict"""
+    encoders = [(index, name, FIELD_ENCODERS.get(name)) for index, name in enumerate(fields)]
+    
+    def encode(row: Sequence[Any]) -> dict:
+        return {name: encoder(row[index]) if encoder else row[index] for index, name, encoder in encoders}
+    return encode
+
+encode_incident_row = row_encoder(ALL_INCIDENT_FIELDS)
+
+def serialize_incident(incident: Incident) -> dict:
+    """IncidentResponse fields as plain JSON, the form the read cache stores"""
+    return encode_incident_row([getattr(incident, name) for name in ALL_INCIDENT_FIELDS])
+
+def serialize_action(action: IncidentAction) -> dict:
+    return {
+        "id": action.id,
+        "action_type": action.action_type,
+        "description": action.description,
+        "result": action.result or {},
+        "success": action.success,
+        "created_at": action.created_at.isoformat()
+    }
+
+def encode_cursor(detected_at: str, incident_id: int) -> str:
+    """Opaque cursor for the page after the incident (detected_at, id)"""
+    raw = json.dumps([detected_at, incident_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        detected_at, incident_id = json.loads(raw)
+        return datetime.fromisoformat(detected_at), int(incident_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/", response_model=List[IncidentResponse], response_class=ORJSONResponse)
 async def list_incidents(
     status: Optional[str] = None,
     severity: Optional[str] = None,
     service: Optional[str] = None,
     limit: int = Query(50, le=100),
+    cursor: Optional[str] = None,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated subset of fields to return"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get list of incidents with filters"""
-    query = db.query(Incident)
+    """
+    Get list of incidents with filters, newest first (read-through cached)
+    Pages by keyset: pass the X-Next-Cursor header of a full page as
+    `cursor` to get the next one. Every page is a range scan of the
+    matching (filters..., detected_at, id) index, however deep it is.
+    `offset` is still honoured without a cursor for older clients.
+    Only the requested `fields` are selected, as plain rows.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    names = parse_fields(fields)
+    # The sort key is always selected so the next cursor can be built
+    selected = names + tuple(key for key in ("detected_at", "id") if key not in names)
+    encode = row_encoder(names)
     
-    if status:
-        query = query.filter(Incident.status == IncidentStatus(status))
-    if severity:
-        query = query.filter(Incident.severity == SeverityLevel(severity))
-    if service:
-        query = query.filter(Incident.service_name == service)
+    async def load():
+        query = select(*[INCIDENT_COLUMNS[name] for name in selected])
+        
+        if status:
+            query = query.where(Incident.status == IncidentStatus(status))
+        if severity:
+            query = query.where(Incident.severity == SeverityLevel(severity))
+        if service:
+            query = query.where(Incident.service_name == service)
+        
+        query = query.order_by(desc(Incident.detected_at), desc(Incident.id))
+        if after:
+            query = query.where(tuple_(Incident.detected_at, Incident.id) < after)
+        elif offset:
+            query = query.offset(offset)
+        
+        rows = (await db.execute(query.limit(limit))).all()
+        next_cursor = None
+        if len(rows) == limit:
+            last = dict(zip(selected, rows[-1]))
+            next_cursor = encode_cursor(last["detected_at"].isoformat(), last["id"])
+        return {"incidents": [encode(row) for row in rows], "next_cursor": next_cursor}
     
-    incidents = query.order_by(desc(Incident.detected_at)).offset(offset).limit(limit).all()
+    params = {"status": status, "severity": severity, "service": service, "limit": limit,
+              "cursor": cursor, "offset": 0 if cursor else offset, "fields": names}
+    page = await incident_cache.get_list(params, load)
     
-    return [IncidentResponse(
-        id=i.id,
-        title=i.title,
-        description=i.description,
-        severity=i.severity.value,
-        status=i.status.value,
-        service_name=i.service_name,
-        error_type=i.error_type,
-        root_cause=i.root_cause,
-        resolution_steps=i.resolution_steps or [],
-        detected_at=i.detected_at.isoformat(),
-        resolved_at=i.resolved_at.isoformat() if i.resolved_at else None
-    ) for i in incidents]
-
-@router.get("/{incident_id}", response_model=IncidentResponse)
+    headers = {"X-Next-Cursor": page["next_cursor"]} if page["next_cursor"] else None
+    return ORJSONResponse(page["incidents"], headers=headers)
+
+@router.get("/{incident_id}", response_model=IncidentResponse, response_class=ORJSONResponse)
 async def get_incident(
     incident_id: int,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated subset of fields to return"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get incident details"""
-    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    """Get incident details (read-through cached)"""
+    names = parse_fields(fields)
+    
+    async def load():
+        row = (await db.execute(
+            select(*INCIDENT_COLUMNS.values()).where(Incident.id == incident_id)
+        )).first()
+        return encode_incident_row(row) if row else None
+    
+    incident = await incident_cache.get_incident(incident_id, load)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
-    return IncidentResponse(
-        id=incident.id,
-        title=incident.title,
-        description=incident.description,
-        severity=incident.severity.value,
-        status=incident.status.value,
-        service_name=incident.service_name,
-        error_type=incident.error_type,
-        root_cause=incident.root_cause,
-        resolution_steps=incident.resolution_steps or [],
-        detected_at=incident.detected_at.isoformat(),
-        resolved_at=incident.resolved_at.isoformat() if incident.resolved_at else None
-    )
+    if names != ALL_INCIDENT_FIELDS:
+        incident = {name: incident[name] for name in names}
+    return ORJSONResponse(incident)
 
 @router.get("/{incident_id}/actions", response_model=List[IncidentActionResponse])
 async def get_incident_actions(
     incident_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all actions taken for an incident"""
-    actions = db.query(IncidentAction).filter(
-        IncidentAction.incident_id == incident_id
-    ).all()
+    """Get all actions taken for an incident (read-through cached)"""
+    async def load():
+        actions = (await db.scalars(select(IncidentAction).where(
+            IncidentAction.incident_id == incident_id
+        ))).all()
+        return [serialize_action(a) for a in actions]
     
-    return [IncidentActionResponse(
-        id=a.id,
-        action_type=a.action_type,
-        description=a.description,
-        result=a.result or {},
-        success=a.success,
-        created_at=a.created_at.isoformat()
-    ) for a in actions]
+    return await incident_cache.get_actions(incident_id, load)
 
 @router.put("/{incident_id}/status")
 async def update_incident_status(
     incident_id: int,
     status: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update incident status (called by Kestra workflows)"""
-    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    incident = await db.get(Incident, incident_id)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
-    incident.status = IncidentStatus(status)
-    
-    if status == "resolved":
-        incident.resolved_at = datetime.utcnow()
+    async with RollupService.track(db, [incident_id]):
+        incident.status = IncidentStatus(status)
+        
+        if status == "resolved":
+            incident.resolved_at = datetime.utcnow()
     
-    db.commit()
+    await db.commit()
+    await incident_cache.write_through(incident_id, serialize_incident(incident))
     
     return {"status": "updated", "incident_id": incident_id}
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Request, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
+from typing import Dict, List
 import hmac
 import hashlib
 import json
+from redis.exceptions import RedisError
 
 from app.config import get_settings
 from app.models.incident import Incident, SeverityLevel, IncidentStatus
 from app.services.database import get_db
+from app.services.deduplication_service import DeduplicationService
+from app.services.incident_cache import incident_cache
+from app.services.rollup_service import RollupService
+from app.services.job_queue import JobQueue
+from app.services.kestra_service import execution_tracker
+from app.services.redis_service import RedisService, get_redis
+from app.services.dispatch_service import DispatchService
 from app.services.incident_processor import IncidentProcessor
-from app.services.redis_service import RedisService
 
 router = APIRouter()
 settings = get_settings()
@@ -22,11 +31,42 @@ def verify_webhook_signature(payload: bytes, signature: str) -> bool:
     ).hexdigest()
     return hmac.compare_digest(f"sha256={expected_signature}", signature)
 
+def build_incident_values(payload: dict) -> dict:
+    """Map a webhook payload onto Incident column values"""
+    return {
+        "title": payload.get("title", "Unknown Incident"),
+        "description": payload.get("description", ""),
+        "severity": SeverityLevel(payload.get("severity", "medium")),
+        "status": IncidentStatus.DETECTED,
+        "source": "webhook",
+        "service_name": payload.get("service", "unknown"),
+        "error_type": payload.get("error_type", "unknown"),
+        "incident_metadata": payload.get("metadata", {}),
+        "stack_trace": payload.get("stack_trace", "")
+    }
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """Decode a batch body sent either as a JSON array or as NDJSON"""
+    if "ndjson" in content_type or not body.lstrip().startswith(b"["):
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+    payloads = json.loads(body)
+    if not isinstance(payloads, list):
+        raise ValueError("Batch body must be a JSON array")
+    return payloads
+
+async def queue_unqueued(db: AsyncSession, redis_service: RedisService, incident_ids: List[int]):
+    """Queue open incidents a repeat alert coalesced into if their own enqueue failed"""
+    try:
+        await DispatchService.queue_unqueued(db, redis_service, incident_ids)
+    except RedisError as e:
+        print(f"⚠️ Could not queue coalesced incidents {incident_ids}: {e}")
+
 @router.post("/incident")
 async def receive_incident_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis_service: RedisService = Depends(get_redis)
 ):
     """
     Receive incident webhooks from monitoring tools
@@ -48,33 +88,47 @@ async def receive_incident_webhook(
         raise HTTPException(status_code=401, detail="Invalid signature")
     
     payload = json.loads(body)
+    values = build_incident_values(payload)
+    
+    # Coalesce repeats of an alert that already has an open incident
+    dedup = DeduplicationService(redis_service)
+    values["fingerprint"] = dedup.fingerprint_values(values)
+    duplicate = await dedup.coalesce(db, values["fingerprint"])
+    
+    if duplicate:
+        if duplicate.queued_at is None:
+            await queue_unqueued(db, redis_service, [duplicate.id])
+        return {
+            "status": "deduplicated",
+            "incident_id": duplicate.id,
+            "occurrence_count": duplicate.occurrence_count,
+            "message": "Alert coalesced into open incident"
+        }
     
     # Create incident
-    incident = Incident(
-        title=payload.get("title", "Unknown Incident"),
-        description=payload.get("description", ""),
-        severity=SeverityLevel(payload.get("severity", "medium")),
-        status=IncidentStatus.DETECTED,
-        source="webhook",
-        service_name=payload.get("service", "unknown"),
-        error_type=payload.get("error_type", "unknown"),
-        incident_metadata=payload.get("metadata", {}),  # CHANGED
-        stack_trace=payload.get("stack_trace", "")
-    )
+    incident = Incident(**values)
     
     db.add(incident)
-    db.commit()
-    db.refresh(incident)
-    
-    # Publish to Redis for processing
-    redis_service = RedisService()
-    await redis_service.publish_incident(incident.id)
+    await db.flush()
+    await RollupService.record_created(db, [incident.id])
+    await db.commit()
+    await incident_cache.invalidate()
     
-    # Process incident in background
-    background_tasks.add_task(
-        IncidentProcessor.process_incident,
-        incident.id
-    )
+    # Remember the fingerprint, announce the incident and hand it to the
+    # worker pool in one Redis round-trip
+    try:
+        async with redis_service.client.pipeline(transaction=False) as pipe:
+            dedup.remember_on(pipe, {incident.fingerprint: incident.id})
+            redis_service.publish_on(pipe, [
+                RedisService.incident_event(incident.id, incident.service_name, incident.severity)
+            ])
+            JobQueue(redis_service.client).enqueue_on(pipe, "process_incident", [{"incident_id": incident.id}])
+            await pipe.execute()
+    except RedisError as e:
+        # The incident is committed; the worker's dispatch sweep queues it later
+        print(f"⚠️ Could not queue incident #{incident.id}: {e}")
+    else:
+        await DispatchService.mark_queued(db, [incident.id])
     
     return {
         "status": "received",
@@ -82,28 +136,157 @@ async def receive_incident_webhook(
         "message": "Incident processing initiated"
     }
 
+@router.post("/incident/batch")
+async def receive_incident_batch_webhook(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    redis_service: RedisService = Depends(get_redis)
+):
+    """
+    Receive a batch of incident webhooks in a single signed request
+    The body is either a JSON array of incident payloads or NDJSON
+    (one payload per line, Content-Type: application/x-ndjson).
+    All valid items are inserted with one bulk INSERT ... RETURNING and
+    announced with one Redis pipeline. Repeats of an alert - within the
+    batch or of an open incident - are coalesced instead of inserted.
+    Results are reported per item.
+    """
+    signature = request.headers.get("X-Webhook-Signature", "")
+    body = await request.body()
+    
+    if not verify_webhook_signature(body, signature):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    
+    try:
+        payloads = parse_batch_body(body, request.headers.get("Content-Type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+    
+    if len(payloads) > settings.WEBHOOK_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.WEBHOOK_BATCH_MAX_SIZE} incidents"
+        )
+    
+    dedup = DeduplicationService(redis_service)
+    results = [None] * len(payloads)
+    # fingerprint -> item indexes, in first-seen order
+    groups: Dict[str, List[int]] = {}
+    group_values: Dict[str, dict] = {}
+    
+    for index, payload in enumerate(payloads):
+        try:
+            if not isinstance(payload, dict):
+                raise ValueError("Incident payload must be a JSON object")
+            values = build_incident_values(payload)
+        except ValueError as e:
+            results[index] = {"index": index, "status": "rejected", "error": str(e)}
+            continue
+        
+        values["fingerprint"] = dedup.fingerprint_values(values)
+        groups.setdefault(values["fingerprint"], []).append(index)
+        group_values.setdefault(values["fingerprint"], values)
+    
+    duplicates = await dedup.find_duplicates(db, groups.keys())
+    new_groups = [fp for fp in groups if fp not in duplicates]
+    
+    # Fold repeats of open incidents into their counters
+    for fp, incident in duplicates.items():
+        dedup.record_occurrences(incident, len(groups[fp]))
+    
+    incident_ids: List[int] = []
+    if new_groups:
+        rows = []
+        for fp in new_groups:
+            rows.append({**group_values[fp], "occurrence_count": len(groups[fp])})
+        incident_ids = list(await db.scalars(
+            insert(Incident).returning(Incident.id, sort_by_parameter_order=True),
+            rows
+        ))
+        await RollupService.record_created(db, incident_ids)
+    
+    if groups:
+        await db.commit()
+        await incident_cache.invalidate(*[incident.id for incident in duplicates.values()])
+        await queue_unqueued(db, redis_service, [
+            incident.id for incident in duplicates.values() if incident.queued_at is None
+        ])
+    
+    fingerprint_ids = {fp: incident.id for fp, incident in duplicates.items()}
+    fingerprint_ids.update(zip(new_groups, incident_ids))
+    
+    for fp, indexes in groups.items():
+        # The first item of a new group created the incident, the rest coalesced into it
+        for position, index in enumerate(indexes):
+            created = fp not in duplicates and position == 0
+            results[index] = {
+                "index": index,
+                "status": "received" if created else "deduplicated",
+                "incident_id": fingerprint_ids[fp]
+            }
+    
+    if fingerprint_ids:
+        # Remember the fingerprints, announce the new incidents and queue
+        # their pipelines in one Redis round-trip
+        try:
+            async with redis_service.client.pipeline(transaction=False) as pipe:
+                dedup.remember_on(pipe, fingerprint_ids)
+                if incident_ids:
+                    redis_service.publish_on(pipe, [
+                        RedisService.incident_event(incident_id, row.get("service_name"), row.get("severity"))
+                        for incident_id, row in zip(incident_ids, rows)
+                    ])
+                    JobQueue(redis_service.client).enqueue_on(
+                        pipe,
+                        "process_incident",
+                        [{"incident_id": incident_id} for incident_id in incident_ids]
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            # The incidents are committed; the worker's dispatch sweep queues them later
+            print(f"⚠️ Could not queue {len(incident_ids)} batch incidents: {e}")
+        else:
+            await DispatchService.mark_queued(db, incident_ids)
+    
+    rejected = sum(1 for r in results if r["status"] == "rejected")
+    return {
+        "status": "received",
+        "received": len(incident_ids),
+        "deduplicated": len(payloads) - rejected - len(incident_ids),
+        "rejected": rejected,
+        "results": results
+    }
+
+async def enqueue_or_run(redis_service: RedisService, background_tasks: BackgroundTasks,
+                         job_type: str, payload: dict, run_locally):
+    """Queue a job for the worker pool, or run it in this process when Redis is unavailable"""
+    try:
+        await JobQueue(redis_service.client).enqueue(job_type, payload)
+    except RedisError as e:
+        print(f"⚠️ Could not queue {job_type}, running it in-process: {e}")
+        background_tasks.add_task(run_locally, payload)
+
 @router.post("/logs")
 async def receive_log_webhook(
     request: Request,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    redis_service: RedisService = Depends(get_redis)
 ):
     """Handle log stream webhooks for error detection"""
     payload = await request.json()
     
     # Detect errors in logs (simplified)
     if "error" in payload.get("message", "").lower() or payload.get("level") == "error":
-        # Trigger incident creation
-        background_tasks.add_task(
-            IncidentProcessor.create_from_logs,
-            payload
-        )
+        # Trigger incident creation on the worker pool
+        await enqueue_or_run(redis_service, background_tasks, "create_from_logs", payload, IncidentProcessor.create_from_logs)
     
     return {"status": "processed"}
 
 @router.post("/metrics")
 async def receive_metrics_webhook(
     request: Request,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    redis_service: RedisService = Depends(get_redis)
 ):
     """Handle metrics webhooks for threshold breaches"""
     payload = await request.json()
@@ -113,9 +296,39 @@ async def receive_metrics_webhook(
     threshold = payload.get("threshold", 100)
     
     if metric_value > threshold:
-        background_tasks.add_task(
-            IncidentProcessor.create_from_metrics,
-            payload
-        )
+        await enqueue_or_run(redis_service, background_tasks, "create_from_metrics", payload, IncidentProcessor.create_from_metrics)
     
     return {"status": "processed"}
+
+@router.post("/kestra/execution")
+async def receive_kestra_execution_callback(request: Request):
+    """
+    Completion callback sent by Kestra flows when an execution finishes
+    Expected payload:
+    {
+        "execution_id": "4Fh...",
+        "state": "SUCCESS" | "FAILED" | "KILLED",
+        "outputs": {...}
+    }
+    Wakes whichever process is waiting on the execution within milliseconds
+    instead of on its next poll. Authenticated by KESTRA_CALLBACK_SECRET in
+    X-Callback-Secret, never by the signing WEBHOOK_SECRET itself.
+    """
+    secret = request.headers.get("X-Callback-Secret", "")
+    expected = settings.KESTRA_CALLBACK_SECRET
+    if not expected or not hmac.compare_digest(secret.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid secret")
+    
+    payload = await request.json()
+    execution = {
+        "id": payload.get("execution_id"),
+        "state": {
+            "current": payload.get("state"),
+            "duration": payload.get("duration"),
+            "histories": payload.get("histories", [])
+        },
+        "outputs": payload.get("outputs", {})
+    }
+    await execution_tracker.publish_completion(execution)
+    
+    return {"status": "received", "execution_id": execution["id"]}
@@ -109,41 +109,305 @@
 
 # And this code snippet:
 
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
 import httpx
 import json
-from typing import Optional, Dict, Any
+from redis.exceptions import RedisError
+from typing import Awaitable, Callable, Optional, Dict, Any
 from app.config import get_settings
+from app.models.incident import SeverityLevel
+from app.services.http_client import http_clients
+from app.services.analysis_cache import analysis_cache
+from app.services.llm_stream import PartialJSONParser, iter_sse_content
+from app.services.llm_router import LLMProvider, LLMRouter
+from app.services.prompt_builder import build_analysis_prompt, build_group_analysis_prompt
 
 settings = get_settings()
 
+# Lower runs first; unknown severities are scheduled as MEDIUM
+SEVERITY_PRIORITY = {
+    SeverityLevel.CRITICAL.value: 0,
+    SeverityLevel.HIGH.value: 1,
+    SeverityLevel.MEDIUM.value: 2,
+    SeverityLevel.LOW.value: 3,
+}
+
+# Responses worth retrying; any other 4xx fails immediately
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Analysis fields pushed to the dashboard while a completion streams in
+STREAMED_FIELDS = ("root_cause", "impact", "resolution_steps")
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    ceiling = min(settings.LLM_BACKOFF_MAX_SECONDS, settings.LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+class TokenBucket:
+    """Token-bucket rate limiter that can also be paused after a 429"""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self) -> float:
+        """Seconds until a token can be taken (0 when one is available now)"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+    
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+    
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class LLMScheduler:
+    """
+    Admission control for calls to one LLM provider
+    At most max_concurrency requests run at once and new ones start no
+    faster than the provider's token bucket allows. Waiting requests are
+    admitted by severity, so CRITICAL analyses jump the queue during an
+    incident storm instead of waiting behind LOW ones.
+    """
+    
+    def __init__(self, provider: str, max_concurrency: Optional[int] = None,
+                 rate: Optional[float] = None, burst: Optional[int] = None):
+        self.provider = provider
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.bucket = TokenBucket(
+            settings.LLM_REQUESTS_PER_SECOND if rate is None else rate,
+            burst or settings.LLM_BURST
+        )
+        self.in_flight = 0
+        self._waiters: list = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._timer = None
+        self._loop = None
+    
+    @staticmethod
+    def priority(severity) -> int:
+        if isinstance(severity, SeverityLevel):
+            severity = severity.value
+        return SEVERITY_PRIORITY.get(str(severity).lower(), SEVERITY_PRIORITY[SeverityLevel.MEDIUM.value])
+    
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+    
+    @property
+    def has_capacity(self) -> bool:
+        """Whether a request would be admitted without queueing for a slot"""
+        return self.in_flight < self.max_concurrency and not self.queued
+    
+    def _bind_loop(self):
+        # Futures and timers belong to one event loop; start fresh on a new one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._waiters = []
+            self._timer = None
+            self.in_flight = 0
+    
+    def _dispatch(self):
+        """Admit waiters in priority order while slots and tokens allow"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        while self._waiters and self.in_flight < self.max_concurrency:
+            future = self._waiters[0][2]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            
+            delay = self.bucket.delay()
+            if delay > 0:
+                self._timer = self._loop.call_later(delay, self._dispatch)
+                return
+            
+            heapq.heappop(self._waiters)
+            self.bucket.take()
+            self.in_flight += 1
+            future.set_result(None)
+    
+    async def acquire(self, severity=None):
+        self._bind_loop()
+        future = self._loop.create_future()
+        heapq.heappush(self._waiters, (self.priority(severity), next(self._sequence), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled; hand the slot on
+                self.release()
+            raise
+    
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+    
+    def pause(self, seconds: float):
+        """Stop admitting requests, e.g. while the provider is rate limiting us"""
+        self.bucket.pause(seconds)
+        print(f"⏸️ LLM provider {self.provider} rate limited, pausing {seconds:.1f}s")
+    
+    @asynccontextmanager
+    async def slot(self, severity=None):
+        await self.acquire(severity)
+        try:
+            yield
+        finally:
+            self.release()
+
+_schedulers: Dict[str, LLMScheduler] = {}
+
+def get_llm_scheduler(provider: str) -> LLMScheduler:
+    """Shared scheduler for a provider, so limits apply process-wide"""
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        scheduler = _schedulers[provider] = LLMScheduler(provider)
+    return scheduler
+
+# name -> (API base URL, model, setting holding the API key)
+LLM_PROVIDERS = {
+    "groq": ("https://api.groq.com/openai/v1", "llama-3.1-70b-versatile", "GROQ_API_KEY"),
+    "together": ("https://api.together.xyz/v1", "meta-llama/Llama-3.2-70B-Instruct-Turbo", "TOGETHER_API_KEY"),
+}
+
+def build_llm_providers() -> list:
+    """
+    AI_PROVIDER first, then every other provider that has an API key
+    LLM_BASE_URL (e.g. a local stub server) replaces the primary's URL.
+    """
+    primary = "together" if settings.AI_PROVIDER == "together" else "groq"
+    providers = []
+    for name in [primary] + [name for name in LLM_PROVIDERS if name != primary]:
+        base_url, model, key_setting = LLM_PROVIDERS[name]
+        api_key = getattr(settings, key_setting)
+        if name != primary and not api_key:
+            continue
+        if name == primary and settings.LLM_BASE_URL:
+            base_url = settings.LLM_BASE_URL.rstrip("/")
+        providers.append(LLMProvider(name, base_url, api_key, model, get_llm_scheduler(name)))
+    return providers
+
+_router: Optional[LLMRouter] = None
+
+def get_llm_router() -> LLMRouter:
+    """Process-wide router, so latency stats and breakers are shared"""
+    global _router
+    if _router is None:
+        _router = LLMRouter(build_llm_providers())
+    return _router
+
 class OumiAgent:
     """
     AI Agent using Oumi framework with Together AI LLM
     Handles incident analysis and root cause detection
     """
     
-    def __init__(self):
-        self.provider = settings.AI_PROVIDER
-        
-        if self.provider == "together":
-            self.api_key = settings.TOGETHER_API_KEY
-            self.base_url = "https://api.together.xyz/v1"
-            self.model = "meta-llama/Llama-3.2-70B-Instruct-Turbo"
-        else:  # groq
-            self.api_key = settings.GROQ_API_KEY
-            self.base_url = "https://api.groq.com/openai/v1"
-            self.model = "llama-3.1-70b-versatile"
+    def __init__(self, router: Optional[LLMRouter] = None):
+        # Groq / Together endpoints, picked per request by latency and health
+        self.router = router or get_llm_router()
     
-    async def analyze_incident(self, context: dict) -> dict:
+    async def analyze_incident(
+        self,
+        context: dict,
+        on_partial: Optional[Callable[[dict], Awaitable[None]]] = None
+    ) -> dict:
         """
         Analyze incident and provide root cause + resolution steps
+        With `on_partial`, the completion is streamed and the callback gets
+        the root cause / resolution steps parsed so far as tokens arrive.
         """
         prompt = self._build_analysis_prompt(context)
+        return await self._analyze(prompt, context, on_partial)
+    
+    async def analyze_incident_group(
+        self,
+        contexts: list,
+        on_partial: Optional[Callable[[dict], Awaitable[None]]] = None
+    ) -> dict:
+        """
+        One analysis for correlated incidents that share a root cause
+        Runs at the priority of the most severe member.
+        """
+        if len(contexts) == 1:
+            return await self.analyze_incident(contexts[0], on_partial)
+        
+        prompt = build_group_analysis_prompt(contexts)
+        severity = min(
+            (context.get("severity") for context in contexts),
+            key=LLMScheduler.priority
+        )
+        return await self._analyze(prompt, {"severity": severity}, on_partial, semantic_cache=False)
+    
+    async def _analyze(
+        self,
+        prompt: str,
+        context: dict,
+        on_partial: Optional[Callable[[dict], Awaitable[None]]] = None,
+        semantic_cache: bool = True
+    ) -> dict:
+        """Serve the prompt from the analysis cache or the LLM"""
+        embedding = None
+        if analysis_cache.enabled:
+            # A failing cache only costs the lookup, never the analysis
+            try:
+                cached = await analysis_cache.get_exact(prompt)
+                if cached:
+                    return cached
+                
+                if semantic_cache:
+                    embedding = await self._embed_for_cache(context)
+                if embedding is not None:
+                    cached = await analysis_cache.get_similar(embedding)
+                    if cached:
+                        return cached
+                else:
+                    # get_similar counts the misses of semantic lookups
+                    await analysis_cache.record_miss()
+            except RedisError as e:
+                print(f"Analysis cache lookup failed: {e}")
         
         try:
-            response = await self._call_llm(prompt)
+            if on_partial and settings.LLM_STREAMING:
+                response = await self._stream_llm(prompt, on_partial, severity=context.get("severity"))
+            else:
+                response = await self._call_llm(prompt, severity=context.get("severity"))
             analysis = self._parse_analysis_response(response)
-            return analysis
         except Exception as e:
             print(f"Error in AI analysis: {str(e)}")
             return {
@@ -153,109 +417,214 @@ class OumiAgent:
                 "prevention_steps": ["Add monitoring"],
                 "error": str(e)
             }
+        
+        if analysis_cache.enabled and analysis.get("confidence") != "low":
+            try:
+                await analysis_cache.set(prompt, analysis, embedding)
+            except RedisError as e:
+                print(f"Could not cache analysis: {e}")
+        return analysis
+    
+    async def _embed_for_cache(self, context: dict):
+        """Embedding of the incident signature used for semantic cache lookups"""
+        from app.services.embedding_service import embedding_batcher
+        
+        text = " | ".join(str(context.get(key) or "") for key in (
+            "service", "error_type", "title", "description", "stack_trace"
+        ))[:2000]
+        try:
+            return await embedding_batcher.encode(text)
+        except Exception as e:
+            print(f"Semantic analysis cache unavailable: {e}")
+            return None
     
     def _build_analysis_prompt(self, context: dict) -> str:
-        """Build detailed prompt for incident analysis"""
-        # Escape any special characters in the input
-        title = context.get('title', 'Unknown').replace('"', '\\"')
-        service = context.get('service', 'unknown').replace('"', '\\"')
-        error_type = context.get('error_type', 'unknown').replace('"', '\\"')
-        description = context.get('description', '').replace('"', '\\"')
-        stack_trace = context.get('stack_trace', 'Not available')[:1000]  # Limit length
+        """Build a compacted, token-budgeted prompt for incident analysis"""
+        return build_analysis_prompt(context)
+    
+    def _headers(self, provider: LLMProvider) -> dict:
+        return {
+            "Authorization": f"Bearer {provider.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _completion_body(self, provider: LLMProvider, prompt: str, stream: bool = False) -> dict:
+        body = {
+            "model": provider.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert DevOps incident response agent. Provide clear, actionable analysis in valid JSON format only."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.3,
+            "max_tokens": 1500,
+            "top_p": 0.9,
+            "response_format": {"type": "json_object"}  # Force JSON response
+        }
+        if stream:
+            body["stream"] = True
+        return body
+    
+    def _check_response(self, provider: LLMProvider, response: httpx.Response, attempt: int):
+        """Raise for error statuses; a 429 also pauses the provider's scheduler"""
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            provider.scheduler.pause(retry_after if retry_after is not None else backoff_delay(attempt))
+        response.raise_for_status()
+    
+    async def _stream_llm(
+        self,
+        prompt: str,
+        on_partial: Callable[[dict], Awaitable[None]],
+        severity: Optional[str] = None
+    ) -> str:
+        """
+        Stream the completion over SSE, pushing partial analysis fields
+        The stream goes to the fastest healthy provider. If it has not sent
+        a first token by that provider's p95, a non-streamed request is
+        hedged to the next provider with idle capacity and the first full
+        answer wins. Pushes are throttled to LLM_STREAM_PUSH_INTERVAL and
+        only sent when a field changed. When the stream (and any hedge)
+        fails, even part-way, the prompt goes to `_call_llm` with hedging,
+        failover and retries.
+        """
+        client = http_clients.get("llm")
+        parser = PartialJSONParser()
+        chunks = []
+        first_token = asyncio.Event()
+        pushed = None
+        last_push = 0.0
         
-        prompt1 = f"""You are a DevOps expert analyzing a production incident.
-
-Incident Details:
-- Title: {title}
-- Service: {service}
-- Error Type: {error_type}
-- Description: {description}
-
-Stack Trace:
-{stack_trace}
-
-Metadata:
-{json.dumps(context.get('metadata', {}), indent=2)}
-
-Please provide a detailed analysis in JSON format with the following structure:
-{{
-    "root_cause": "Clear explanation of what caused this incident",
-    "impact": "Description of severity and affected systems",
-    "resolution_steps": ["Step 1", "Step 2", "Step 3"],
-    "prevention_steps": ["Prevention measure 1", "Prevention measure 2"],
-    "confidence": "high/medium/low"
-}}
-
-Be specific and actionable. Focus on technical root causes, not symptoms."""
+        async def push(force: bool = False):
+            nonlocal pushed, last_push
+            now = time.monotonic()
+            if not force and now - last_push < settings.LLM_STREAM_PUSH_INTERVAL:
+                return
+            snapshot = parser.snapshot()
+            if not snapshot:
+                return
+            fields = {key: snapshot[key] for key in STREAMED_FIELDS if key in snapshot}
+            if fields and fields != pushed:
+                pushed, last_push = fields, now
+                try:
+                    await on_partial(fields)
+                except Exception as e:
+                    print(f"Error pushing partial analysis: {e}")
         
-        # In _build_analysis_prompt method, around line 60
-        prompt = f"""You are a DevOps expert analyzing a production incident.
-
-        INCIDENT DETAILS:
-        - Title: {title}
-        - Service: {service}
-        - Error Type: {error_type}
-        - Description: {description}
-
-        STACK TRACE:
-        {stack_trace}
-
-        METADATA:
-        {json.dumps(context.get('metadata', {}), indent=2)}  # This stays as 'metadata' since it's the key name in the dict
-        """
-
-        return prompt
+        async def stream(provider: LLMProvider):
+            async with provider.scheduler.slot(severity):
+                async with client.stream(
+                    "POST",
+                    f"{provider.base_url}/chat/completions",
+                    headers=self._headers(provider),
+                    json=self._completion_body(provider, prompt, stream=True)
+                ) as response:
+                    if response.is_error:
+                        await response.aread()
+                    self._check_response(provider, response, 0)
+                    async for content in iter_sse_content(response):
+                        chunks.append(content)
+                        first_token.set()
+                        parser.feed(content)
+                        await push()
+        
+        providers = self.router.available()
+        if not providers:
+            print("Streaming failed, retrying without streaming: no LLM provider available")
+            return await self._call_llm(prompt, severity=severity)
+        
+        streaming = asyncio.ensure_future(self.router.attempt(providers[0], stream))
+        tasks = {streaming}
+        error = None
+        try:
+            if self.router.hedge and len(providers) > 1:
+                waiter = asyncio.ensure_future(first_token.wait())
+                done, _ = await asyncio.wait(
+                    {streaming, waiter},
+                    timeout=self.router.hedge_delay(providers[0]),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                waiter.cancel()
+                backup = next((p for p in providers[1:] if p.scheduler.has_capacity), None)
+                if not done and backup:
+                    print(f"🏁 Hedging LLM request to {backup.name} (no first token from {providers[0].name} by p95)")
+                    tasks.add(asyncio.ensure_future(self.router.attempt(
+                        backup,
+                        lambda provider: self._request_completion(provider, prompt, 0, severity)
+                    )))
+            
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not streaming:
+                        return task.result()
+                    await push(force=True)
+                    return "".join(chunks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        
+        state = "part-way" if chunks else "before any content"
+        print(f"Streaming failed {state}, retrying without streaming: {error}")
+        return await self._call_llm(prompt, severity=severity)
     
-    async def _call_llm(self, prompt: str, max_retries: int = 3) -> str:
-        """Call Together AI API with Oumi model and retry logic"""
+    async def _request_completion(self, provider: LLMProvider, prompt: str, attempt: int,
+                                  severity: Optional[str] = None) -> str:
+        """One completion request to one provider, through its scheduler"""
+        async with provider.scheduler.slot(severity):
+            response = await http_clients.get("llm").post(
+                f"{provider.base_url}/chat/completions",
+                headers=self._headers(provider),
+                json=self._completion_body(provider, prompt)
+            )
+        
+        self._check_response(provider, response, attempt)
+        result = response.json()
+        
+        if "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"]["content"]
+        else:
+            raise ValueError("Invalid LLM response structure")
+    
+    async def _call_llm(self, prompt: str, max_retries: int = 3, severity: Optional[str] = None) -> str:
+        """
+        Call the LLM API through the provider router
+        Each attempt is hedged and fails over across providers; when every
+        provider fails, timeouts, 429s and 5xx are retried with jittered
+        exponential backoff, or after Retry-After when the provider sends one.
+        """
         for attempt in range(max_retries):
+            retry_after = None
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        f"{self.base_url}/chat/completions",
-                        headers={
-                            "Authorization": f"Bearer {self.api_key}",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": self.model,
-                            "messages": [
-                                {
-                                    "role": "system",
-                                    "content": "You are an expert DevOps incident response agent. Provide clear, actionable analysis in valid JSON format only."
-                                },
-                                {
-                                    "role": "user",
-                                    "content": prompt
-                                }
-                            ],
-                            "temperature": 0.3,
-                            "max_tokens": 1500,
-                            "top_p": 0.9,
-                            "response_format": {"type": "json_object"}  # Force JSON response
-                        }
-                    )
-                    
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    if "choices" in result and len(result["choices"]) > 0:
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        raise ValueError("Invalid LLM response structure")
-                        
+                return await self.router.complete(
+                    lambda provider: self._request_completion(provider, prompt, attempt, severity)
+                )
             except httpx.TimeoutException:
                 print(f"Timeout on attempt {attempt + 1}/{max_retries}")
                 if attempt == max_retries - 1:
                     raise
             except httpx.HTTPStatusError as e:
                 print(f"HTTP error on attempt {attempt + 1}/{max_retries}: {e}")
-                if attempt == max_retries - 1:
+                if attempt == max_retries - 1 or e.response.status_code not in RETRYABLE_STATUS:
                     raise
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
             except Exception as e:
                 print(f"Unexpected error on attempt {attempt + 1}/{max_retries}: {e}")
                 if attempt == max_retries - 1:
                     raise
+            
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
         
         raise Exception("Failed to get LLM response after retries")
     
@@ -359,7 +728,7 @@ Be specific and actionable. Focus on technical root causes, not symptoms."""
         )
         
         try:
-            response = await self._call_llm(prompt)
+            response = await self._call_llm(prompt, severity=incident_context.get("severity"))
             fix_data = json.loads(response)
             
             return {
@@ -427,7 +796,7 @@ Be specific and actionable. Focus on technical root causes, not symptoms."""
     async def check_similar_incidents(
         self, 
         error_pattern: str, 
-        knowledge_base: list
+        knowledge_base: Optional[list] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Check if similar incident exists in knowledge base
@@ -435,12 +804,13 @@ Be specific and actionable. Focus on technical root causes, not symptoms."""
         
         Args:
             error_pattern: Current error description
-            knowledge_base: List of past incidents
+            knowledge_base: List of past incidents (defaults to the shared
+                knowledge base index)
             
         Returns:
             Most similar incident if found, None otherwise
         """
-        if not knowledge_base:
+        if knowledge_base is not None and not knowledge_base:
             return None
         
         # Create embeddings and find similarity
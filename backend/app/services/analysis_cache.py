@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import json
+import time
+from typing import Optional
+import numpy as np
+
+from app.config import get_settings
+from app.services.knowledge_index import normalize
+
+settings = get_settings()
+
+class AnalysisCache:
+    """
+    Two-tier Redis cache for LLM incident analyses
+    Tier one is keyed on the SHA-256 of the analysis prompt. Tier two keeps
+    the embeddings of recent analyses and reuses the closest one when its
+    cosine similarity clears ANALYSIS_CACHE_SIMILARITY. Entries expire after
+    ANALYSIS_CACHE_TTL_SECONDS and the semantic tier holds at most
+    ANALYSIS_CACHE_MAX_ENTRIES, evicting the least recently used first.
+    """
+    
+    EXACT_PREFIX = "analysis:exact:"
+    SEMANTIC_PREFIX = "analysis:semantic:"
+    SEMANTIC_LRU = "analysis:semantic:lru"  # sorted set of keys scored by last use
+    STATS_KEY = "analysis:cache:stats"
+    
+    def __init__(self):
+        self.redis_service = None
+    
+    def attach_redis(self, redis_service):
+        self.redis_service = redis_service
+    
+    @property
+    def client(self):
+        return getattr(self.redis_service, "client", None)
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.ANALYSIS_CACHE_ENABLED and self.client is not None
+    
+    @staticmethod
+    def prompt_key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode()).hexdigest()
+    
+    async def _record(self, outcome: str):
+        await self.client.hincrby(self.STATS_KEY, outcome, 1)
+    
+    async def record_miss(self):
+        """Count a lookup that found nothing; get_similar counts its own misses"""
+        await self._record("misses")
+    
+    async def get_exact(self, prompt: str) -> Optional[dict]:
+        """Analysis previously produced for exactly this prompt"""
+        key = self.prompt_key(prompt)
+        cached = await self.client.get(self.EXACT_PREFIX + key)
+        if cached is None:
+            return None
+        
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(self.STATS_KEY, "exact_hits", 1)
+            pipe.zadd(self.SEMANTIC_LRU, {key: time.time()}, xx=True)
+            await pipe.execute()
+        return {**json.loads(cached), "cache": "exact"}
+    
+    async def get_similar(self, embedding) -> Optional[dict]:
+        """Most similar recent analysis, if it clears the similarity threshold"""
+        keys = await self.client.zrevrange(self.SEMANTIC_LRU, 0, settings.ANALYSIS_CACHE_MAX_ENTRIES - 1)
+        if not keys:
+            await self._record("misses")
+            return None
+        
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hget(self.SEMANTIC_PREFIX + key, "embedding")
+            encoded = await pipe.execute()
+        
+        live = [(key, value) for key, value in zip(keys, encoded) if value]
+        expired = [key for key, value in zip(keys, encoded) if not value]
+        if expired:
+            await self.client.zrem(self.SEMANTIC_LRU, *expired)
+        if not live:
+            await self._record("misses")
+            return None
+        
+        matrix = normalize(np.stack([
+            np.frombuffer(base64.b64decode(value), dtype="<f4") for _, value in live
+        ]))
+        scores = matrix @ normalize(np.asarray(embedding, dtype=np.float32))
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        
+        if similarity < settings.ANALYSIS_CACHE_SIMILARITY:
+            await self._record("misses")
+            return None
+        
+        key = live[best][0]
+        cached = await self.client.hget(self.SEMANTIC_PREFIX + key, "analysis")
+        if cached is None:
+            await self._record("misses")
+            return None
+        
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(self.STATS_KEY, "semantic_hits", 1)
+            pipe.zadd(self.SEMANTIC_LRU, {key: time.time()})
+            await pipe.execute()
+        return {**json.loads(cached), "cache": "semantic", "similarity": round(similarity, 4)}
+    
+    async def set(self, prompt: str, analysis: dict, embedding=None):
+        """Store an analysis under its prompt hash and, with an embedding, in the semantic tier"""
+        key = self.prompt_key(prompt)
+        ttl = settings.ANALYSIS_CACHE_TTL_SECONDS
+        payload = json.dumps(analysis)
+        
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self.EXACT_PREFIX + key, payload, ex=ttl)
+            if embedding is not None:
+                vector = np.asarray(embedding, dtype="<f4").tobytes()
+                pipe.hset(self.SEMANTIC_PREFIX + key, mapping={
+                    "embedding": base64.b64encode(vector).decode(),
+                    "analysis": payload
+                })
+                pipe.expire(self.SEMANTIC_PREFIX + key, ttl)
+                pipe.zadd(self.SEMANTIC_LRU, {key: time.time()})
+            await pipe.execute()
+        
+        # Evict least recently used semantic entries beyond the cap
+        overflow = await self.client.zcard(self.SEMANTIC_LRU) - settings.ANALYSIS_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [key for key, _ in await self.client.zpopmin(self.SEMANTIC_LRU, overflow)]
+            await self.client.delete(*[self.SEMANTIC_PREFIX + key for key in evicted])
+    
+    async def stats(self) -> dict:
+        """Hit/miss counters and hit rate"""
+        counters = await self.client.hgetall(self.STATS_KEY) if self.client else {}
+        exact_hits = int(counters.get("exact_hits", 0))
+        semantic_hits = int(counters.get("semantic_hits", 0))
+        misses = int(counters.get("misses", 0))
+        lookups = exact_hits + semantic_hits + misses
+        
+        return {
+            "enabled": self.enabled,
+            "exact_hits": exact_hits,
+            "semantic_hits": semantic_hits,
+            "misses": misses,
+            "hit_rate": round((exact_hits + semantic_hits) / lookups, 4) if lookups else 0.0,
+            "semantic_entries": await self.client.zcard(self.SEMANTIC_LRU) if self.client else 0
+        }
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.incident import Incident, IncidentAction, IncidentStatus
+from app.services.database import AsyncSessionLocal
+from app.services.incident_cache import incident_cache
+from app.services.knowledge_index import normalize
+
+settings = get_settings()
+
+# Incidents that have not been analyzed yet and can still join a group
+UNANALYZED_STATUSES = [IncidentStatus.DETECTED, IncidentStatus.ANALYZING]
+
+def parse_dependencies(raw: str) -> Dict[str, List[str]]:
+    """SERVICE_DEPENDENCIES JSON: {"checkout": ["payments", "postgres"], ...}"""
+    try:
+        dependencies = json.loads(raw or "{}")
+    except json.JSONDecodeError:
+        print("⚠️ SERVICE_DEPENDENCIES is not valid JSON, ignoring it")
+        return {}
+    return {service: list(upstream or []) for service, upstream in dependencies.items()}
+
+class CorrelationService:
+    """
+    Groups incidents that fan out from one upstream failure
+    Two incidents correlate when they were detected within
+    CORRELATION_WINDOW_SECONDS of each other and either their services
+    share an upstream in SERVICE_DEPENDENCIES (a declared service is its
+    own upstream) or their error texts embed at least CORRELATION_SIMILARITY
+    alike. Services missing from SERVICE_DEPENDENCIES, including two
+    incidents of the same one, only correlate by similarity. The first incident of a group claims a correlation_id for
+    itself and its unanalyzed peers and runs one consolidated analysis;
+    every other member reuses it instead of calling the LLM.
+    """
+    
+    def __init__(self, dependencies: Optional[Dict[str, List[str]]] = None):
+        if dependencies is None:
+            dependencies = parse_dependencies(settings.SERVICE_DEPENDENCIES)
+        self.dependencies = dependencies
+        self.declared = set(dependencies) | {service for upstream in dependencies.values() for service in upstream}
+    
+    def upstream(self, service: Optional[str]) -> Set[str]:
+        """The service and everything it transitively depends on"""
+        seen = set()
+        pending = [service] if service else []
+        while pending:
+            current = pending.pop()
+            if current not in seen:
+                seen.add(current)
+                pending.extend(self.dependencies.get(current, []))
+        return seen
+    
+    def services_related(self, first: Optional[str], second: Optional[str]) -> bool:
+        if first not in self.declared or second not in self.declared:
+            return False
+        return bool(self.upstream(first) & self.upstream(second))
+    
+    @staticmethod
+    def signature(incident: Incident) -> str:
+        return f"{incident.error_type}: {incident.title}. {incident.description or ''}"[:1000]
+    
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        from app.services.embedding_service import embedding_batcher
+        
+        return np.vstack(await embedding_batcher.encode_many(texts))
+    
+    async def find_correlated(self, db: AsyncSession, incident: Incident) -> List[Incident]:
+        """
+        Incidents in the time window that correlate with this one
+        Only incidents that can still share an analysis are considered:
+        unanalyzed ones and members of a group.
+        """
+        window = timedelta(seconds=settings.CORRELATION_WINDOW_SECONDS)
+        candidates = (await db.scalars(select(Incident).where(
+            Incident.id != incident.id,
+            Incident.detected_at >= incident.detected_at - window,
+            Incident.detected_at <= incident.detected_at + window,
+            or_(Incident.status.in_(UNANALYZED_STATUSES), Incident.correlation_id.isnot(None))
+        ).order_by(Incident.detected_at.desc()).limit(settings.CORRELATION_MAX_CANDIDATES))).all()
+        
+        related = [c for c in candidates if self.services_related(incident.service_name, c.service_name)]
+        others = [c for c in candidates if c not in related]
+        if others:
+            try:
+                vectors = normalize(await self._embed([self.signature(incident)] + [self.signature(c) for c in others]))
+                similarities = vectors[1:] @ vectors[0]
+                related += [c for c, score in zip(others, similarities) if score >= settings.CORRELATION_SIMILARITY]
+            except Exception as e:
+                print(f"Correlation by similarity unavailable: {e}")
+        return related
+    
+    async def claim(self, incident_id: int) -> Optional[Tuple[str, bool]]:
+        """
+        Put the incident in a correlation group
+        Returns (correlation_id, is_leader), or None when nothing correlates.
+        Claims only touch rows whose correlation_id is still NULL, so two
+        concurrent leaders split the peers instead of overwriting each other.
+        """
+        async with AsyncSessionLocal() as db:
+            incident = await db.get(Incident, incident_id)
+            if incident is None:
+                return None
+            if incident.correlation_id:
+                return incident.correlation_id, False
+            
+            peers = await self.find_correlated(db, incident)
+            if not peers:
+                return None
+            
+            existing = next((peer.correlation_id for peer in peers if peer.correlation_id), None)
+            correlation_id = existing or str(uuid.uuid4())
+            claimed = (await db.execute(update(Incident).where(
+                Incident.id == incident_id,
+                Incident.correlation_id.is_(None)
+            ).values(correlation_id=correlation_id).execution_options(synchronize_session=False))).rowcount
+            if not claimed:
+                # Another leader grouped us in the meantime
+                await db.rollback()
+                await db.refresh(incident)
+                return incident.correlation_id, False
+            
+            if not existing:
+                await db.execute(update(Incident).where(
+                    Incident.id.in_([peer.id for peer in peers]),
+                    Incident.correlation_id.is_(None),
+                    Incident.status.in_(UNANALYZED_STATUSES)
+                ).values(correlation_id=correlation_id).execution_options(synchronize_session=False))
+            await db.commit()
+            await incident_cache.invalidate(incident_id, *[peer.id for peer in peers])
+            return correlation_id, not existing
+    
+    async def members(self, correlation_id: str) -> List[Incident]:
+        """Detached group members, earliest first"""
+        async with AsyncSessionLocal() as db:
+            incidents = (await db.scalars(select(Incident).where(
+                Incident.correlation_id == correlation_id
+            ).order_by(Incident.detected_at, Incident.id))).all()
+            for incident in incidents:
+                db.expunge(incident)
+            return incidents
+    
+    async def group_analysis(self, correlation_id: str, exclude_id: Optional[int] = None) -> Optional[dict]:
+        """
+        The analysis already checkpointed by a member of the group
+        Prefers a usable one; a failed analysis (with "error") is returned
+        only when nothing better exists, so waiters can stop waiting.
+        """
+        query = select(IncidentAction).join(Incident).where(
+            Incident.correlation_id == correlation_id,
+            IncidentAction.action_type == "analysis",
+            IncidentAction.success.in_([1, -1])
+        )
+        if exclude_id is not None:
+            query = query.where(Incident.id != exclude_id)
+        async with AsyncSessionLocal() as db:
+            actions = (await db.scalars(query.order_by(IncidentAction.id))).all()
+        failed = None
+        for action in actions:
+            if action.result and "error" not in action.result:
+                return action.result
+            failed = failed or action.result
+        return failed
+    
+    async def wait_for_analysis(self, correlation_id: str, incident_id: int,
+                                timeout: Optional[float] = None) -> Optional[dict]:
+        """Wait for the group leader's analysis; None if it never arrives"""
+        timeout = settings.CORRELATION_FOLLOWER_TIMEOUT if timeout is None else timeout
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            analysis = await self.group_analysis(correlation_id, exclude_id=incident_id)
+            if analysis or asyncio.get_running_loop().time() >= deadline:
+                return analysis
+            await asyncio.sleep(settings.CORRELATION_POLL_INTERVAL)
+
+correlation_service = CorrelationService()
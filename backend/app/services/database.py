@@ -1,9 +1,26 @@
+from typing import AsyncIterator
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
 
 settings = get_settings()
 
+# Async drivers for the URL schemes DATABASE_URL may use
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the asyncio one"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(hide_password=False)
+
+# Sync engine for scripts, migrations and create_tables.py
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -13,10 +30,22 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db() -> Session:
+# Async engine for the API and the worker, so queries never block the event loop
+ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    # aiosqlite opens a connection per session instead of pooling
+    **({} if ASYNC_DATABASE_URL.startswith("sqlite") else {"pool_size": 10, "max_overflow": 20})
+)
+
+# Objects stay loaded after commit: lazy loads are not possible with asyncio
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def dialect_name(db: AsyncSession) -> str:
+    return db.bind.dialect.name
+
+async def get_db() -> AsyncIterator[AsyncSession]:
     """Dependency for FastAPI routes"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,151 @@
+import hashlib
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.models.incident import Incident, IncidentStatus
+from app.services.incident_cache import incident_cache
+
+settings = get_settings()
+
+OPEN_STATUSES = [IncidentStatus.DETECTED, IncidentStatus.ANALYZING, IncidentStatus.RESOLVING]
+
+# Volatile tokens that differ between repeats of the same alert
+_VOLATILE_PATTERNS = [
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), "<uuid>"),
+    (re.compile(r"0x[0-9a-f]+"), "<hex>"),
+    (re.compile(r"\d+(\.\d+)?"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase text and mask IDs, addresses, numbers and whitespace runs"""
+    text = (text or "").lower()
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+class DeduplicationService:
+    """
+    Fingerprint incoming alerts and coalesce repeats into the open incident
+    A fingerprint maps to its incident in Redis for a sliding window that is
+    extended on every repeat; the database is the fallback when Redis is
+    unavailable or the key has been evicted.
+    """
+    
+    KEY_PREFIX = "incidents:fingerprint:"
+    
+    def __init__(self, redis_service=None, window_seconds: Optional[int] = None):
+        self.client = getattr(redis_service, "client", None)
+        self.window_seconds = window_seconds or settings.DEDUP_WINDOW_SECONDS
+    
+    @staticmethod
+    def fingerprint(service_name: str, error_type: str, title: str, detail: Optional[str] = None) -> str:
+        """
+        Build a stable fingerprint for an alert
+        `detail` is the stack trace (or the description when there is none);
+        it is normalized and hashed so volatile values do not split repeats.
+        """
+        detail_hash = hashlib.sha256(normalize_text(detail).encode()).hexdigest()
+        key = "|".join([
+            (service_name or "unknown").lower(),
+            (error_type or "unknown").lower(),
+            normalize_text(title),
+            detail_hash
+        ])
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    @classmethod
+    def fingerprint_values(cls, values: dict) -> str:
+        """Fingerprint a dict of Incident column values"""
+        return cls.fingerprint(
+            values.get("service_name"),
+            values.get("error_type"),
+            values.get("title"),
+            values.get("stack_trace") or values.get("description")
+        )
+    
+    async def find_duplicates(self, db: AsyncSession, fingerprints: Iterable[str]) -> Dict[str, Incident]:
+        """Return the open incident for each fingerprint seen within the window"""
+        fingerprints = list(dict.fromkeys(fingerprints))
+        if not fingerprints:
+            return {}
+        
+        incident_ids = {}
+        if self.client:
+            try:
+                cached = await self.client.mget([self.KEY_PREFIX + fp for fp in fingerprints])
+                incident_ids = {fp: int(i) for fp, i in zip(fingerprints, cached) if i}
+            except RedisError as e:
+                print(f"⚠️ Fingerprint lookup failed, falling back to the database: {e}")
+        
+        duplicates = {}
+        if incident_ids:
+            incidents = (await db.scalars(select(Incident).where(
+                Incident.id.in_(incident_ids.values()),
+                Incident.status.in_(OPEN_STATUSES)
+            ))).all()
+            duplicates = {i.fingerprint: i for i in incidents}
+        
+        # Fall back to the database for anything Redis did not know about
+        missing = [fp for fp in fingerprints if fp not in duplicates]
+        if missing:
+            since = datetime.utcnow() - timedelta(seconds=self.window_seconds)
+            incidents = (await db.scalars(select(Incident).where(
+                Incident.fingerprint.in_(missing),
+                Incident.status.in_(OPEN_STATUSES),
+                Incident.last_seen_at >= since
+            ).order_by(Incident.id))).all()
+            # Later rows win so the newest open incident is the coalescing target
+            duplicates.update({i.fingerprint: i for i in incidents})
+        
+        return duplicates
+    
+    async def find_duplicate(self, db: AsyncSession, fingerprint: str) -> Optional[Incident]:
+        """Return the open incident for a fingerprint seen within the window"""
+        return (await self.find_duplicates(db, [fingerprint])).get(fingerprint)
+    
+    @staticmethod
+    def record_occurrences(incident: Incident, count: int = 1):
+        """Bump the occurrence counter of a coalesced incident"""
+        incident.occurrence_count = Incident.occurrence_count + count
+        incident.last_seen_at = datetime.utcnow()
+    
+    async def remember(self, fingerprints: Dict[str, int]):
+        """(Re)start the sliding window for fingerprint -> incident ID mappings"""
+        if not self.client or not fingerprints:
+            return
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                self.remember_on(pipe, fingerprints)
+                await pipe.execute()
+        except RedisError as e:
+            # The database fallback in find_duplicates still finds the incident
+            print(f"⚠️ Could not remember fingerprints: {e}")
+    
+    def remember_on(self, pipe, fingerprints: Dict[str, int]):
+        """Queue the window (re)starts of remember on a pipeline the caller executes"""
+        for fp, incident_id in fingerprints.items():
+            pipe.set(self.KEY_PREFIX + fp, incident_id, ex=self.window_seconds)
+    
+    async def coalesce(self, db: AsyncSession, fingerprint: str) -> Optional[Incident]:
+        """
+        Fold a repeat alert into its open incident
+        Returns the existing incident (already committed) or None when the
+        alert is new and the caller should create an incident for it.
+        """
+        duplicate = await self.find_duplicate(db, fingerprint)
+        if not duplicate:
+            return None
+        
+        self.record_occurrences(duplicate)
+        await db.commit()
+        await db.refresh(duplicate)
+        await self.remember({fingerprint: duplicate.id})
+        await incident_cache.invalidate(duplicate.id)
+        return duplicate
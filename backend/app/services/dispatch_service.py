@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.incident import Incident, IncidentStatus
+from app.services.job_queue import JobQueue
+
+settings = get_settings()
+
+class DispatchService:
+    """
+    Durable hand-off of committed incidents to the worker pool
+    An incident is committed before its process_incident job is queued on
+    Redis, so Incident.queued_at records that the job made it onto the
+    stream. Incidents whose enqueue failed keep queued_at NULL; once they
+    are older than JOB_DISPATCH_GRACE_SECONDS (so the request queueing them
+    has finished) they are claimed and queued by the worker's sweep, or
+    straight away when a repeat alert is coalesced into them.
+    """
+    
+    @staticmethod
+    async def mark_queued(db: AsyncSession, incident_ids: Iterable[int]):
+        """Record that the jobs of these incidents are on the queue"""
+        incident_ids = list(incident_ids)
+        if not incident_ids:
+            return
+        
+        await db.execute(update(Incident).where(
+            Incident.id.in_(incident_ids),
+            Incident.queued_at.is_(None)
+        ).values(queued_at=datetime.utcnow()).execution_options(synchronize_session=False))
+        await db.commit()
+    
+    @staticmethod
+    async def _claim(db: AsyncSession, incident_ids: Optional[List[int]], limit: int) -> List[int]:
+        """Atomically take unqueued incidents past the grace period, so concurrent sweeps never share one"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_DISPATCH_GRACE_SECONDS)
+        unqueued = select(Incident.id).where(
+            Incident.queued_at.is_(None),
+            Incident.status == IncidentStatus.DETECTED,
+            Incident.detected_at < cutoff
+        )
+        if incident_ids is not None:
+            unqueued = unqueued.where(Incident.id.in_(incident_ids))
+        
+        claimed = list(await db.scalars(
+            update(Incident)
+            .where(Incident.id.in_(unqueued.order_by(Incident.id).limit(limit)), Incident.queued_at.is_(None))
+            .values(queued_at=datetime.utcnow())
+            .returning(Incident.id)
+            .execution_options(synchronize_session=False)
+        ))
+        await db.commit()
+        return claimed
+    
+    @staticmethod
+    async def queue_unqueued(db: AsyncSession, redis_service, incident_ids: Optional[Iterable[int]] = None,
+                             limit: int = 100) -> int:
+        """
+        Queue the pipelines of incidents whose enqueue never succeeded
+        Restricted to `incident_ids` when given. Claims are released again
+        if Redis fails, so the next sweep retries them. Returns the number
+        of incidents queued.
+        """
+        if incident_ids is not None:
+            incident_ids = list(incident_ids)
+            if not incident_ids:
+                return 0
+        
+        claimed = await DispatchService._claim(db, incident_ids, limit)
+        if not claimed:
+            return 0
+        
+        try:
+            await JobQueue(redis_service.client).enqueue_many(
+                "process_incident",
+                [{"incident_id": incident_id} for incident_id in claimed]
+            )
+        except Exception:
+            await db.execute(update(Incident).where(Incident.id.in_(claimed)).values(
+                queued_at=None
+            ).execution_options(synchronize_session=False))
+            await db.commit()
+            raise
+        return len(claimed)
@@ -1,30 +1,145 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 import numpy as np
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.models.incident import KnowledgeBase
+from app.services.database import AsyncSessionLocal
+from app.services.knowledge_index import KnowledgeIndex, knowledge_index
+
+settings = get_settings()
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Load the SentenceTransformer once per process, on first use"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(settings.EMBEDDING_MODEL)
+    return _model
+
+class EmbeddingBatcher:
+    """
+    Micro-batching queue in front of the shared embedding model
+    Requests that arrive within a few milliseconds of each other are encoded
+    in one `model.encode` call on a worker thread, so inference never blocks
+    the event loop and concurrent callers share a single forward pass.
+    """
+    
+    def __init__(self, max_batch_size: int = None, max_wait_ms: float = None):
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_BATCH_WAIT_MS) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and tasks are bound to the loop that created them
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+    
+    async def encode(self, text: str) -> np.ndarray:
+        """Embed one text, batched with any other pending requests"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        return list(await asyncio.gather(*(self.encode(text) for text in texts)))
+    
+    @staticmethod
+    def _encode(texts: List[str]) -> np.ndarray:
+        return get_model().encode(texts, batch_size=len(texts), convert_to_numpy=True)
+    
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            
+            # Collect whatever else arrives before the batch window closes
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+embedding_batcher = EmbeddingBatcher()
 
 class EmbeddingService:
     """Create embeddings for knowledge base similarity search"""
     
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    @property
+    def model(self):
+        return get_model()
     
     async def create_embedding(self, text: str) -> list:
         """Generate embedding vector for text"""
-        embedding = self.model.encode(text)
+        embedding = await embedding_batcher.encode(text)
         return embedding.tolist()
     
-    async def find_similar_incidents(self, query_text: str, knowledge_base: list, top_k: int = 5):
-        """Find similar past incidents using cosine similarity"""
-        query_embedding = await self.create_embedding(query_text)
-        
-        similarities = []
-        for kb_entry in knowledge_base:
-            kb_embedding = np.array(kb_entry['embedding'])
-            similarity = np.dot(query_embedding, kb_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(kb_embedding)
-            )
-            similarities.append((kb_entry, similarity))
+    async def find_similar_incidents(self, query_text: str, knowledge_base: Optional[list] = None, top_k: int = 5):
+        """
+        Find similar past incidents using cosine similarity
+        Without `knowledge_base` the process-wide knowledge index is searched
+        (after pulling in rows added since its last sync); an explicit list
+        of entries is ranked with a throwaway index of its own.
+        """
+        query_embedding = await embedding_batcher.encode(query_text)
         
-        # Sort by similarity
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        if knowledge_base is not None:
+            index = KnowledgeIndex()
+            index.add_many(range(len(knowledge_base)), [entry['embedding'] for entry in knowledge_base])
+            return [knowledge_base[i] for i, _ in index.search(query_embedding, top_k)]
         
-        return [entry for entry, _ in similarities[:top_k]]
+        async with AsyncSessionLocal() as db:
+            # The index syncs through the sync ORM API on the session's connection
+            await db.run_sync(knowledge_index.sync)
+            matches = knowledge_index.search(query_embedding, top_k)
+            if not matches:
+                return []
+            
+            entries = {
+                entry.id: entry for entry in await db.scalars(select(KnowledgeBase).where(
+                    KnowledgeBase.id.in_([entry_id for entry_id, _ in matches])
+                ))
+            }
+            return [
+                {
+                    "id": entry_id,
+                    "incident_id": entries[entry_id].incident_id,
+                    "error_pattern": entries[entry_id].error_pattern,
+                    "solution": entries[entry_id].solution,
+                    "similarity": similarity
+                }
+                for entry_id, similarity in matches if entry_id in entries
+            ]
@@ -0,0 +1,89 @@
+import asyncio
+import json
+from typing import Optional
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+from app.services.websocket_manager import ConnectionManager
+
+settings = get_settings()
+
+class EventRelay:
+    """
+    Node-local bridge from Redis pub/sub to this process's WebSocket clients
+    Every API process (uvicorn worker, pod) runs one relay holding a single
+    pattern subscription, whatever its number of clients, and hands each
+    event to its own ConnectionManager. Events published by any worker or
+    API node therefore reach every dashboard, whichever node it is
+    connected to. After a lost subscription the relay resubscribes with
+    backoff and tells its clients to resync, since pub/sub does not replay
+    what was published in the meantime.
+    """
+    
+    def __init__(self, redis_service, manager: ConnectionManager, pattern: Optional[str] = None):
+        self.redis_service = redis_service
+        self.manager = manager
+        self.pattern = pattern or settings.WS_RELAY_PATTERN
+        self.relayed = 0
+        self.subscribed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        backoff = settings.WS_RELAY_RETRY_SECONDS
+        resubscribing = False
+        while True:
+            try:
+                await self._listen(resync=resubscribing)
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                print(f"❌ Event relay lost its Redis subscription: {e}")
+            if self.subscribed.is_set():
+                # It had been working; start the backoff over
+                backoff = settings.WS_RELAY_RETRY_SECONDS
+            self.subscribed.clear()
+            resubscribing = True
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, settings.WS_RELAY_RETRY_MAX_SECONDS)
+    
+    async def _listen(self, resync: bool):
+        pubsub = self.redis_service.client.pubsub()
+        try:
+            await pubsub.psubscribe(self.pattern)
+            self.subscribed.set()
+            print(f"👂 Relaying {self.pattern} to WebSocket clients")
+            if resync:
+                # Updates published while we were unsubscribed are gone; clients refetch instead
+                await self.manager.broadcast({"type": "resync"})
+            
+            while True:
+                # Poll rather than listen(): a blocking read on a quiet channel would
+                # hit the pool's socket_timeout and silently reconnect, losing events
+                message = await pubsub.get_message(timeout=1.0)
+                if message and message["type"] == "pmessage":
+                    await self.relay(message["data"])
+        finally:
+            await pubsub.aclose()
+    
+    async def relay(self, raw: str):
+        """Deliver one published event to the local subscribers"""
+        try:
+            event = json.loads(raw)
+        except (TypeError, ValueError):
+            print(f"Ignoring malformed event: {raw!r}")
+            return
+        if isinstance(event, dict):
+            await self.manager.publish(event)
+            self.relayed += 1
@@ -0,0 +1,61 @@
+import importlib.util
+from typing import Dict
+import httpx
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# HTTP/2 needs the optional `h2` package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class HttpClientRegistry:
+    """
+    App-lifetime registry of pooled httpx clients, one per outbound service
+    Reusing a client keeps connections alive between calls, so LLM, Kestra
+    and Slack requests skip the TCP+TLS handshake and share a bounded pool
+    instead of opening a new socket per call.
+    """
+    
+    # name -> setting holding the request timeout in seconds
+    SERVICES = {
+        "llm": "LLM_TIMEOUT",
+        "kestra": "KESTRA_TIMEOUT",
+        "slack": "SLACK_TIMEOUT",
+    }
+    
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+    
+    def _create(self, name: str) -> httpx.AsyncClient:
+        timeout = getattr(settings, self.SERVICES.get(name, "HTTP_TIMEOUT"))
+        return httpx.AsyncClient(
+            http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(timeout, connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Return the shared client for a service, creating it on first use"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name)
+        return client
+    
+    async def start(self):
+        """Open the clients for all known services"""
+        for name in self.SERVICES:
+            self.get(name)
+        print(f"✅ HTTP clients ready (http2={'on' if settings.HTTP2_ENABLED and HTTP2_AVAILABLE else 'off'})")
+    
+    async def close(self):
+        """Close every pooled connection"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+http_clients = HttpClientRegistry()
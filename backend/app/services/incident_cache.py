@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import json
+import uuid
+from typing import Any, Awaitable, Callable, List, Optional
+import orjson
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+class IncidentCache:
+    """
+    Read-through Redis cache for the incident read endpoints
+    Detail and actions responses are keyed on the incident's version
+    counter and list pages on a global list version. A mutation bumps the
+    counters instead of hunting for keys, so stale entries are never read
+    again and just expire. On a miss only the caller that wins the
+    single-flight lock queries the database; concurrent callers wait for
+    it to fill the key. Without Redis every read goes to the database.
+    """
+    
+    PREFIX = "incidents:cache:"
+    LIST_VERSION = "incidents:cache:version:list"
+    
+    def __init__(self):
+        self.redis_service = None
+    
+    def attach_redis(self, redis_service):
+        self.redis_service = redis_service
+    
+    @property
+    def client(self):
+        return getattr(self.redis_service, "client", None)
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.INCIDENT_CACHE_ENABLED and self.client is not None
+    
+    def version_key(self, incident_id: int) -> str:
+        return f"{self.PREFIX}version:{incident_id}"
+    
+    def detail_key(self, incident_id: int, version: int) -> str:
+        return f"{self.PREFIX}detail:{incident_id}:v{version}"
+    
+    def actions_key(self, incident_id: int, version: int) -> str:
+        return f"{self.PREFIX}actions:{incident_id}:v{version}"
+    
+    def list_key(self, params: dict, version: int) -> str:
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.PREFIX}list:v{version}:{digest}"
+    
+    async def read_through(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value of key, loading and storing it under a single-flight lock on a miss"""
+        cached = await self.client.get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+        
+        lock = f"{key}:lock"
+        token = uuid.uuid4().hex
+        lock_ms = int(settings.INCIDENT_CACHE_LOCK_SECONDS * 1000)
+        if await self.client.set(lock, token, nx=True, px=lock_ms):
+            try:
+                value = await load()
+                if value is not None:
+                    await self.client.set(key, orjson.dumps(value), ex=settings.INCIDENT_CACHE_TTL_SECONDS)
+                return value
+            finally:
+                # The lock may have expired and been taken by someone else
+                if await self.client.get(lock) == token:
+                    await self.client.delete(lock)
+        
+        # Another caller is loading this key; wait for it instead of piling onto the database
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.INCIDENT_CACHE_LOCK_WAIT_SECONDS
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.INCIDENT_CACHE_POLL_INTERVAL)
+            cached, holder = await self.client.mget(key, lock)
+            if cached is not None:
+                return orjson.loads(cached)
+            if holder is None:
+                # Released without storing anything (e.g. a 404)
+                break
+        return await load()
+    
+    async def _read(self, version_key: str, make_key: Callable[[int], str], load: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await load()
+        try:
+            version = int(await self.client.get(version_key) or 0)
+            return await self.read_through(make_key(version), load)
+        except RedisError as e:
+            print(f"Incident cache unavailable, reading from the database: {e}")
+            return await load()
+    
+    async def get_incident(self, incident_id: int, load: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        return await self._read(
+            self.version_key(incident_id),
+            lambda version: self.detail_key(incident_id, version),
+            load
+        )
+    
+    async def get_actions(self, incident_id: int, load: Callable[[], Awaitable[List[dict]]]) -> List[dict]:
+        return await self._read(
+            self.version_key(incident_id),
+            lambda version: self.actions_key(incident_id, version),
+            load
+        )
+    
+    async def get_list(self, params: dict, load: Callable[[], Awaitable[Any]]) -> Any:
+        return await self._read(self.LIST_VERSION, lambda version: self.list_key(params, version), load)
+    
+    async def invalidate(self, *incident_ids: int) -> List[int]:
+        """
+        Call after committing a change to these incidents (none for a new one)
+        Every list page is invalidated too, since any change can move an
+        incident in or out of a filtered page. Returns the new versions.
+        """
+        if not self.enabled:
+            return []
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for incident_id in incident_ids:
+                    pipe.incr(self.version_key(incident_id))
+                pipe.incr(self.LIST_VERSION)
+                versions = await pipe.execute()
+            return versions[:-1]
+        except RedisError as e:
+            print(f"Error invalidating incident cache: {e}")
+            return []
+    
+    async def write_through(self, incident_id: int, detail: dict):
+        """Invalidate the incident and store its fresh detail response under the new version"""
+        versions = await self.invalidate(incident_id)
+        if not versions:
+            return
+        try:
+            await self.client.set(
+                self.detail_key(incident_id, versions[0]),
+                orjson.dumps(detail),
+                ex=settings.INCIDENT_CACHE_TTL_SECONDS
+            )
+        except RedisError as e:
+            print(f"Error writing incident cache: {e}")
+
+incident_cache = IncidentCache()
@@ -1,93 +1,287 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
 import asyncio
+from redis.exceptions import RedisError
 
-from app.models.incident import Incident, IncidentAction, IncidentStatus, SeverityLevel
-from app.services.database import SessionLocal
+from app.models.incident import Incident, IncidentAction, IncidentStatus, KnowledgeBase, SeverityLevel
+from app.services.database import AsyncSessionLocal
 from app.services.ai_agent import OumiAgent
 from app.services.kestra_service import KestraService
 from app.services.notification_service import NotificationService
+from app.services.deduplication_service import DeduplicationService
+from app.services.knowledge_index import knowledge_index
+from app.services.correlation_service import correlation_service
+from app.services.incident_cache import incident_cache
+from app.services.redis_service import RedisService
+from app.services.rollup_service import RollupService
+from app.services.dispatch_service import DispatchService
+from app.config import get_settings
+from app.services.websocket_manager import manager
+
+settings = get_settings()
 
 class IncidentProcessor:
+    """
+    Incident pipeline, split into checkpointed stages:
+    
+        analysis -> resolution | embedding | notification -> finalize -> outcome_notification
+    
+    Each completed stage is persisted as an IncidentAction with the stage
+    name as action_type, so a restarted worker resumes after the last
+    completed stage instead of repeating the LLM analysis. The stages in
+    the middle are independent and run concurrently with the Kestra wait.
+    """
+    
+    PIPELINE_STAGES = [
+        "analysis",
+        "resolution",
+        "embedding",
+        "notification",
+        "finalize",
+        "outcome_notification"
+    ]
     
     @staticmethod
-    async def process_incident(incident_id: int):
-        """Main incident processing pipeline"""
-        db = SessionLocal()
+    async def process_incident(incident_id: int, redis_service=None):
+        """
+        Main incident processing pipeline
+        Partial analyses are published through `redis_service` when given
+        (worker), otherwise broadcast to this process's WebSocket clients.
+        """
+        incident = await IncidentProcessor._load_incident(incident_id)
+        if not incident:
+            return
+        
+        checkpoints = await IncidentProcessor._load_checkpoints(incident_id)
+        if "outcome_notification" in checkpoints:
+            print(f"⏭️ Incident #{incident_id} already processed")
+            return
+        if checkpoints:
+            print(f"♻️ Resuming incident #{incident_id} after stages: {', '.join(checkpoints)}")
+        
         try:
-            incident = db.query(Incident).filter(Incident.id == incident_id).first()
-            if not incident:
-                return
-            
-            # Step 1: Analyze with AI Agent
-            print(f"🔍 Analyzing incident #{incident_id}")
-            incident.status = IncidentStatus.ANALYZING
-            db.commit()
-            
-            analysis = await IncidentProcessor._analyze_incident(incident)
+            # Stage 1: Analyze with AI Agent
+            if "analysis" not in checkpoints:
+                print(f"🔍 Analyzing incident #{incident_id}")
+                await IncidentProcessor._update_incident(incident_id, status=IncidentStatus.ANALYZING)
             
-            # Store analysis
-            action = IncidentAction(
-                incident_id=incident.id,
-                action_type="analysis",
-                description="AI-powered root cause analysis",
-                result=analysis,
-                success=1
+            analysis = await IncidentProcessor._run_stage(
+                checkpoints, incident, "analysis", "AI-powered root cause analysis",
+                lambda: IncidentProcessor._analyze_incident(incident, redis_service),
+                # The agent reports LLM failures as an analysis with an "error"; retry those on resume
+                succeeded=lambda result: "error" not in result,
+                on_complete=lambda result: {
+                    "root_cause": result.get("root_cause", "Unknown"),
+                    "resolution_steps": result.get("resolution_steps", [])
+                }
             )
-            db.add(action)
-            
+            if "error" in analysis:
+                # Don't resolve, notify or learn from the placeholder; the worker retries
+                raise RuntimeError(f"Analysis failed: {analysis['error']}")
             incident.root_cause = analysis.get("root_cause", "Unknown")
             incident.resolution_steps = analysis.get("resolution_steps", [])
-            db.commit()
-            
-            # Step 2: Trigger Kestra workflow for automated resolution
-            print(f"⚙️ Triggering resolution workflow for incident #{incident_id}")
-            incident.status = IncidentStatus.RESOLVING
-            db.commit()
-            
-            resolution_result = await IncidentProcessor._execute_resolution(incident, analysis)
             
-            # Step 3: Verify resolution
-            if resolution_result.get("success"):
-                incident.status = IncidentStatus.RESOLVED
-                incident.resolved_at = datetime.utcnow()
+            # Stage 2: Kestra resolution, knowledge-base embedding and the
+            # analysis notification are independent, so run them together
+            if "finalize" not in checkpoints:
+                print(f"⚙️ Triggering resolution workflow for incident #{incident_id}")
+                await IncidentProcessor._update_incident(incident_id, status=IncidentStatus.RESOLVING)
+                incident.status = IncidentStatus.RESOLVING
                 
-                # Add to knowledge base
-                await IncidentProcessor._add_to_knowledge_base(incident, analysis)
-            else:
-                incident.status = IncidentStatus.FAILED
+                results = await asyncio.gather(
+                    IncidentProcessor._run_stage(
+                        checkpoints, incident, "resolution", "Automated resolution via Kestra",
+                        lambda: IncidentProcessor._execute_resolution(incident, analysis),
+                        succeeded=lambda result: bool(result.get("success"))
+                    ),
+                    IncidentProcessor._run_stage(
+                        checkpoints, incident, "embedding", "Knowledge base embedding",
+                        lambda: IncidentProcessor._create_knowledge_embedding(incident),
+                        # The vector goes to the knowledge base entry, not the action log
+                        checkpoint=lambda result: {"error_pattern": result["error_pattern"]}
+                    ),
+                    IncidentProcessor._run_stage(
+                        checkpoints, incident, "notification", "Analysis notification",
+                        lambda: IncidentProcessor._notify(incident)
+                    ),
+                    return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+                resolution_result, knowledge, _ = results
+                
+                # Stage 3: Record the outcome (and the knowledge base entry) atomically
+                checkpoints["finalize"] = await IncidentProcessor._finalize(incident, resolution_result, knowledge)
+                await incident_cache.invalidate(incident_id)
             
-            db.commit()
+            incident.status = IncidentStatus(checkpoints["finalize"]["status"])
             
-            # Step 4: Send notifications
-            await NotificationService.send_incident_update(incident)
+            # Stage 4: Send notifications
+            await IncidentProcessor._run_stage(
+                checkpoints, incident, "outcome_notification", "Outcome notification",
+                lambda: IncidentProcessor._notify(incident)
+            )
             
             print(f"✅ Incident #{incident_id} processed successfully")
             
         except Exception as e:
             print(f"❌ Error processing incident #{incident_id}: {str(e)}")
-            incident.status = IncidentStatus.FAILED
-            db.commit()
-        finally:
-            db.close()
+            await IncidentProcessor._update_incident(incident_id, status=IncidentStatus.FAILED)
+            # Completed stages are checkpointed; let the worker retry the rest
+            raise
     
     @staticmethod
-    async def _analyze_incident(incident: Incident) -> dict:
-        """Analyze incident using Oumi AI agent"""
-        agent = OumiAgent()
+    async def _load_incident(incident_id: int) -> Optional[Incident]:
+        """Load a detached snapshot of the incident for the pipeline stages"""
+        async with AsyncSessionLocal() as db:
+            incident = await db.get(Incident, incident_id)
+            if incident:
+                db.expunge(incident)
+            return incident
+    
+    @staticmethod
+    async def _load_checkpoints(incident_id: int) -> Dict[str, dict]:
+        """Results of the pipeline stages this incident already completed"""
+        async with AsyncSessionLocal() as db:
+            actions = (await db.scalars(select(IncidentAction).where(
+                IncidentAction.incident_id == incident_id,
+                IncidentAction.action_type.in_(IncidentProcessor.PIPELINE_STAGES),
+                IncidentAction.success == 1
+            ))).all()
+            return {action.action_type: action.result for action in actions}
+    
+    @staticmethod
+    async def _update_incident(incident_id: int, **fields):
+        """Update incident columns in a short-lived session"""
+        async with AsyncSessionLocal() as db:
+            async with RollupService.track(db, [incident_id]):
+                await db.execute(update(Incident).where(Incident.id == incident_id).values(**fields))
+            await db.commit()
+        await incident_cache.invalidate(incident_id)
+    
+    @staticmethod
+    async def _run_stage(
+        checkpoints: Dict[str, dict],
+        incident: Incident,
+        stage: str,
+        description: str,
+        run: Callable[[], Awaitable[dict]],
+        succeeded: Callable[[dict], bool] = lambda result: True,
+        on_complete: Optional[Callable[[dict], dict]] = None,
+        checkpoint: Optional[Callable[[dict], dict]] = None
+    ) -> dict:
+        """
+        Run a pipeline stage unless it is already checkpointed
+        The stage result is stored as an IncidentAction (only the part
+        `checkpoint` selects, when given); `on_complete` maps it to incident
+        columns that are written in the same transaction.
+        """
+        if stage in checkpoints:
+            return checkpoints[stage]
         
-        context = {
+        result = await run() or {}
+        success = succeeded(result)
+        
+        async with AsyncSessionLocal() as db:
+            db.add(IncidentAction(
+                incident_id=incident.id,
+                action_type=stage,
+                description=description,
+                result=checkpoint(result) if checkpoint else result,
+                success=1 if success else -1
+            ))
+            if on_complete:
+                await db.execute(update(Incident).where(Incident.id == incident.id).values(**on_complete(result)))
+            await db.commit()
+        await incident_cache.invalidate(incident.id)
+        
+        if success:
+            checkpoints[stage] = result
+        return result
+    
+    @staticmethod
+    def _analysis_context(incident: Incident) -> dict:
+        return {
             "title": incident.title,
             "description": incident.description,
             "service": incident.service_name,
             "error_type": incident.error_type,
             "stack_trace": incident.stack_trace,
+            "severity": incident.severity.value if incident.severity else None,
             "metadata": incident.incident_metadata  # CHANGED
         }
+    
+    @staticmethod
+    async def _analyze_incident(incident: Incident, redis_service=None) -> dict:
+        """
+        Analyze incident using Oumi AI agent, streaming partial results to the dashboard
+        Correlated incidents share one analysis: the group leader analyzes
+        the whole group in one call and the other members reuse its result.
+        """
+        agent = OumiAgent()
+        context = IncidentProcessor._analysis_context(incident)
         
-        analysis = await agent.analyze_incident(context)
+        async def push_partial(fields: dict):
+            await IncidentProcessor._publish_analysis(incident, redis_service, fields, partial=True)
+        
+        group = await correlation_service.claim(incident.id) if settings.CORRELATION_ENABLED else None
+        if group is None:
+            analysis = await agent.analyze_incident(context, on_partial=push_partial)
+        else:
+            correlation_id, leader = group
+            incident.correlation_id = correlation_id
+            analysis = None
+            if leader:
+                analysis = await IncidentProcessor._analyze_group(agent, correlation_id, push_partial)
+            else:
+                analysis = await correlation_service.wait_for_analysis(correlation_id, incident.id)
+                if analysis and "error" not in analysis:
+                    print(f"🔗 Incident #{incident.id} reuses the analysis of correlation group {correlation_id}")
+            if not analysis or "error" in analysis:
+                analysis = await agent.analyze_incident(context, on_partial=push_partial)
+            analysis = {**analysis, "correlation_id": correlation_id}
+        
+        await IncidentProcessor._publish_analysis(incident, redis_service, {
+            "root_cause": analysis.get("root_cause"),
+            "resolution_steps": analysis.get("resolution_steps", [])
+        }, partial=False)
         return analysis
     
+    @staticmethod
+    async def _analyze_group(agent: OumiAgent, correlation_id: str, on_partial) -> dict:
+        """One LLM call for every incident in the correlation group"""
+        # Let the rest of the burst reach the group before building the prompt
+        await asyncio.sleep(settings.CORRELATION_GATHER_SECONDS)
+        members = await correlation_service.members(correlation_id)
+        
+        print(f"🔗 Analyzing correlation group {correlation_id} ({len(members)} incidents) in one call")
+        contexts = [
+            IncidentProcessor._analysis_context(member)
+            for member in members[:settings.CORRELATION_MAX_GROUP_PROMPT]
+        ]
+        return await agent.analyze_incident_group(contexts, on_partial=on_partial)
+    
+    @staticmethod
+    async def _publish_analysis(incident: Incident, redis_service, fields: dict, partial: bool):
+        """Push (partial) analysis fields to WebSocket clients watching the incident"""
+        data = {"analysis": fields, "partial": partial}
+        try:
+            if redis_service is not None:
+                await redis_service.publish_incident_update(
+                    incident.id, IncidentStatus.ANALYZING.value, data, incident.service_name, incident.severity
+                )
+            else:
+                await manager.publish({
+                    **RedisService.incident_event(incident.id, incident.service_name, incident.severity),
+                    "status": IncidentStatus.ANALYZING.value,
+                    "data": data
+                })
+        except Exception as e:
+            print(f"Error publishing analysis update: {e}")
+    
     @staticmethod
     async def _execute_resolution(incident: Incident, analysis: dict) -> dict:
         """Execute automated resolution via Kestra"""
@@ -108,37 +302,126 @@ class IncidentProcessor:
         return result
     
     @staticmethod
-    async def _add_to_knowledge_base(incident: Incident, analysis: dict):
-        """Add incident solution to knowledge base for future reference"""
-        from app.models.incident import KnowledgeBase
+    async def _create_knowledge_embedding(incident: Incident) -> dict:
+        """Embed the error pattern ahead of time for the knowledge base entry"""
         from app.services.embedding_service import EmbeddingService
         
-        db = SessionLocal()
-        try:
-            embedding_service = EmbeddingService()
-            
-            # Create embedding of error pattern
-            error_pattern = f"{incident.error_type}: {incident.description}"
-            embedding = await embedding_service.create_embedding(error_pattern)
+        embedding_service = EmbeddingService()
+        
+        # Create embedding of error pattern
+        error_pattern = f"{incident.error_type}: {incident.description}"
+        embedding = await embedding_service.create_embedding(error_pattern)
+        
+        return {"error_pattern": error_pattern, "embedding": embedding}
+    
+    @staticmethod
+    async def _notify(incident: Incident) -> dict:
+        await NotificationService.send_incident_update(incident)
+        return {"status": incident.status.value}
+    
+    @staticmethod
+    async def _finalize(incident: Incident, resolution_result: dict, knowledge: dict) -> dict:
+        """Record the resolution outcome, knowledge base entry and checkpoint in one transaction"""
+        resolved = bool(resolution_result.get("success"))
+        if resolved and "embedding" not in knowledge:
+            # Resumed from a checkpoint, which keeps only the error pattern
+            knowledge = await IncidentProcessor._create_knowledge_embedding(incident)
+        
+        async with AsyncSessionLocal() as db:
+            kb_entry = None
+            fields = {"status": IncidentStatus.RESOLVED if resolved else IncidentStatus.FAILED}
+            if resolved:
+                fields["resolved_at"] = datetime.utcnow()
+                # Add to knowledge base
+                kb_entry = IncidentProcessor._add_to_knowledge_base(db, incident, knowledge)
             
-            kb_entry = KnowledgeBase(
+            result = {"status": fields["status"].value}
+            async with RollupService.track(db, [incident.id]):
+                await db.execute(update(Incident).where(Incident.id == incident.id).values(**fields))
+            db.add(IncidentAction(
                 incident_id=incident.id,
-                error_pattern=error_pattern,
-                solution=incident.root_cause,
-                embedding=embedding,
-                success_rate=100  # Will be updated based on feedback
-            )
+                action_type="finalize",
+                description="Resolution outcome",
+                result=result,
+                success=1
+            ))
+            await db.commit()
             
-            db.add(kb_entry)
-            db.commit()
-        finally:
-            db.close()
+            if kb_entry is not None:
+                knowledge_index.add(kb_entry.id, knowledge["embedding"])
+            return result
     
     @staticmethod
-    async def create_from_logs(log_payload: dict):
-        """Create incident from log entry"""
-        db = SessionLocal()
+    def _add_to_knowledge_base(db: AsyncSession, incident: Incident, knowledge: dict) -> KnowledgeBase:
+        """Add incident solution to knowledge base for future reference"""
+        kb_entry = KnowledgeBase(
+            incident_id=incident.id,
+            error_pattern=knowledge["error_pattern"],
+            solution=incident.root_cause,
+            embedding=knowledge["embedding"],
+            success_rate=100  # Will be updated based on feedback
+        )
+        
+        db.add(kb_entry)
+        return kb_entry
+    
+    @staticmethod
+    async def _create_or_coalesce(db: AsyncSession, incident: Incident, redis_service=None) -> Optional[Incident]:
+        """
+        Persist a new incident unless it repeats an open one
+        Returns the new incident, or None when the alert was coalesced.
+        """
+        dedup = DeduplicationService(redis_service)
+        incident.fingerprint = dedup.fingerprint(
+            incident.service_name,
+            incident.error_type,
+            incident.title,
+            incident.stack_trace or incident.description
+        )
+        
+        duplicate = await dedup.coalesce(db, incident.fingerprint)
+        if duplicate:
+            print(f"🔁 Coalesced alert into incident #{duplicate.id} ({duplicate.occurrence_count} occurrences)")
+            if duplicate.queued_at is None and redis_service is not None:
+                try:
+                    await DispatchService.queue_unqueued(db, redis_service, [duplicate.id])
+                except RedisError as e:
+                    print(f"⚠️ Could not queue incident #{duplicate.id}: {e}")
+            return None
+        
+        db.add(incident)
+        await db.flush()
+        await RollupService.record_created(db, [incident.id])
+        await db.commit()
+        await dedup.remember({incident.fingerprint: incident.id})
+        await incident_cache.invalidate()
+        return incident
+    
+    @staticmethod
+    async def _start_processing(incident_id: int, redis_service=None):
+        """
+        Queue the pipeline as its own job when a queue is available, so a
+        retry of the pipeline never re-runs incident creation
+        """
+        if redis_service is None:
+            await IncidentProcessor.process_incident(incident_id)
+            return
+        
+        from app.services.job_queue import JobQueue
         try:
+            await JobQueue(redis_service.client).enqueue("process_incident", {"incident_id": incident_id})
+        except RedisError as e:
+            # Retrying the creating job would only coalesce into this incident;
+            # the dispatch sweep queues it instead
+            print(f"⚠️ Could not queue incident #{incident_id}: {e}")
+            return
+        async with AsyncSessionLocal() as db:
+            await DispatchService.mark_queued(db, [incident_id])
+    
+    @staticmethod
+    async def create_from_logs(log_payload: dict, redis_service=None):
+        """Create incident from log entry"""
+        async with AsyncSessionLocal() as db:
             incident = Incident(
                 title=f"Error in {log_payload.get('service', 'Unknown Service')}",
                 description=log_payload.get("message", ""),
@@ -148,19 +431,15 @@ class IncidentProcessor:
                 error_type="log_error",
                 incident_metadata=log_payload  # CHANGED
             )
-            db.add(incident)
-            db.commit()
-            db.refresh(incident)
+            incident = await IncidentProcessor._create_or_coalesce(db, incident, redis_service)
             
-            await IncidentProcessor.process_incident(incident.id)
-        finally:
-            db.close()
+            if incident:
+                await IncidentProcessor._start_processing(incident.id, redis_service)
     
     @staticmethod
-    async def create_from_metrics(metrics_payload: dict):
+    async def create_from_metrics(metrics_payload: dict, redis_service=None):
         """Create incident from metrics threshold breach"""
-        db = SessionLocal()
-        try:
+        async with AsyncSessionLocal() as db:
             incident = Incident(
                 title=f"Threshold breach: {metrics_payload.get('metric_name')}",
                 description=f"Value {metrics_payload.get('value')} exceeded threshold {metrics_payload.get('threshold')}",
@@ -170,10 +449,7 @@ class IncidentProcessor:
                 error_type="threshold_breach",
                 incident_metadata=metrics_payload  # CHANGED
             )
-            db.add(incident)
-            db.commit()
-            db.refresh(incident)
+            incident = await IncidentProcessor._create_or_coalesce(db, incident, redis_service)
             
-            await IncidentProcessor.process_incident(incident.id)
-        finally:
-            db.close()
+            if incident:
+                await IncidentProcessor._start_processing(incident.id, redis_service)
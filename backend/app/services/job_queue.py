@@ -0,0 +1,133 @@
+import json
+from typing import Dict, List, Optional
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+class JobQueue:
+    """
+    Durable job queue on Redis Streams
+    Jobs are XADDed to one stream and consumed through a consumer group, so
+    every job is delivered to exactly one worker and stays pending until it
+    is acked. Failed jobs are re-queued with an attempt counter and moved to
+    a dead-letter stream once they run out of attempts.
+    """
+    
+    def __init__(self, client: redis.Redis, stream: Optional[str] = None, group: Optional[str] = None):
+        self.client = client
+        self.stream = stream or settings.JOB_STREAM
+        self.group = group or settings.JOB_CONSUMER_GROUP
+        self.dead_letter_stream = f"{self.stream}:dead"
+        self.max_attempts = settings.JOB_MAX_ATTEMPTS
+    
+    @staticmethod
+    def _fields(job_type: str, payload: dict, attempts: int = 0) -> dict:
+        return {"type": job_type, "payload": json.dumps(payload), "attempts": attempts}
+    
+    @staticmethod
+    def _job(message_id: str, fields: dict) -> Dict:
+        return {
+            "id": message_id,
+            "type": fields["type"],
+            "payload": json.loads(fields["payload"]),
+            "attempts": int(fields.get("attempts", 0))
+        }
+    
+    async def ensure_group(self):
+        """Create the consumer group (and stream) if they do not exist yet"""
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def enqueue(self, job_type: str, payload: dict) -> str:
+        """Append a job to the stream"""
+        return await self.client.xadd(
+            self.stream,
+            self._fields(job_type, payload),
+            maxlen=settings.JOB_STREAM_MAXLEN,
+            approximate=True
+        )
+    
+    def enqueue_on(self, pipe, job_type: str, payloads: List[dict]):
+        """Queue the XADDs for several jobs on a pipeline the caller executes"""
+        for payload in payloads:
+            pipe.xadd(
+                self.stream,
+                self._fields(job_type, payload),
+                maxlen=settings.JOB_STREAM_MAXLEN,
+                approximate=True
+            )
+    
+    async def enqueue_many(self, job_type: str, payloads: List[dict]) -> List[str]:
+        """Append several jobs in one pipelined round-trip"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            self.enqueue_on(pipe, job_type, payloads)
+            return await pipe.execute()
+    
+    async def read(self, consumer: str, count: int = 1, block_ms: int = 5000) -> List[Dict]:
+        """Read new jobs for this consumer, blocking up to block_ms"""
+        response = await self.client.xreadgroup(
+            self.group,
+            consumer,
+            {self.stream: ">"},
+            count=count,
+            block=block_ms
+        )
+        
+        jobs = []
+        for _, messages in response or []:
+            jobs.extend(self._job(message_id, fields) for message_id, fields in messages)
+        return jobs
+    
+    async def ack(self, job: Dict):
+        """Mark a job as done"""
+        await self.client.xack(self.stream, self.group, job["id"])
+    
+    async def retry(self, job: Dict, error: str) -> bool:
+        """
+        Re-queue a failed job, or dead-letter it when out of attempts
+        Returns True when the job was re-queued.
+        """
+        attempts = job["attempts"] + 1
+        requeue = attempts < self.max_attempts
+        
+        async with self.client.pipeline(transaction=True) as pipe:
+            if requeue:
+                pipe.xadd(self.stream, self._fields(job["type"], job["payload"], attempts))
+            else:
+                fields = self._fields(job["type"], job["payload"], attempts)
+                fields["error"] = error[:1000]
+                pipe.xadd(self.dead_letter_stream, fields)
+            pipe.xack(self.stream, self.group, job["id"])
+            await pipe.execute()
+        
+        return requeue
+    
+    async def recover_stale(self, consumer: str, min_idle_ms: int, count: int = 100) -> int:
+        """
+        Re-queue jobs left pending by a worker that died mid-job
+        Each recovery counts as an attempt so a job that keeps crashing its
+        worker ends up in the dead-letter stream.
+        """
+        response = await self.client.xautoclaim(
+            self.stream,
+            self.group,
+            consumer,
+            min_idle_time=min_idle_ms,
+            start_id="0-0",
+            count=count
+        )
+        messages = response[1]
+        
+        for message_id, fields in messages:
+            if fields:  # Entries trimmed from the stream come back empty
+                await self.retry(self._job(message_id, fields), "Worker stopped before acking job")
+            else:
+                await self.client.xack(self.stream, self.group, message_id)
+        
+        return len(messages)
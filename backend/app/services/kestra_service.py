@@ -1,9 +1,34 @@
-import httpx
-from typing import Dict, Any
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
 from app.config import get_settings
+from app.services.http_client import http_clients
 
 settings = get_settings()
 
+TERMINAL_STATES = ["SUCCESS", "FAILED", "KILLED"]
+
+def execution_result(execution: Dict) -> Optional[Dict]:
+    """Map a Kestra execution to a resolution result, or None while it is still running"""
+    state = execution.get("state", {})
+    current = state.get("current")
+    
+    if current == "SUCCESS":
+        return {
+            "success": True,
+            "execution_id": execution.get("id"),
+            "outputs": execution.get("outputs", {}),
+            "duration": state.get("duration")
+        }
+    elif current in TERMINAL_STATES:
+        return {
+            "success": False,
+            "execution_id": execution.get("id"),
+            "error": state.get("histories", [])
+        }
+    return None
+
 class KestraService:
     """
     Service to interact with Kestra for workflow orchestration
@@ -29,94 +54,203 @@ class KestraService:
         Returns:
             Execution result with status and outputs
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/api/v1/executions/{workflow_id}",
-                    headers=self.headers,
-                    json={"inputs": inputs},
-                    timeout=60.0
-                )
+        client = http_clients.get("kestra")
+        try:
+            response = await client.post(
+                f"{self.base_url}/api/v1/executions/{workflow_id}",
+                headers=self.headers,
+                json={"inputs": inputs}
+            )
+            
+            if response.status_code == 200:
+                execution_data = response.json()
                 
-                if response.status_code == 200:
-                    execution_data = response.json()
-                    
-                    # Poll for execution completion
-                    execution_id = execution_data.get("id")
-                    result = await self._wait_for_execution(execution_id)
-                    
-                    return result
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Failed to trigger workflow: {response.text}"
-                    }
-                    
-            except Exception as e:
+                # Poll for execution completion
+                execution_id = execution_data.get("id")
+                result = await self._wait_for_execution(execution_id, execution_data.get("flowId", workflow_id))
+                
+                return result
+            else:
                 return {
                     "success": False,
-                    "error": str(e)
+                    "error": f"Failed to trigger workflow: {response.text}"
                 }
-    
-    async def _wait_for_execution(self, execution_id: str, max_wait: int = 300) -> Dict:
-        """Poll Kestra for execution completion"""
-        import asyncio
-        
-        async with httpx.AsyncClient() as client:
-            for _ in range(max_wait // 5):  # Poll every 5 seconds
-                response = await client.get(
-                    f"{self.base_url}/api/v1/executions/{execution_id}",
-                    headers=self.headers
-                )
-                
-                if response.status_code == 200:
-                    execution = response.json()
-                    state = execution.get("state", {}).get("current")
-                    
-                    if state == "SUCCESS":
-                        return {
-                            "success": True,
-                            "execution_id": execution_id,
-                            "outputs": execution.get("outputs", {}),
-                            "duration": execution.get("state", {}).get("duration")
-                        }
-                    elif state in ["FAILED", "KILLED"]:
-                        return {
-                            "success": False,
-                            "execution_id": execution_id,
-                            "error": execution.get("state", {}).get("histories", [])
-                        }
                 
-                await asyncio.sleep(5)
-        
-        return {
-            "success": False,
-            "error": "Execution timeout"
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def _wait_for_execution(self, execution_id: str, flow_id: Optional[str] = None, max_wait: int = 300) -> Dict:
+        """Wait for execution completion via the shared execution tracker"""
+        return await execution_tracker.wait(execution_id, max_wait, flow_id)
+    
+    async def search_finished_executions(self, since: datetime, flow_id: Optional[str] = None,
+                                         page: int = 1, size: int = 100) -> list:
+        """One page of executions (of `flow_id`, if given) that reached a terminal state since `since`"""
+        params = {
+            "state": TERMINAL_STATES,
+            "startDate": since.isoformat() + "Z",
+            "page": page,
+            "size": size
         }
+        if flow_id:
+            params["flowId"] = flow_id
+        response = await http_clients.get("kestra").get(
+            f"{self.base_url}/api/v1/executions/search",
+            headers=self.headers,
+            params=params
+        )
+        response.raise_for_status()
+        return response.json().get("results", [])
     
     async def create_workflow(self, workflow_definition: Dict) -> Dict:
         """Create a new workflow in Kestra"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/api/v1/flows",
-                headers=self.headers,
-                json=workflow_definition
-            )
-            
-            return response.json()
+        response = await http_clients.get("kestra").post(
+            f"{self.base_url}/api/v1/flows",
+            headers=self.headers,
+            json=workflow_definition
+        )
+        
+        return response.json()
     
     async def list_executions(self, workflow_id: str, limit: int = 10) -> list:
         """Get recent executions of a workflow"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/api/v1/executions",
-                headers=self.headers,
-                params={
-                    "flowId": workflow_id,
-                    "size": limit
-                }
-            )
+        response = await http_clients.get("kestra").get(
+            f"{self.base_url}/api/v1/executions",
+            headers=self.headers,
+            params={
+                "flowId": workflow_id,
+                "size": limit
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json().get("results", [])
+        return []
+
+class ExecutionTracker:
+    """
+    Process-wide completion tracking for Kestra executions
+    Each waiter parks on an asyncio future keyed by execution ID. Futures are
+    completed by the flow's completion callback (relayed to every process
+    over Redis pub/sub) or, as a fallback, by one shared poller that pages
+    through each pending flow's finished executions once per tick.
+    """
+    
+    CHANNEL = "kestra:executions"
+    
+    def __init__(self):
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._started_at: Dict[str, datetime] = {}
+        self._flows: Dict[str, Optional[str]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.redis_service = None
+    
+    def attach_redis(self, redis_service):
+        """Receive completion callbacks relayed through Redis"""
+        self.redis_service = redis_service
+    
+    @property
+    def pending(self) -> int:
+        return len(self._waiters)
+    
+    async def wait(self, execution_id: str, timeout: float, flow_id: Optional[str] = None) -> Dict:
+        """Park until the execution finishes or `timeout` seconds pass"""
+        future = self._waiters.get(execution_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[execution_id] = future
+            self._started_at[execution_id] = datetime.utcnow()
+            self._flows[execution_id] = flow_id
+        self._ensure_background_tasks()
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return {
+                "success": False,
+                "execution_id": execution_id,
+                "error": "Execution timeout"
+            }
+        finally:
+            self._waiters.pop(execution_id, None)
+            self._started_at.pop(execution_id, None)
+            self._flows.pop(execution_id, None)
+    
+    def complete(self, execution: Dict) -> bool:
+        """Wake the waiter of a finished execution; returns True if one was waiting"""
+        result = execution_result(execution)
+        future = self._waiters.get(execution.get("id"))
+        
+        if result is None or future is None or future.done():
+            return False
+        future.set_result(result)
+        return True
+    
+    async def publish_completion(self, execution: Dict):
+        """Fan a completion callback out to the trackers of every process"""
+        self.complete(execution)
+        if self.redis_service and self.redis_service.client:
+            await self.redis_service.client.publish(self.CHANNEL, json.dumps(execution))
+    
+    def _ensure_background_tasks(self):
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        if self.redis_service and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def _poll(self):
+        """One poll loop for all outstanding executions of this process"""
+        kestra = KestraService()
+        
+        while self._waiters:
+            await asyncio.sleep(settings.KESTRA_POLL_INTERVAL)
+            if not self._waiters:
+                break
             
-            if response.status_code == 200:
-                return response.json().get("results", [])
-            return []
+            try:
+                await self._poll_once(kestra)
+            except Exception as e:
+                print(f"❌ Error polling Kestra executions: {e}")
+    
+    async def _poll_once(self, kestra: KestraService):
+        """Page through the finished executions of every flow with waiters"""
+        since = min(self._started_at.values()) - timedelta(minutes=1)
+        size = settings.KESTRA_POLL_PAGE_SIZE
+        
+        for flow_id in set(self._flows.values()):
+            page = 1
+            while self._pending_for(flow_id):
+                executions = await kestra.search_finished_executions(since, flow_id, page=page, size=size)
+                for execution in executions:
+                    self.complete(execution)
+                if len(executions) < size:
+                    break
+                page += 1
+    
+    def _pending_for(self, flow_id: Optional[str]) -> bool:
+        return any(
+            flow == flow_id and not self._waiters[execution_id].done()
+            for execution_id, flow in self._flows.items()
+        )
+    
+    async def _listen(self):
+        """Complete waiters from callbacks received by any API process"""
+        pubsub = self.redis_service.client.pubsub()
+        await pubsub.subscribe(self.CHANNEL)
+        
+        try:
+            while self._waiters:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message["type"] == "message":
+                    self.complete(json.loads(message["data"]))
+        except Exception as e:
+            print(f"❌ Error listening for Kestra callbacks: {e}")
+        finally:
+            await pubsub.unsubscribe(self.CHANNEL)
+            await pubsub.close()
+
+execution_tracker = ExecutionTracker()
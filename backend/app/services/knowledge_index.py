@@ -0,0 +1,177 @@
+import importlib.util
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.incident import KnowledgeBase
+
+settings = get_settings()
+
+# Approximate search needs the optional `hnswlib` package
+HNSW_AVAILABLE = importlib.util.find_spec("hnswlib") is not None
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so cosine similarity becomes a dot product"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class KnowledgeIndex:
+    """
+    In-memory similarity index over knowledge base embeddings
+    Embeddings are stored pre-normalized in one contiguous float32 matrix,
+    so a top-k query is a single matrix-vector product plus argpartition.
+    With mode="hnsw" (and hnswlib installed) queries go to an HNSW graph
+    instead, which stays fast for very large corpora at a small recall cost.
+    """
+    
+    def __init__(self, mode: str = "exact", initial_capacity: int = 1024):
+        if mode == "hnsw" and not HNSW_AVAILABLE:
+            print("⚠️ hnswlib not installed, falling back to exact knowledge base search")
+            mode = "exact"
+        
+        self.mode = mode
+        self.dim: Optional[int] = None
+        self._capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._ids = np.empty(initial_capacity, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+        self._size = 0
+        self._hnsw = None
+        # Highest knowledge base id seen by sync(); entries added locally do not move it
+        self.synced_id = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __contains__(self, entry_id: int) -> bool:
+        return entry_id in self._rows
+    
+    def _init_storage(self, dim: int):
+        self.dim = dim
+        self._matrix = np.empty((self._capacity, dim), dtype=np.float32)
+        
+        if self.mode == "hnsw":
+            import hnswlib
+            self._hnsw = hnswlib.Index(space="ip", dim=dim)
+            self._hnsw.init_index(
+                max_elements=self._capacity,
+                M=settings.KB_INDEX_HNSW_M,
+                ef_construction=settings.KB_INDEX_HNSW_EF_CONSTRUCTION,
+                allow_replace_deleted=True
+            )
+            self._hnsw.set_ef(settings.KB_INDEX_HNSW_EF)
+    
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        
+        self._matrix, self._ids, self._capacity = matrix, ids, capacity
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+    
+    def add_many(self, entry_ids: Iterable[int], embeddings) -> None:
+        """Add (or replace) entries; embeddings is an (n, dim) array-like"""
+        entry_ids = [int(i) for i in entry_ids]
+        if not entry_ids:
+            return
+        
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(entry_ids), -1))
+        if self.dim is None:
+            self._init_storage(vectors.shape[1])
+        
+        for entry_id in entry_ids:
+            if entry_id in self._rows:
+                self.remove(entry_id)
+        
+        self._grow(self._size + len(entry_ids))
+        start, end = self._size, self._size + len(entry_ids)
+        self._matrix[start:end] = vectors
+        self._ids[start:end] = entry_ids
+        for row, entry_id in enumerate(entry_ids, start):
+            self._rows[entry_id] = row
+        self._size = end
+        
+        if self._hnsw is not None:
+            self._hnsw.add_items(vectors, np.asarray(entry_ids), replace_deleted=True)
+    
+    def add(self, entry_id: int, embedding) -> None:
+        self.add_many([entry_id], [embedding])
+    
+    def remove(self, entry_id: int) -> bool:
+        """Remove an entry by moving the last row into its slot"""
+        row = self._rows.pop(entry_id, None)
+        if row is None:
+            return False
+        
+        last = self._size - 1
+        if row != last:
+            moved_id = int(self._ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._size = last
+        
+        if self._hnsw is not None:
+            self._hnsw.mark_deleted(entry_id)
+        return True
+    
+    def search(self, query, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Return up to top_k (entry_id, cosine similarity) pairs, best first"""
+        if self._size == 0:
+            return []
+        
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        k = min(top_k, self._size)
+        
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(query, k=k)
+            # hnswlib's inner-product distance is 1 - dot
+            return [(int(i), float(1 - d)) for i, d in zip(labels[0], distances[0])]
+        
+        scores = self._matrix[:self._size] @ query
+        if k < self._size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(self._size)
+        top = top[np.argsort(-scores[top])]
+        
+        return [(int(self._ids[i]), float(scores[i])) for i in top]
+    
+    def sync(self, db: Session) -> int:
+        """
+        Load knowledge base rows added since the last sync (e.g. by other workers)
+        Ids are allocated before commit, so a row can become visible after a
+        higher one was synced; the last KB_INDEX_SYNC_LOOKBACK ids below the
+        watermark are re-checked for entries the index is still missing.
+        """
+        candidates = db.query(KnowledgeBase.id).filter(
+            KnowledgeBase.id > self.synced_id - settings.KB_INDEX_SYNC_LOOKBACK,
+            KnowledgeBase.embedding.isnot(None)
+        ).all()
+        if not candidates:
+            return 0
+        self.synced_id = max(self.synced_id, max(row.id for row in candidates))
+        
+        missing = [row.id for row in candidates if row.id not in self._rows]
+        if not missing:
+            return 0
+        rows = db.query(KnowledgeBase.id, KnowledgeBase.embedding).filter(
+            KnowledgeBase.id.in_(missing)
+        ).order_by(KnowledgeBase.id).all()
+        
+        if rows:
+            self.add_many([row.id for row in rows], [row.embedding for row in rows])
+        return len(rows)
+
+knowledge_index = KnowledgeIndex(mode=settings.KB_INDEX_MODE)
@@ -0,0 +1,222 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+
+from app.config import get_settings
+
+settings = get_settings()
+
+class NoProviderAvailable(Exception):
+    """Every LLM provider's circuit breaker is open"""
+
+class ProviderStats:
+    """Rolling latency and error-rate window for one provider/model"""
+    
+    def __init__(self, window: Optional[int] = None):
+        window = window or settings.LLM_STATS_WINDOW
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+    
+    def record(self, latency: Optional[float], ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return float(np.percentile(self.latencies, q))
+    
+    @property
+    def p50(self) -> Optional[float]:
+        return self.percentile(50)
+    
+    @property
+    def p95(self) -> Optional[float]:
+        return self.percentile(95)
+    
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+class CircuitBreaker:
+    """
+    Closed -> open when the rolling error rate crosses the threshold
+    After the cooldown one trial request is let through (half-open); its
+    outcome closes the breaker again or re-opens it for another cooldown.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, error_rate: Optional[float] = None, min_requests: Optional[int] = None,
+                 cooldown: Optional[float] = None):
+        self.error_rate = settings.LLM_BREAKER_ERROR_RATE if error_rate is None else error_rate
+        self.min_requests = settings.LLM_BREAKER_MIN_REQUESTS if min_requests is None else min_requests
+        self.cooldown = settings.LLM_BREAKER_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+    
+    def can_attempt(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            return not self.trial_in_flight
+        return self.state == self.CLOSED
+    
+    def start(self):
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = True
+    
+    def cancelled(self):
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = False
+    
+    def record(self, stats: ProviderStats, ok: bool):
+        if self.state == self.HALF_OPEN:
+            if ok:
+                self.state = self.CLOSED
+                # Start the closed period with a clean slate
+                stats.outcomes.clear()
+            else:
+                self._open()
+        elif not ok and len(stats.outcomes) >= self.min_requests and stats.error_rate >= self.error_rate:
+            self._open()
+    
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+class LLMProvider:
+    """One OpenAI-compatible endpoint/model plus its scheduler, stats and breaker"""
+    
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, scheduler):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.scheduler = scheduler
+        self.stats = ProviderStats()
+        self.breaker = CircuitBreaker()
+    
+    def to_dict(self) -> dict:
+        p50, p95 = self.stats.p50, self.stats.p95
+        return {
+            "name": self.name,
+            "model": self.model,
+            "state": self.breaker.state,
+            "requests": len(self.stats.outcomes),
+            "error_rate": round(self.stats.error_rate, 4),
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+        }
+
+class LLMRouter:
+    """
+    Routes completions across LLM providers by observed latency and health
+    The fastest healthy provider (by rolling p50) gets the request. If it
+    has not answered by its own p95, a hedged duplicate goes to the next
+    provider with idle capacity and the first answer wins, the other is
+    cancelled. Failures fail over to the next provider straight away and
+    open a provider's circuit breaker once its error rate is too high.
+    """
+    
+    def __init__(self, providers: List[LLMProvider], hedge: Optional[bool] = None):
+        self.providers = providers
+        self.hedge = settings.LLM_HEDGE_ENABLED if hedge is None else hedge
+    
+    def available(self) -> List[LLMProvider]:
+        """Healthy providers, fastest first; configured order until measured"""
+        healthy = [
+            (index, provider) for index, provider in enumerate(self.providers)
+            if provider.breaker.can_attempt()
+        ]
+        healthy.sort(key=lambda item: (
+            item[1].stats.p50 if item[1].stats.p50 is not None else float("inf"),
+            item[0]
+        ))
+        return [provider for _, provider in healthy]
+    
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        if len(provider.stats.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DELAY
+        return provider.stats.p95
+    
+    async def attempt(self, provider: LLMProvider, call: Callable[[LLMProvider], Awaitable]):
+        """Run one call against a provider, recording its latency and outcome"""
+        provider.breaker.start()
+        started = time.monotonic()
+        try:
+            result = await call(provider)
+        except asyncio.CancelledError:
+            provider.breaker.cancelled()
+            raise
+        except Exception:
+            provider.stats.record(None, ok=False)
+            provider.breaker.record(provider.stats, ok=False)
+            raise
+        provider.stats.record(time.monotonic() - started, ok=True)
+        provider.breaker.record(provider.stats, ok=True)
+        return result
+    
+    async def complete(self, call: Callable[[LLMProvider], Awaitable]):
+        """Run `call(provider)` with hedging and failover; first success wins"""
+        candidates = self.available()
+        if not candidates:
+            raise NoProviderAvailable("All LLM providers are unavailable (circuit open)")
+        
+        tasks: Dict[asyncio.Task, LLMProvider] = {}
+        errors = []
+        hedged = False
+        hedge_at = None
+        
+        def launch(provider: LLMProvider):
+            nonlocal hedge_at
+            tasks[asyncio.ensure_future(self.attempt(provider, call))] = provider
+            hedge_at = time.monotonic() + self.hedge_delay(provider)
+        
+        launch(candidates.pop(0))
+        try:
+            while tasks:
+                timeout = None
+                if self.hedge and not hedged and candidates:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    backup = next((p for p in candidates if p.scheduler.has_capacity), None)
+                    if backup:
+                        candidates.remove(backup)
+                        slow = ", ".join(provider.name for provider in tasks.values())
+                        print(f"🏁 Hedging LLM request to {backup.name} ({slow} is slower than p95)")
+                        launch(backup)
+                    continue
+                
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    print(f"LLM provider {provider.name} failed: {task.exception()}")
+                    errors.append(task.exception())
+                
+                if not tasks and candidates:
+                    launch(candidates.pop(0))
+            
+            raise errors[-1]
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def snapshot(self) -> List[dict]:
+        return [provider.to_dict() for provider in self.providers]
@@ -0,0 +1,88 @@
+import json
+from typing import AsyncIterator, Optional
+import httpx
+
+async def iter_sse_content(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield the content deltas of an OpenAI-compatible `stream: true` response"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        
+        choices = event.get("choices") or []
+        if choices:
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
+class PartialJSONParser:
+    """
+    Incremental parser for a JSON object that is still being streamed
+    `feed` tracks open strings and brackets as chunks arrive, so `snapshot`
+    can close the document and parse the prefix received so far without
+    rescanning it. Text before the first `{` (e.g. a code fence) is skipped.
+    """
+    
+    def __init__(self):
+        self.parts = []
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.started = False
+    
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+    
+    def feed(self, chunk: str):
+        if not self.started:
+            start = chunk.find("{")
+            if start < 0:
+                return
+            chunk = chunk[start:]
+            self.started = True
+        
+        self.parts.append(chunk)
+        for char in chunk:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.stack.append("}" if char == "{" else "]")
+            elif char in "}]" and self.stack:
+                self.stack.pop()
+    
+    def snapshot(self) -> Optional[dict]:
+        """The object parsed so far, or None while the prefix can't be closed"""
+        if not self.started:
+            return None
+        
+        text = self.text
+        if self.in_string:
+            if self.escape:
+                text = text[:-1]
+            text += '"'
+        text = text.rstrip()
+        if text.endswith(","):
+            text = text[:-1]
+        elif text.endswith(":"):
+            text += "null"
+        
+        try:
+            value = json.loads(text + "".join(reversed(self.stack)))
+        except json.JSONDecodeError:
+            # e.g. a dangling key or half a literal; the next chunk fixes it
+            return None
+        return value if isinstance(value, dict) else None
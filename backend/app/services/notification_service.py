@@ -1,6 +1,6 @@
-import httpx
 from app.config import get_settings
 from app.models.incident import Incident
+from app.services.http_client import http_clients
 
 settings = get_settings()
 
@@ -83,12 +83,10 @@ class NotificationService:
                 }
             })
         
-        async with httpx.AsyncClient() as client:
-            try:
-                await client.post(
-                    settings.SLACK_WEBHOOK_URL,
-                    json=payload,
-                    timeout=10.0
-                )
-            except Exception as e:
-                print(f"Failed to send Slack notification: {e}")
+        try:
+            await http_clients.get("slack").post(
+                settings.SLACK_WEBHOOK_URL,
+                json=payload
+            )
+        except Exception as e:
+            print(f"Failed to send Slack notification: {e}")
@@ -0,0 +1,239 @@
+import importlib.util
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# Exact counts need the optional `tiktoken` package; otherwise tokens are
+# estimated at ~4 characters each, which is close for English and code
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+CHARS_PER_TOKEN = 4
+
+# Metadata keys that cost tokens without helping the diagnosis
+NOISY_METADATA_KEYS = {
+    "timestamp", "@timestamp", "time", "ts", "received_at", "ingested_at",
+    "request_id", "trace_id", "span_id", "correlation_id", "event_id", "id",
+    "headers", "user_agent", "signature", "api_key", "token", "cookie",
+    "pid", "thread", "thread_name", "logger", "logger_name", "level", "raw",
+}
+MAX_VALUE_CHARS = 300
+MAX_LIST_ITEMS = 10
+MAX_DEPTH = 4
+
+# Share of the context budget each section gets before leftovers are
+# handed out in rank order (description, stack trace, metadata)
+SECTION_SHARES = {"description": 0.2, "stack_trace": 0.5, "metadata": 0.3}
+
+RESPONSE_FORMAT = (
+    'Respond with JSON only: {"root_cause": str, "impact": str, "resolution_steps": [str], '
+    '"prevention_steps": [str], "confidence": "high|medium|low"}. '
+    "Be specific and actionable; focus on technical root causes, not symptoms."
+)
+
+# Stack frame lines: Python `File "..."`, JVM/JS `at ...`, Go/C `#n ...`
+FRAME_PATTERN = re.compile(r'^\s*(File "|at |#\d+ )')
+
+_encoding = None
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and TIKTOKEN_AVAILABLE:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # The BPE file is downloaded on first use; estimate when offline
+            print(f"tiktoken unavailable, estimating tokens: {e}")
+            _encoding = False
+    return _encoding or None
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, marking the cut"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    marker = " …[truncated]"
+    keep = max_tokens - count_tokens(marker)
+    if keep <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text)[:keep]) + marker
+    return text[:keep * CHARS_PER_TOKEN] + marker
+
+def compact_stack_trace(trace: str, max_frames: Optional[int] = None) -> str:
+    """
+    Drop repeated frames (recursion, retry loops) and keep both ends
+    Exception and `Caused by` lines are always kept; when more than
+    max_frames distinct frames remain, the middle ones are elided.
+    """
+    max_frames = max_frames or settings.LLM_PROMPT_MAX_FRAMES
+    lines = [line.rstrip() for line in (trace or "").strip().splitlines() if line.strip()]
+    
+    # Group each frame with its source line (Python prints it indented below)
+    entries: List[List[str]] = []
+    for line in lines:
+        if (entries and FRAME_PATTERN.match(entries[-1][0]) and len(entries[-1]) == 1
+                and not FRAME_PATTERN.match(line) and line.startswith(" ")
+                and entries[-1][0].lstrip().startswith('File "')):
+            entries[-1].append(line)
+        else:
+            entries.append([line])
+    
+    seen = set()
+    compacted: List[List[str]] = []
+    repeated = 0
+    for entry in entries:
+        is_frame = bool(FRAME_PATTERN.match(entry[0]))
+        key = tuple(part.strip() for part in entry)
+        if is_frame and key in seen:
+            repeated += 1
+            continue
+        if repeated:
+            compacted.append([f"    ... {repeated} repeated frames"])
+            repeated = 0
+        if is_frame:
+            seen.add(key)
+        compacted.append(entry)
+    if repeated:
+        compacted.append([f"    ... {repeated} repeated frames"])
+    
+    frames = [index for index, entry in enumerate(compacted) if FRAME_PATTERN.match(entry[0])]
+    if len(frames) > max_frames:
+        head = max_frames // 3
+        elided = set(frames[head:len(frames) - (max_frames - head)])
+        kept = []
+        for index, entry in enumerate(compacted):
+            if index in elided:
+                if index - 1 not in elided:
+                    kept.append([f"    ... {len(elided)} frames omitted"])
+                continue
+            kept.append(entry)
+        compacted = kept
+    
+    return "\n".join(line for entry in compacted for line in entry)
+
+def _compact_value(value: Any, shown: set, depth: int = 0) -> Any:
+    if isinstance(value, dict):
+        if depth >= MAX_DEPTH:
+            return "{…}"
+        result = {}
+        for key, item in value.items():
+            if str(key).lower() in NOISY_METADATA_KEYS:
+                continue
+            item = _compact_value(item, shown, depth + 1)
+            if item not in (None, "", [], {}):
+                result[key] = item
+        return result
+    if isinstance(value, (list, tuple)):
+        items = [_compact_value(item, shown, depth + 1) for item in value[:MAX_LIST_ITEMS]]
+        items = [item for item in items if item not in (None, "", [], {})]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"…(+{len(value) - MAX_LIST_ITEMS} more)")
+        return items
+    if isinstance(value, str):
+        # Already in the prompt (e.g. a log payload's message / service)
+        if value.strip() in shown:
+            return None
+        if len(value) > MAX_VALUE_CHARS:
+            return value[:MAX_VALUE_CHARS] + "…"
+    return value
+
+def compact_metadata(metadata: Optional[Dict[str, Any]], shown: Optional[set] = None) -> str:
+    """Metadata as minified JSON without noisy keys, empty values or repeats of `shown`"""
+    if not metadata:
+        return ""
+    compacted = _compact_value(metadata, {text.strip() for text in shown or () if text})
+    if not compacted:
+        return ""
+    return json.dumps(compacted, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def _allocate(needs: Dict[str, int], budget: int) -> Dict[str, int]:
+    """Split the budget by SECTION_SHARES, then give leftovers out in rank order"""
+    allocation = {name: min(need, int(budget * SECTION_SHARES[name])) for name, need in needs.items()}
+    leftover = budget - sum(allocation.values())
+    for name, need in needs.items():
+        extra = min(need - allocation[name], leftover)
+        if extra > 0:
+            allocation[name] += extra
+            leftover -= extra
+    return allocation
+
+def _render_incident(context: dict, budget: int, heading: str = "INCIDENT:") -> str:
+    """One incident's header plus as much description/trace/metadata as the budget allows"""
+    title = context.get("title") or "Unknown"
+    service = context.get("service") or "unknown"
+    error_type = context.get("error_type") or "unknown"
+    description = (context.get("description") or "").strip()
+    stack_trace = compact_stack_trace(context.get("stack_trace") or "")
+    metadata = compact_metadata(
+        context.get("metadata"),
+        shown={title, service, error_type, description, context.get("stack_trace")}
+    )
+    
+    header = [
+        heading,
+        f"- Title: {title}",
+        f"- Service: {service}",
+        f"- Error Type: {error_type}",
+    ]
+    if context.get("severity"):
+        header.append(f"- Severity: {context['severity']}")
+    
+    labels = {"description": "\n- Description: ", "stack_trace": "\n\nSTACK TRACE:\n", "metadata": "\n\nMETADATA:\n"}
+    sections = {"description": description, "stack_trace": stack_trace, "metadata": metadata}
+    needs = {name: count_tokens(text) for name, text in sections.items() if text}
+    
+    # Labels, separators and one token of rounding slack per section
+    fixed = count_tokens("\n".join(header))
+    fixed += sum(count_tokens(labels[name]) + 1 for name in needs)
+    allocation = _allocate(needs, max(0, budget - fixed))
+    
+    text = "\n".join(header)
+    for name in needs:
+        section = truncate_to_tokens(sections[name], allocation[name])
+        if section:
+            text += labels[name] + section
+    return text
+
+def build_analysis_prompt(context: dict, budget: Optional[int] = None) -> str:
+    """
+    Analysis prompt that fits a token budget
+    The incident header and response format always go in; description,
+    compacted stack trace and metadata share what is left, in that order.
+    """
+    budget = budget or settings.LLM_PROMPT_TOKEN_BUDGET
+    preamble = "You are a DevOps expert analyzing a production incident."
+    fixed = count_tokens(preamble) + count_tokens(RESPONSE_FORMAT) + 2
+    return "\n\n".join([preamble, _render_incident(context, budget - fixed), RESPONSE_FORMAT])
+
+def build_group_analysis_prompt(contexts: List[dict], budget: Optional[int] = None) -> str:
+    """
+    One prompt for correlated incidents that likely share a root cause
+    Each incident gets an equal share of the budget (twice the single
+    incident budget by default), so the list stays bounded as groups grow.
+    """
+    budget = budget or settings.LLM_PROMPT_TOKEN_BUDGET * 2
+    preamble = (
+        f"You are a DevOps expert analyzing {len(contexts)} correlated production incidents "
+        "that started together and likely share one upstream root cause. "
+        "Identify that shared root cause and how to resolve it."
+    )
+    fixed = count_tokens(preamble) + count_tokens(RESPONSE_FORMAT) + 2 * (len(contexts) + 1)
+    share = max(0, budget - fixed) // max(1, len(contexts))
+    incidents = [
+        _render_incident(context, share, heading=f"INCIDENT {number}:")
+        for number, context in enumerate(contexts, start=1)
+    ]
+    return "\n\n".join([preamble, *incidents, RESPONSE_FORMAT])
@@ -1,6 +1,10 @@
 import redis.asyncio as redis
 import json
-from typing import Optional
+from typing import List, Optional
+from fastapi import Request
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
 from app.config import get_settings
 
 settings = get_settings()
@@ -9,42 +13,72 @@ class RedisService:
     """
     Redis service for pub/sub and caching
     Handles real-time incident notifications
+    Each process connects one instance at startup (app.state.redis in the
+    API, see get_redis) and shares its connection pool across requests.
     """
     
     def __init__(self):
         self.redis_url = settings.REDIS_URL
+        self.pool: Optional[redis.ConnectionPool] = None
         self.client: Optional[redis.Redis] = None
-        self.pubsub: Optional[redis.client.PubSub] = None
     
     async def connect(self):
-        """Initialize Redis connection"""
-        self.client = await redis.from_url(
+        """Initialize the connection pool"""
+        self.pool = redis.ConnectionPool.from_url(
             self.redis_url,
             encoding="utf-8",
-            decode_responses=True
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            retry_on_timeout=True,
+            retry=Retry(ExponentialBackoff(), settings.REDIS_RETRIES, supported_errors=(ConnectionError, TimeoutError))
         )
-        self.pubsub = self.client.pubsub()
-        print("✅ Redis connected")
+        self.client = redis.Redis(connection_pool=self.pool)
+        print(f"✅ Redis connected (pool of up to {settings.REDIS_MAX_CONNECTIONS} connections)")
     
     async def disconnect(self):
-        """Close Redis connection"""
-        if self.pubsub:
-            await self.pubsub.close()
+        """Close Redis connections"""
         if self.client:
-            await self.client.close()
+            await self.client.aclose()
+        if self.pool:
+            await self.pool.disconnect()
         print("👋 Redis disconnected")
     
-    async def publish_incident(self, incident_id: int):
+    @staticmethod
+    def incident_event(incident_id: int, service_name: Optional[str] = None, severity: Optional[str] = None) -> dict:
+        """Event payload; service and severity let WebSocket clients subscribe by them"""
+        event = {"incident_id": incident_id}
+        if service_name:
+            event["service_name"] = service_name
+        if severity:
+            event["severity"] = getattr(severity, "value", severity)
+        return event
+    
+    def publish_on(self, pipe, events: List[dict]):
+        """Queue new-incident events (see incident_event) on a pipeline the caller executes"""
+        for event in events:
+            pipe.publish("incidents:new", json.dumps(event))
+    
+    async def publish_incident(self, incident_id: int, service_name: Optional[str] = None, severity: Optional[str] = None):
         """Publish incident event to channel"""
         await self.client.publish(
             "incidents:new",
-            json.dumps({"incident_id": incident_id})
+            json.dumps(self.incident_event(incident_id, service_name, severity))
         )
     
-    async def publish_incident_update(self, incident_id: int, status: str, data: dict = None):
+    async def publish_incidents(self, events: List[dict]):
+        """Publish a batch of incident events (see incident_event) in a single pipelined round-trip"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            self.publish_on(pipe, events)
+            await pipe.execute()
+    
+    async def publish_incident_update(self, incident_id: int, status: str, data: dict = None,
+                                      service_name: Optional[str] = None, severity: Optional[str] = None):
         """Publish incident status update"""
         message = {
-            "incident_id": incident_id,
+            **self.incident_event(incident_id, service_name, severity),
             "status": status,
             "data": data or {}
         }
@@ -53,21 +87,6 @@ class RedisService:
             json.dumps(message)
         )
     
-    async def listen_for_incidents(self):
-        """Background task to listen for incident events"""
-        await self.pubsub.subscribe("incidents:new")
-        
-        print("👂 Listening for incidents on Redis...")
-        
-        async for message in self.pubsub.listen():
-            if message["type"] == "message":
-                data = json.loads(message["data"])
-                print(f"🔔 New incident received: {data}")
-                
-                # Broadcast to WebSocket clients
-                from app.services.websocket_manager import manager
-                await manager.broadcast(data)
-    
     async def cache_incident(self, incident_id: int, data: dict, ttl: int = 3600):
         """Cache incident data"""
         await self.client.setex(
@@ -94,3 +113,7 @@ class RedisService:
             if message["type"] == "pmessage":
                 expired_key = message["data"]
                 await callback(expired_key)
+
+def get_redis(request: Request) -> RedisService:
+    """Dependency for FastAPI routes: the app-wide RedisService connected at startup"""
+    return request.app.state.redis
@@ -0,0 +1,220 @@
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.services.database import dialect_name
+from app.models.incident import Incident, IncidentRollup, IncidentStatus
+
+settings = get_settings()
+
+# Bucket of the all-time totals
+ALL_TIME = datetime(1970, 1, 1)
+# Dimension of the hourly rows that count resolutions by detection hour
+DETECTED = "detected"
+# Rows per upsert statement, well under SQLite's bound-parameter limit
+UPSERT_CHUNK = 500
+
+RollupKey = Tuple[str, datetime, str, str]  # granularity, bucket_start, dimension, value
+
+class IncidentFacts(NamedTuple):
+    """The incident columns the rollups are derived from"""
+    status: Optional[IncidentStatus]
+    severity: Optional[str]
+    service_name: Optional[str]
+    detected_at: Optional[datetime]
+    resolved_at: Optional[datetime]
+
+FACT_COLUMNS = (Incident.status, Incident.severity, Incident.service_name, Incident.detected_at, Incident.resolved_at)
+
+def _buckets(moment: datetime) -> List[Tuple[str, datetime]]:
+    return [
+        ("all", ALL_TIME),
+        ("hour", moment.replace(minute=0, second=0, microsecond=0)),
+        ("day", moment.replace(hour=0, minute=0, second=0, microsecond=0)),
+    ]
+
+def _enum_value(value) -> str:
+    return getattr(value, "value", value) or ""
+
+class RollupService:
+    """
+    Keeps the incident_rollups counters in step with the incidents table
+    Every change is recorded as the difference between the incident's
+    contributions before and after it, in the same transaction as the
+    change, so the counters are exact without ever rescanning incidents.
+    Detections count in the bucket of detected_at, resolutions (with
+    their duration) in the bucket of resolved_at. The hourly "detected"
+    dimension also counts resolutions in the hour the incident was
+    detected, for MTTR over a detection window.
+    """
+    
+    @staticmethod
+    def enabled() -> bool:
+        return settings.ANALYTICS_ROLLUPS_ENABLED
+    
+    @staticmethod
+    def contributions(facts: IncidentFacts) -> Dict[RollupKey, Tuple[int, int, float]]:
+        """(incidents, resolved, resolution_seconds) this incident adds to each rollup row"""
+        rows: Dict[RollupKey, Tuple[int, int, float]] = {}
+        dimensions = [("severity", _enum_value(facts.severity)), ("service", facts.service_name or "")]
+        resolved = facts.status == IncidentStatus.RESOLVED and facts.resolved_at and facts.detected_at
+        duration = (facts.resolved_at - facts.detected_at).total_seconds() if resolved else 0.0
+        
+        if facts.detected_at:
+            for granularity, bucket in _buckets(facts.detected_at):
+                for dimension, value in dimensions:
+                    rows[(granularity, bucket, dimension, value)] = (1, 0, 0.0)
+            detected_hour = dict(_buckets(facts.detected_at))["hour"]
+            rows[("hour", detected_hour, DETECTED, "")] = (1, 1, duration) if resolved else (1, 0, 0.0)
+        
+        if resolved:
+            for granularity, bucket in _buckets(facts.resolved_at):
+                for dimension, value in dimensions:
+                    incidents, _, _ = rows.get((granularity, bucket, dimension, value), (0, 0, 0.0))
+                    rows[(granularity, bucket, dimension, value)] = (incidents, 1, duration)
+        
+        if facts.status:
+            rows[("all", ALL_TIME, "status", _enum_value(facts.status))] = (1, 0, 0.0)
+        return rows
+    
+    @staticmethod
+    async def snapshot(db: AsyncSession, incident_ids: Iterable[int]) -> Dict[int, IncidentFacts]:
+        """Current facts of the incidents, row-locked until the transaction ends"""
+        incident_ids = list(incident_ids)
+        if not incident_ids:
+            return {}
+        rows = (await db.execute(
+            select(Incident.id, *FACT_COLUMNS).where(Incident.id.in_(incident_ids)).with_for_update()
+        )).all()
+        return {row[0]: IncidentFacts(*row[1:]) for row in rows}
+    
+    @staticmethod
+    async def record(db: AsyncSession, before: Dict[int, IncidentFacts], after: Dict[int, IncidentFacts]):
+        """Apply the counter delta between two snapshots (not committed)"""
+        if not RollupService.enabled():
+            return
+        deltas = defaultdict(lambda: [0, 0, 0.0])
+        for facts_by_id, sign in ((after, 1), (before, -1)):
+            for facts in facts_by_id.values():
+                for key, counters in RollupService.contributions(facts).items():
+                    for index, amount in enumerate(counters):
+                        deltas[key][index] += sign * amount
+        
+        changed = {key: counters for key, counters in deltas.items() if any(counters)}
+        if changed:
+            await RollupService._increment(db, changed)
+    
+    @staticmethod
+    @asynccontextmanager
+    async def track(db: AsyncSession, incident_ids: Iterable[int]):
+        """Record whatever the block changes on these incidents"""
+        incident_ids = list(incident_ids)
+        before = await RollupService.snapshot(db, incident_ids) if RollupService.enabled() else {}
+        yield
+        if RollupService.enabled():
+            await db.flush()
+            await RollupService.record(db, before, await RollupService.snapshot(db, incident_ids))
+    
+    @staticmethod
+    async def record_created(db: AsyncSession, incident_ids: Iterable[int]):
+        """Count newly inserted (flushed) incidents"""
+        if RollupService.enabled():
+            await RollupService.record(db, {}, await RollupService.snapshot(db, incident_ids))
+    
+    @staticmethod
+    async def _increment(db: AsyncSession, deltas: Dict[RollupKey, List]):
+        """Upsert the deltas, in key order so concurrent writers lock rows in the same order"""
+        rows = [
+            {
+                "granularity": granularity, "bucket_start": bucket, "dimension": dimension, "value": value,
+                "incidents": incidents, "resolved": resolved, "resolution_seconds": seconds
+            }
+            for (granularity, bucket, dimension, value), (incidents, resolved, seconds) in sorted(deltas.items())
+        ]
+        
+        dialect = dialect_name(db)
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            for start in range(0, len(rows), UPSERT_CHUNK):
+                statement = insert(IncidentRollup).values(rows[start:start + UPSERT_CHUNK])
+                await db.execute(statement.on_conflict_do_update(
+                    index_elements=["granularity", "bucket_start", "dimension", "value"],
+                    set_={
+                        "incidents": IncidentRollup.incidents + statement.excluded.incidents,
+                        "resolved": IncidentRollup.resolved + statement.excluded.resolved,
+                        "resolution_seconds": IncidentRollup.resolution_seconds + statement.excluded.resolution_seconds,
+                    }
+                ))
+            return
+        
+        # Databases without an upsert: update, then insert the rows that did not exist
+        for row in rows:
+            updated = await db.execute(update(IncidentRollup).where(
+                IncidentRollup.granularity == row["granularity"],
+                IncidentRollup.bucket_start == row["bucket_start"],
+                IncidentRollup.dimension == row["dimension"],
+                IncidentRollup.value == row["value"]
+            ).values(
+                incidents=IncidentRollup.incidents + row["incidents"],
+                resolved=IncidentRollup.resolved + row["resolved"],
+                resolution_seconds=IncidentRollup.resolution_seconds + row["resolution_seconds"]
+            ))
+            if not updated.rowcount:
+                db.add(IncidentRollup(**row))
+        await db.flush()
+    
+    @staticmethod
+    async def rebuild(db: AsyncSession, batch_size: int = 5000) -> int:
+        """
+        Recount every rollup from the incidents table and commit
+        On PostgreSQL the rollup table is locked for the duration, so
+        concurrent changes wait and apply their deltas on top afterwards.
+        Returns the number of incidents counted.
+        """
+        if dialect_name(db) == "postgresql":
+            await db.execute(text("LOCK TABLE incident_rollups IN EXCLUSIVE MODE"))
+        await db.execute(delete(IncidentRollup))
+        
+        totals = defaultdict(lambda: [0, 0, 0.0])
+        counted = 0
+        last_id = 0
+        while True:
+            rows = (await db.execute(
+                select(Incident.id, *FACT_COLUMNS)
+                .where(Incident.id > last_id)
+                .order_by(Incident.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            for row in rows:
+                for key, counters in RollupService.contributions(IncidentFacts(*row[1:])).items():
+                    for index, amount in enumerate(counters):
+                        totals[key][index] += amount
+            counted += len(rows)
+            last_id = rows[-1][0]
+        
+        if totals:
+            await RollupService._increment(db, totals)
+        await db.commit()
+        return counted
+    
+    @staticmethod
+    async def totals(db: AsyncSession) -> List[IncidentRollup]:
+        """All-time rows: one per severity, service and status"""
+        return (await db.scalars(select(IncidentRollup).where(IncidentRollup.granularity == "all"))).all()
+    
+    @staticmethod
+    async def series(db: AsyncSession, granularity: str, since: datetime, dimension: str = "severity") -> List[IncidentRollup]:
+        """Bucketed rows of one dimension from `since` (floored to the bucket) on"""
+        start = dict(_buckets(since))[granularity]
+        return (await db.scalars(select(IncidentRollup).where(
+            IncidentRollup.granularity == granularity,
+            IncidentRollup.dimension == dimension,
+            IncidentRollup.bucket_start >= start
+        ))).all()
@@ -1,41 +1,255 @@
 from fastapi import WebSocket
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set
+import asyncio
 import json
 
+from app.config import get_settings
+from app.models.incident import SeverityLevel
+
+settings = get_settings()
+
+# Topic of clients that want every event (the dashboard)
+ALL_TOPIC = "*"
+TOPIC_KINDS = ("incident", "service", "severity")
+SEVERITIES = {level.value for level in SeverityLevel}
+
+def parse_topic(topic) -> str:
+    """
+    Normalized topic, or ValueError
+    Topics are "*", "incident:<id>", "service:<name>" or "severity:<level>".
+    """
+    if topic == ALL_TOPIC:
+        return topic
+    kind, _, value = str(topic).partition(":")
+    if kind not in TOPIC_KINDS or not value:
+        raise ValueError(f"Unknown topic {topic!r}")
+    if kind == "incident":
+        if not value.isdigit():
+            raise ValueError(f"Incident topic needs a numeric id: {topic!r}")
+        value = str(int(value))
+    elif kind == "severity":
+        value = value.lower()
+        if value not in SEVERITIES:
+            raise ValueError(f"Unknown severity in topic {topic!r}")
+    return f"{kind}:{value}"
+
+def event_topics(message: dict) -> List[str]:
+    """Topics an incident event is delivered on, from its incident_id, service_name and severity"""
+    topics = [ALL_TOPIC]
+    if message.get("incident_id") is not None:
+        topics.append(f"incident:{message['incident_id']}")
+    if message.get("service_name"):
+        topics.append(f"service:{message['service_name']}")
+    if message.get("severity"):
+        topics.append(f"severity:{str(message['severity']).lower()}")
+    return topics
+
+class ClientConnection:
+    """One WebSocket with a bounded send queue drained by its own writer task"""
+    
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.topics: Set[str] = set()
+        self.dropped = 0
+        self.writer: Optional[asyncio.Task] = None
+        self.send_started: Optional[float] = None
+    
+    def start(self):
+        self.writer = asyncio.create_task(self._write())
+    
+    def offer(self, text: str) -> bool:
+        """
+        Queue a serialized message without waiting
+        On a full queue the oldest message is dropped to make room
+        ("coalesce"), or False is returned and the client should be
+        evicted ("evict").
+        """
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            if settings.WS_SLOW_CLIENT_POLICY != "coalesce":
+                return False
+        self.queue.get_nowait()
+        self.queue.task_done()
+        self.dropped += 1
+        self.queue.put_nowait(text)
+        return True
+    
+    def stalled(self) -> bool:
+        """
+        Stuck on one send for longer than WS_SEND_TIMEOUT_SECONDS
+        Checked when the next message is delivered rather than with a
+        timeout around every send, which would cost a timer per message
+        and client.
+        """
+        return (
+            self.send_started is not None
+            and asyncio.get_running_loop().time() - self.send_started > settings.WS_SEND_TIMEOUT_SECONDS
+        )
+    
+    async def _write(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            text = await self.queue.get()
+            self.send_started = loop.time()
+            try:
+                await self.websocket.send_text(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error sending to client: {e!r}")
+                self.manager.evict(self.websocket)
+                return
+            finally:
+                self.send_started = None
+                self.queue.task_done()
+    
+    def stop(self):
+        """Stop the writer and release anything still queued"""
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+
 class ConnectionManager:
-    """Manage WebSocket connections for real-time updates"""
+    """
+    Manage WebSocket connections for real-time updates
+    Clients choose what they receive by sending
+    {"action": "subscribe" | "unsubscribe", "topics": [...]}; a
+    topic -> connections index then routes each incident event to the
+    clients subscribed to its incident, service, severity or "*", so
+    fan-out grows with the interested clients instead of all of them.
+    Each message is serialized once and handed to every recipient's send
+    queue, so one stalled browser never delays the others; clients that
+    cannot keep up are coalesced or evicted per WS_SLOW_CLIENT_POLICY.
+    """
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.subscribers: Dict[str, Set[WebSocket]] = {}
+        self._closing: Set[asyncio.Task] = set()
+    
+    @property
+    def active_connections(self) -> Set[WebSocket]:
+        return set(self.clients)
     
     async def connect(self, websocket: WebSocket):
         """Accept new WebSocket connection"""
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"🔌 New WebSocket connection. Total: {len(self.active_connections)}")
+        client = ClientConnection(websocket, self)
+        self.clients[websocket] = client
+        client.start()
+        print(f"🔌 New WebSocket connection. Total: {len(self.clients)}")
     
     def disconnect(self, websocket: WebSocket):
-        """Remove WebSocket connection"""
-        self.active_connections.remove(websocket)
-        print(f"🔌 WebSocket disconnected. Total: {len(self.active_connections)}")
+        """Remove WebSocket connection and its subscriptions"""
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self.unsubscribe(websocket, list(client.topics), client)
+        client.stop()
+        print(f"🔌 WebSocket disconnected. Total: {len(self.clients)}")
+    
+    def evict(self, websocket: WebSocket):
+        """Disconnect a client that failed or fell behind, closing its socket in the background"""
+        self.disconnect(websocket)
+        task = asyncio.create_task(self._close(websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    async def _close(self, websocket: WebSocket):
+        try:
+            # 1013: try again later
+            await asyncio.wait_for(websocket.close(code=1013), settings.WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+    
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> Set[str]:
+        """Add already-parsed topics to the client's subscriptions"""
+        client_topics = self.clients[websocket].topics
+        for topic in topics:
+            if topic in client_topics:
+                continue
+            if len(client_topics) >= settings.WS_MAX_TOPICS_PER_CLIENT:
+                raise ValueError(f"At most {settings.WS_MAX_TOPICS_PER_CLIENT} topics per connection")
+            client_topics.add(topic)
+            self.subscribers.setdefault(topic, set()).add(websocket)
+        return client_topics
+    
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str],
+                    client: Optional[ClientConnection] = None) -> Set[str]:
+        client = client or self.clients[websocket]
+        for topic in topics:
+            client.topics.discard(topic)
+            connections = self.subscribers.get(topic)
+            if connections is not None:
+                connections.discard(websocket)
+                if not connections:
+                    del self.subscribers[topic]
+        return client.topics
+    
+    async def handle_message(self, websocket: WebSocket, text: str):
+        """Apply a subscribe/unsubscribe request and acknowledge it with the client's topics"""
+        try:
+            request = json.loads(text)
+            action = request.get("action")
+            if action not in ("subscribe", "unsubscribe"):
+                raise ValueError(f"Unknown action {action!r}")
+            raw_topics = request.get("topics")
+            if not isinstance(raw_topics, list):
+                raise ValueError("topics must be a list")
+            topics = [parse_topic(topic) for topic in raw_topics]
+            
+            if action == "subscribe":
+                current = self.subscribe(websocket, topics)
+            else:
+                current = self.unsubscribe(websocket, topics)
+            reply = {"type": "subscriptions", "topics": sorted(current)}
+        except (ValueError, AttributeError) as e:
+            reply = {"type": "error", "message": str(e)}
+        await self.send_personal_message(reply, websocket)
+    
+    def recipients(self, message: dict) -> Set[WebSocket]:
+        """Connections subscribed to any topic of the event"""
+        matched = set()
+        for topic in event_topics(message):
+            matched |= self.subscribers.get(topic, set())
+        return matched
+    
+    async def publish(self, message: dict) -> int:
+        """Queue an incident event for the interested clients; returns how many got it"""
+        return self._deliver(self.recipients(message), message)
     
     async def broadcast(self, message: dict):
         """Broadcast message to all connected clients"""
-        disconnected = []
-        
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                print(f"Error sending to client: {e}")
-                disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.active_connections.remove(conn)
+        self._deliver(list(self.clients), message)
+    
+    def _deliver(self, connections: Iterable[WebSocket], message: dict) -> int:
+        """Serialize once and queue for each connection, never waiting on a client"""
+        text = None
+        delivered = 0
+        for websocket in list(connections):
+            client = self.clients.get(websocket)
+            if client is None:
+                continue
+            text = text or json.dumps(message)
+            if not client.stalled() and client.offer(text):
+                delivered += 1
+            else:
+                print("🐢 Evicting WebSocket client that fell behind")
+                self.evict(websocket)
+        return delivered
     
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send message to specific client"""
-        await websocket.send_json(message)
+        self._deliver([websocket], message)
+    
+    async def flush(self):
+        """Wait until every message queued so far was sent (or its client dropped)"""
+        await asyncio.gather(*[client.queue.join() for client in list(self.clients.values())])
 
 manager = ConnectionManager()
@@ -0,0 +1,159 @@
+"""
+Standalone incident worker
+Consumes jobs from the Redis Streams queue and runs incident pipelines
+outside the API process:
+
+    python -m app.worker --concurrency 8
+"""
+import argparse
+import asyncio
+import signal
+import socket
+import os
+
+from app.config import get_settings
+from app.services.job_queue import JobQueue
+from app.services.redis_service import RedisService
+from app.services.http_client import http_clients
+from app.services.kestra_service import execution_tracker
+from app.services.analysis_cache import analysis_cache
+from app.services.incident_cache import incident_cache
+from app.services.incident_processor import IncidentProcessor
+from app.services.dispatch_service import DispatchService
+from app.services.database import AsyncSessionLocal
+
+settings = get_settings()
+
+async def _process_incident(payload: dict, redis_service: RedisService):
+    await IncidentProcessor.process_incident(payload["incident_id"], redis_service)
+
+async def _create_from_logs(payload: dict, redis_service: RedisService):
+    await IncidentProcessor.create_from_logs(payload, redis_service)
+
+async def _create_from_metrics(payload: dict, redis_service: RedisService):
+    await IncidentProcessor.create_from_metrics(payload, redis_service)
+
+JOB_HANDLERS = {
+    "process_incident": _process_incident,
+    "create_from_logs": _create_from_logs,
+    "create_from_metrics": _create_from_metrics,
+}
+
+class IncidentWorker:
+    """Run N concurrent job consumers against the incident job queue"""
+    
+    def __init__(self, concurrency: int = None, name: str = None):
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.redis_service = RedisService()
+        self.queue: JobQueue = None
+        self._stopping = asyncio.Event()
+    
+    def stop(self):
+        """Finish in-flight jobs, then exit"""
+        self._stopping.set()
+    
+    async def run(self):
+        await self.redis_service.connect()
+        await http_clients.start()
+        execution_tracker.attach_redis(self.redis_service)
+        analysis_cache.attach_redis(self.redis_service)
+        incident_cache.attach_redis(self.redis_service)
+        self.queue = JobQueue(self.redis_service.client)
+        await self.queue.ensure_group()
+        
+        print(f"🛠️ Worker {self.name} started with {self.concurrency} consumers")
+        
+        tasks = [asyncio.create_task(self._recover_stale_jobs())]
+        tasks += [
+            asyncio.create_task(self._consume(f"{self.name}-{slot}"))
+            for slot in range(self.concurrency)
+        ]
+        
+        try:
+            await self._stopping.wait()
+        finally:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await http_clients.close()
+            await self.redis_service.disconnect()
+            print(f"👋 Worker {self.name} stopped")
+    
+    async def _consume(self, consumer: str):
+        """Consumer loop: read one job at a time and run it to completion"""
+        while not self._stopping.is_set():
+            try:
+                jobs = await self.queue.read(consumer, count=1, block_ms=1000)
+            except Exception as e:
+                print(f"❌ Error reading jobs for {consumer}: {e}")
+                await asyncio.sleep(1)
+                continue
+            
+            for job in jobs:
+                try:
+                    await self.handle(job)
+                except Exception as e:
+                    # e.g. Redis failing the ack or retry; the job stays pending
+                    # until recover_stale reclaims it, and this consumer keeps going
+                    print(f"❌ Error handling job {job['id']} in {consumer}: {e}")
+    
+    async def handle(self, job: dict):
+        """Run one job, then ack it or hand it back for retry"""
+        handler = JOB_HANDLERS.get(job["type"])
+        
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job type: {job['type']}")
+            await handler(job["payload"], self.redis_service)
+        except Exception as e:
+            requeued = await self.queue.retry(job, str(e))
+            print(f"❌ Job {job['id']} ({job['type']}) failed: {e} - {'retrying' if requeued else 'dead-lettered'}")
+        else:
+            await self.queue.ack(job)
+    
+    async def _recover_stale_jobs(self):
+        """Periodically re-queue jobs abandoned by crashed workers and queue incidents that never got one"""
+        idle_ms = settings.JOB_CLAIM_IDLE_SECONDS * 1000
+        
+        while not self._stopping.is_set():
+            try:
+                recovered = await self.queue.recover_stale(f"{self.name}-recovery", idle_ms)
+                if recovered:
+                    print(f"♻️ Re-queued {recovered} stale jobs")
+            except Exception as e:
+                print(f"❌ Error recovering stale jobs: {e}")
+            
+            try:
+                async with AsyncSessionLocal() as db:
+                    dispatched = await DispatchService.queue_unqueued(db, self.redis_service)
+                if dispatched:
+                    print(f"📮 Queued {dispatched} incidents whose enqueue had failed")
+            except Exception as e:
+                print(f"❌ Error queueing unqueued incidents: {e}")
+            
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=60)
+            except asyncio.TimeoutError:
+                pass
+
+def main():
+    parser = argparse.ArgumentParser(description="DevOps Co-Pilot incident worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.WORKER_CONCURRENCY,
+        help="Number of incident pipelines to run concurrently"
+    )
+    args = parser.parse_args()
+    
+    worker = IncidentWorker(concurrency=args.concurrency)
+    
+    async def run():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run()
+    
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Recount the analytics rollups from the incidents table
+Run once after the incident_rollups migration, and again whenever the
+counters may have drifted (e.g. rows changed outside the API or worker,
+or ANALYTICS_ROLLUPS_ENABLED was off for a while):
+
+    python scripts/backfill_rollups.py --batch-size 5000
+
+On PostgreSQL incident writes wait for the recount to finish.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.database import AsyncSessionLocal
+from app.services.rollup_service import RollupService
+
+async def backfill(batch_size: int):
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        counted = await RollupService.rebuild(db, batch_size=batch_size)
+        print(f"✅ Rebuilt analytics rollups from {counted:,} incidents in {time.perf_counter() - started:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Incidents read per query")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch_size))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark request throughput while slow queries are in flight
+Serves the same slow query two ways from one in-process FastAPI app:
+through a sync Session inside an async route (how the routes used to
+work, blocking the event loop for the whole query) and through an
+AsyncSession. Fast requests are mixed in to show how their latency
+follows the slow ones:
+
+    python scripts/benchmark_db_concurrency.py --slow 50 --fast 200
+    python scripts/benchmark_db_concurrency.py --database-url postgresql://... --query-seconds 0.2
+
+On PostgreSQL the slow query is pg_sleep; on the default throwaway
+SQLite database it calls a sleep() function registered on each connection.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services.database import async_database_url
+
+SQLITE_SLOW_QUERY = text("SELECT sleep(:seconds)")
+POSTGRES_SLOW_QUERY = text("SELECT pg_sleep(:seconds)")
+
+def register_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function("sleep", 1, lambda seconds: time.sleep(seconds) or 0)
+
+def build_app(url: str, query_seconds: float, pool_size: int) -> FastAPI:
+    postgres = url.startswith("postgresql")
+    pool = {"pool_size": pool_size, "max_overflow": 0} if postgres else {}
+    engine = create_engine(url, **pool)
+    async_engine = create_async_engine(async_database_url(url), **pool)
+    if not postgres:
+        event.listen(engine, "connect", register_sleep)
+        event.listen(async_engine.sync_engine, "connect", register_sleep)
+    SessionLocal = sessionmaker(bind=engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine)
+    
+    query = POSTGRES_SLOW_QUERY if postgres else SQLITE_SLOW_QUERY
+    params = {"seconds": query_seconds}
+    
+    app = FastAPI()
+    app.state.async_engine = async_engine
+    
+    @app.get("/sync")
+    async def sync_query():
+        db = SessionLocal()
+        try:
+            return {"result": db.execute(query, params).scalar()}
+        finally:
+            db.close()
+    
+    @app.get("/async")
+    async def async_query():
+        async with AsyncSessionLocal() as db:
+            return {"result": (await db.execute(query, params)).scalar()}
+    
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+    
+    return app
+
+async def run(app: FastAPI, path: str, slow: int, fast: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        async def timed(url, submitted):
+            response = await client.get(url)
+            response.raise_for_status()
+            return time.perf_counter() - submitted
+        
+        # Warm up the pool so connection setup is not measured
+        await timed(path, time.perf_counter())
+        
+        # Latency counts from submission, so time spent queued behind a blocked loop shows up
+        started = time.perf_counter()
+        slow_tasks = [asyncio.create_task(timed(path, started)) for _ in range(slow)]
+        fast_tasks = [asyncio.create_task(timed("/health", started)) for _ in range(fast)]
+        slow_latencies = await asyncio.gather(*slow_tasks)
+        fast_latencies = await asyncio.gather(*fast_tasks)
+        elapsed = time.perf_counter() - started
+    await app.state.async_engine.dispose()
+    
+    return {
+        "throughput": (slow + fast) / elapsed,
+        "slow_p50": statistics.median(slow_latencies) * 1000,
+        "fast_p95": sorted(fast_latencies)[int(len(fast_latencies) * 0.95) - 1] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to query (default: throwaway SQLite)")
+    parser.add_argument("--query-seconds", type=float, default=0.05, help="Duration of one slow query")
+    parser.add_argument("--slow", type=int, default=50, help="Concurrent slow requests")
+    parser.add_argument("--fast", type=int, default=200, help="Fast requests issued while they run")
+    parser.add_argument("--pool-size", type=int, default=20)
+    args = parser.parse_args()
+    
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'concurrency.db')}"
+    
+    print(f"{'':<8}{'req/s':>10}{'slow p50':>12}{'fast p95':>12}")
+    for path in ("/sync", "/async"):
+        app = build_app(url, args.query_seconds, args.pool_size)
+        result = asyncio.run(run(app, path, args.slow, args.fast))
+        print(f"{path[1:]:<8}{result['throughput']:>10.1f}{result['slow_p50']:>10.0f}ms{result['fast_p95']:>10.0f}ms")
+
+if __name__ == "__main__":
+    main()
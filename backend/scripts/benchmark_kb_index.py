@@ -0,0 +1,70 @@
+"""
+Benchmark knowledge base similarity search
+Compares the original per-entry Python loop against KnowledgeIndex:
+
+    python scripts/benchmark_kb_index.py --sizes 1000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.knowledge_index import KnowledgeIndex, HNSW_AVAILABLE
+
+def legacy_search(query, knowledge_base, top_k):
+    """The loop EmbeddingService.find_similar_incidents used to run"""
+    similarities = []
+    for kb_entry in knowledge_base:
+        kb_embedding = np.array(kb_entry['embedding'])
+        similarity = np.dot(query, kb_embedding) / (
+            np.linalg.norm(query) * np.linalg.norm(kb_embedding)
+        )
+        similarities.append((kb_entry, similarity))
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    return [entry for entry, _ in similarities[:top_k]]
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="Skip the legacy loop above this size (it takes minutes at 1M)")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(42)
+    modes = ["exact"] + (["hnsw"] if HNSW_AVAILABLE else [])
+    
+    print(f"{'entries':>10} {'legacy ms':>12} " + " ".join(f"{m + ' ms':>12}" for m in modes) + f" {'speedup':>9}")
+    for size in args.sizes:
+        embeddings = rng.normal(size=(size, args.dim)).astype(np.float32)
+        query = rng.normal(size=args.dim).astype(np.float32)
+        
+        legacy_ms = None
+        if size <= args.legacy_max:
+            # The legacy path received JSON-decoded lists from the database
+            knowledge_base = [{"id": i, "embedding": e.tolist()} for i, e in enumerate(embeddings)]
+            legacy_ms = timed(lambda: legacy_search(query, knowledge_base, args.top_k), repeat=1)
+        
+        timings = []
+        for mode in modes:
+            index = KnowledgeIndex(mode=mode, initial_capacity=size)
+            index.add_many(range(size), embeddings)
+            timings.append(timed(lambda: index.search(query, args.top_k), repeat=args.queries))
+        
+        legacy = f"{legacy_ms:12.2f}" if legacy_ms is not None else f"{'skipped':>12}"
+        speedup = f"{legacy_ms / timings[0]:8.0f}x" if legacy_ms is not None else f"{'-':>9}"
+        print(f"{size:>10} {legacy} " + " ".join(f"{t:12.3f}" for t in timings) + f" {speedup}")
+
+if __name__ == "__main__":
+    main()
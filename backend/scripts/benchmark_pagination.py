@@ -0,0 +1,108 @@
+"""
+Benchmark incident list pagination: OFFSET vs the (detected_at, id) keyset cursor
+Seeds a throwaway SQLite database (or uses --database-url, which must
+already hold the incidents table and data) and times fetching page 1 and
+a deep page both ways through the same query the list endpoint runs:
+
+    python scripts/benchmark_pagination.py --rows 2000000 --page 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, desc, insert, tuple_
+from sqlalchemy.orm import sessionmaker
+
+from app.models.incident import Base, Incident, IncidentStatus, SeverityLevel
+
+SERVICES = ["api-gateway", "checkout", "payments", "search", "auth"]
+STATUSES = list(IncidentStatus)
+
+def seed(session, rows: int):
+    start = datetime(2024, 1, 1)
+    batch = []
+    for n in range(rows):
+        batch.append({
+            "title": f"Incident {n}",
+            "service_name": SERVICES[n % len(SERVICES)],
+            "error_type": "500_errors",
+            "severity": SeverityLevel.MEDIUM,
+            "status": STATUSES[n % len(STATUSES)],
+            "detected_at": start + timedelta(seconds=n * 7),
+        })
+        if len(batch) == 50000:
+            session.execute(insert(Incident), batch)
+            batch = []
+    if batch:
+        session.execute(insert(Incident), batch)
+    session.commit()
+
+def list_query(session, service):
+    query = session.query(Incident)
+    if service:
+        query = query.filter(Incident.service_name == service)
+    return query.order_by(desc(Incident.detected_at), desc(Incident.id))
+
+def timed(run, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Existing database to benchmark (default: seeded SQLite)")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--page", type=int, default=10000, help="Deep page number to compare")
+    parser.add_argument("--service", help="Filter by service, like ?service=")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    url = args.database_url
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination.db')}"
+    engine = create_engine(url)
+    session = sessionmaker(bind=engine)()
+    
+    if not args.database_url:
+        Base.metadata.create_all(bind=engine)
+        print(f"Seeding {args.rows:,} incidents...")
+        seed(session, args.rows)
+    
+    offset = (args.page - 1) * args.limit
+    
+    # The cursor for the deep page is the last row of the page before it
+    previous = list_query(session, args.service).offset(offset - 1).limit(1).first()
+    if previous is None:
+        sys.exit(f"Page {args.page} is past the end of the data")
+    cursor = (previous.detected_at, previous.id)
+    
+    def offset_page(skip):
+        return lambda: list_query(session, args.service).offset(skip).limit(args.limit).all()
+    
+    def keyset_page(after):
+        def run():
+            query = list_query(session, args.service)
+            if after:
+                query = query.filter(tuple_(Incident.detected_at, Incident.id) < after)
+            return query.limit(args.limit).all()
+        return run
+    
+    assert [i.id for i in offset_page(offset)()] == [i.id for i in keyset_page(cursor)()]
+    
+    print(f"{'':<10}{'page 1':>12}{f'page {args.page:,}':>16}")
+    print(f"{'offset':<10}{timed(offset_page(0), args.repeat):>10.2f}ms"
+          f"{timed(offset_page(offset), args.repeat):>14.2f}ms")
+    print(f"{'keyset':<10}{timed(keyset_page(None), args.repeat):>10.2f}ms"
+          f"{timed(keyset_page(cursor), args.repeat):>14.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark analysis prompt size: the original prompt vs the budgeted builder
+Uses recorded incidents from the database (--from-db), a JSON/JSONL file of
+incident contexts (--corpus), or a synthetic corpus of log, metric and
+exception incidents:
+
+    python scripts/benchmark_prompts.py --from-db --limit 1000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.prompt_builder import TIKTOKEN_AVAILABLE, build_analysis_prompt, count_tokens
+
+def legacy_prompt(context):
+    """The prompt OumiAgent._build_analysis_prompt used to send"""
+    title = context.get('title', 'Unknown').replace('"', '\\"')
+    service = context.get('service', 'unknown').replace('"', '\\"')
+    error_type = context.get('error_type', 'unknown').replace('"', '\\"')
+    description = context.get('description', '').replace('"', '\\"')
+    stack_trace = context.get('stack_trace', 'Not available')[:1000]
+    return f"""You are a DevOps expert analyzing a production incident.
+
+        INCIDENT DETAILS:
+        - Title: {title}
+        - Service: {service}
+        - Error Type: {error_type}
+        - Description: {description}
+
+        STACK TRACE:
+        {stack_trace}
+
+        METADATA:
+        {json.dumps(context.get('metadata', {}), indent=2)}  # This stays as 'metadata' since it's the key name in the dict
+        """
+
+def synthetic_corpus(size):
+    services = ["checkout", "payments", "user-service", "api-gateway", "search"]
+    recursion = "".join(
+        '  File "/app/services/tree.py", line 42, in walk\n    return walk(node.child)\n' for _ in range(40)
+    )
+    java = "\n".join(
+        ["java.sql.SQLTransientConnectionException: HikariPool-1 - Connection is not available"]
+        + [f"\tat com.zaxxer.hikari.pool.HikariPool.getConnection(HikariPool.java:{n})" for n in (155, 128)] * 8
+        + [f"\tat com.shop.orders.OrderRepository.find{n}(OrderRepository.java:{n})" for n in range(30)]
+    )
+    corpus = []
+    for number in range(size):
+        service = random.choice(services)
+        kind = number % 3
+        if kind == 0:
+            message = f"Timeout talking to {service}-db after 30000ms"
+            corpus.append({
+                "title": f"Error in {service}",
+                "service": service,
+                "error_type": "log_error",
+                "description": message,
+                "stack_trace": None,
+                "metadata": {
+                    "service": service,
+                    "message": message,
+                    "level": "ERROR",
+                    "timestamp": "2024-05-01T12:00:00Z",
+                    "trace_id": f"{random.getrandbits(128):032x}",
+                    "host": f"{service}-{number % 7}",
+                    "headers": {"user-agent": "kube-probe/1.27", "x-request-id": str(number)},
+                    "context": {"pool": {"active": 50, "idle": 0, "waiting": 212}, "retries": [1, 2, 3]},
+                    "logs": [f"{service}: connection attempt {n} failed" for n in range(50)],
+                },
+            })
+        elif kind == 1:
+            corpus.append({
+                "title": "Threshold breach: cpu_usage",
+                "service": service,
+                "error_type": "threshold_breach",
+                "description": "Value 97 exceeded threshold 80",
+                "stack_trace": None,
+                "metadata": {"metric_name": "cpu_usage", "value": 97, "threshold": 80, "service": service,
+                             "labels": {"pod": f"{service}-7d9f", "namespace": "prod"}, "timestamp": 1714564800},
+            })
+        else:
+            corpus.append({
+                "title": f"RecursionError in {service}",
+                "service": service,
+                "error_type": "exception",
+                "description": "maximum recursion depth exceeded",
+                "stack_trace": (
+                    "Traceback (most recent call last):\n" + recursion
+                    + "RecursionError: maximum recursion depth exceeded"
+                ) if number % 2 else java,
+                "metadata": {"environment": "production", "version": "2.4.1"},
+            })
+    return corpus
+
+def load_corpus(path):
+    with open(path) as handle:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in handle if line.strip()]
+        return json.load(handle)
+
+def load_from_db(limit):
+    from app.services.database import SessionLocal
+    from app.models.incident import Incident
+    
+    db = SessionLocal()
+    try:
+        incidents = db.query(Incident).order_by(Incident.id.desc()).limit(limit).all()
+        return [{
+            "title": incident.title,
+            "description": incident.description,
+            "service": incident.service_name,
+            "error_type": incident.error_type,
+            "stack_trace": incident.stack_trace,
+            "metadata": incident.incident_metadata,
+        } for incident in incidents]
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSON or JSONL file of incident contexts")
+    parser.add_argument("--from-db", action="store_true", help="use recorded incidents")
+    parser.add_argument("--limit", type=int, default=300)
+    args = parser.parse_args()
+    
+    random.seed(7)
+    if args.from_db:
+        corpus = load_from_db(args.limit)
+    elif args.corpus:
+        corpus = load_corpus(args.corpus)[:args.limit]
+    else:
+        corpus = synthetic_corpus(args.limit)
+    
+    # The original builder crashed on a null stack trace / description
+    def legacy(context):
+        return legacy_prompt({key: value for key, value in context.items() if value is not None})
+    
+    before = [count_tokens(legacy(context)) for context in corpus]
+    after = [count_tokens(build_analysis_prompt(context)) for context in corpus]
+    
+    print(f"{len(corpus)} incidents, token counts {'from tiktoken' if TIKTOKEN_AVAILABLE else 'estimated'}")
+    print(f"{'':>8} {'mean':>8} {'max':>8} {'total':>10}")
+    for label, counts in (("before", before), ("after", after)):
+        print(f"{label:>8} {sum(counts) / len(counts):>8.0f} {max(counts):>8} {sum(counts):>10}")
+    print(f"saved {sum(before) - sum(after)} tokens ({1 - sum(after) / sum(before):.0%})")
+
+if __name__ == "__main__":
+    main()
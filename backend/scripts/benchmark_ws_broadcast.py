@@ -0,0 +1,110 @@
+"""
+Benchmark WebSocket fan-out to many clients, a few of them slow
+Simulates --clients dashboard connections subscribed to "*", of which
+--slow-fraction take --slow-delay seconds per send (a stalled browser or
+a congested link), and publishes --messages events through:
+
+    sequential  awaiting each client in turn (the previous broadcast)
+    queued      ConnectionManager: serialize once, per-client send queues
+
+Reports the delivery latency percentiles of the healthy clients:
+
+    python scripts/benchmark_ws_broadcast.py --clients 10000 --messages 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.websocket_manager import ConnectionManager
+
+class SimulatedClient:
+    def __init__(self, delay: float, received: list):
+        self.delay = delay
+        self.received = received
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        # Parsed after the run, so decoding does not slow the delivery being measured
+        self.received.append((time.perf_counter(), text))
+    
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message))
+    
+    async def close(self, code: int = 1000):
+        pass
+
+def make_clients(args) -> tuple:
+    healthy, slow = [], []
+    every = int(1 / args.slow_fraction) if args.slow_fraction else 0
+    clients = []
+    for n in range(args.clients):
+        is_slow = every and n % every == 0
+        clients.append(SimulatedClient(args.slow_delay if is_slow else 0, slow if is_slow else healthy))
+    return clients, healthy, slow
+
+async def run_sequential(args) -> list:
+    clients, healthy, _ = make_clients(args)
+    for n in range(args.messages):
+        message = {"incident_id": n, "status": "analyzing", "sent_at": time.perf_counter()}
+        for client in clients:
+            await client.send_json(message)
+        await asyncio.sleep(args.interval)
+    return healthy
+
+async def run_queued(args) -> list:
+    clients, healthy, _ = make_clients(args)
+    manager = ConnectionManager()
+    for client in clients:
+        await manager.connect(client)
+        manager.subscribe(client, ["*"])
+    
+    for n in range(args.messages):
+        await manager.publish({"incident_id": n, "status": "analyzing", "sent_at": time.perf_counter()})
+        await asyncio.sleep(args.interval)
+    await manager.flush()
+    for client in clients:
+        manager.disconnect(client)
+    return healthy
+
+def latencies(received: list) -> list:
+    return sorted(at - json.loads(text)["sent_at"] for at, text in received)
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between published events")
+    parser.add_argument("--slow-fraction", type=float, default=0.01)
+    parser.add_argument("--slow-delay", type=float, default=0.02, help="Seconds a slow client takes per send")
+    args = parser.parse_args()
+    
+    results = {}
+    for name, run in (("sequential", run_sequential), ("queued", run_queued)):
+        started = time.perf_counter()
+        # Silence the per-connection log lines
+        with contextlib.redirect_stdout(io.StringIO()):
+            received = asyncio.run(run(args))
+        results[name] = (latencies(received), time.perf_counter() - started)
+    
+    print(f"{args.clients:,} clients ({args.slow_fraction:.0%} slow at {args.slow_delay * 1000:.0f}ms/send), "
+          f"{args.messages} messages")
+    print(f"{'':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'total':>10}")
+    for name, (values, elapsed) in results.items():
+        row = [percentile(values, q) * 1000 for q in (0.5, 0.95, 0.99)] + [values[-1] * 1000]
+        print(f"{name:<12}" + "".join(f"{value:>8.1f}ms" for value in row) + f"{elapsed:>9.1f}s")
+
+if __name__ == "__main__":
+    main()
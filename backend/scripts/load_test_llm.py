@@ -0,0 +1,64 @@
+"""
+Load test the LLM scheduler against scripts/stub_llm_server.py
+Fires a storm of analyses with mixed severities and reports latency per
+severity, so CRITICAL should finish first even when LOW ones flood in:
+
+    LLM_BASE_URL=http://localhost:9000/v1 python scripts/load_test_llm.py --incidents 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_BASE_URL", "http://localhost:9000/v1")
+
+from app.services.ai_agent import OumiAgent
+from app.services.http_client import http_clients
+
+SEVERITIES = ["critical", "high", "medium", "low"]
+WEIGHTS = [0.05, 0.15, 0.3, 0.5]
+
+async def run(incidents: int):
+    agent = OumiAgent()
+    latencies = {severity: [] for severity in SEVERITIES}
+    failures = 0
+    
+    async def analyze(number: int, severity: str):
+        nonlocal failures
+        start = time.perf_counter()
+        analysis = await agent.analyze_incident({
+            "title": f"Load test incident {number}",
+            "service": "load-test",
+            "error_type": "timeout",
+            "severity": severity,
+        })
+        if "error" in analysis:
+            failures += 1
+        latencies[severity].append(time.perf_counter() - start)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        analyze(number, random.choices(SEVERITIES, WEIGHTS)[0]) for number in range(incidents)
+    ))
+    elapsed = time.perf_counter() - started
+    await http_clients.close()
+    
+    print(f"{incidents} analyses in {elapsed:.1f}s ({failures} failed)")
+    print(f"{'severity':>10} {'count':>6} {'p50 s':>8} {'p95 s':>8}")
+    for severity in SEVERITIES:
+        values = latencies[severity]
+        if values:
+            print(f"{severity:>10} {len(values):>6} {np.percentile(values, 50):>8.2f} {np.percentile(values, 95):>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--incidents", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.incidents))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 """Seed database with sample incidents for demo"""
+import asyncio
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.models.incident import Incident, SeverityLevel, IncidentStatus
-from app.services.database import SessionLocal
+from app.services.database import AsyncSessionLocal, SessionLocal
+from app.services.rollup_service import RollupService
 from datetime import datetime, timedelta
 import random
 
@@ -88,7 +90,15 @@ def seed_incidents():
     
     db.commit()
     print(f"✅ Seeded {len(sample_incidents)} incidents")
+    
     db.close()
+    
+    # Seeded rows bypass the incremental rollup updates
+    asyncio.run(rebuild_rollups())
+
+async def rebuild_rollups():
+    async with AsyncSessionLocal() as db:
+        await RollupService.rebuild(db)
 
 if __name__ == "__main__":
     seed_incidents()
@@ -0,0 +1,92 @@
+"""
+Local stand-in for an OpenAI-compatible LLM API, for load testing
+Answers /v1/chat/completions with a canned analysis after a configurable
+latency (spread over SSE chunks when the request sets `stream: true`) and
+returns 429 + Retry-After once its own rate limit is exceeded:
+
+    python scripts/stub_llm_server.py --port 9000 --latency 0.5 --rps 5
+    LLM_BASE_URL=http://localhost:9000/v1 python scripts/load_test_llm.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANALYSIS = {
+    "root_cause": "Connection pool exhausted under load",
+    "impact": "Requests to the service time out",
+    "resolution_steps": ["Restart the service", "Raise the pool size"],
+    "prevention_steps": ["Alert on pool saturation"],
+    "confidence": "high",
+}
+
+def create_app(latency: float, jitter: float, rps: float) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    window = {"second": 0, "count": 0}
+    stats = {"ok": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0}
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        second = int(time.time())
+        if window["second"] != second:
+            window["second"], window["count"] = second, 0
+        window["count"] += 1
+        if rps and window["count"] > rps:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit exceeded"}},
+                headers={"Retry-After": "1"}
+            )
+        
+        if body.get("stream"):
+            return StreamingResponse(stream_completion(), media_type="text/event-stream")
+        
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        finally:
+            stats["in_flight"] -= 1
+        stats["ok"] += 1
+        return {"choices": [{"message": {"role": "assistant", "content": json.dumps(ANALYSIS)}}]}
+    
+    async def stream_completion():
+        content = json.dumps(ANALYSIS)
+        chunks = [content[i:i + 4] for i in range(0, len(content), 4)]
+        delay = max(0.0, latency + random.uniform(-jitter, jitter)) / len(chunks)
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            for chunk in chunks:
+                await asyncio.sleep(delay)
+                event = {"choices": [{"delta": {"content": chunk}}]}
+                yield f"data: {json.dumps(event)}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            stats["in_flight"] -= 1
+        stats["ok"] += 1
+    
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+    
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--rps", type=float, default=5, help="requests per second before 429s (0 = unlimited)")
+    args = parser.parse_args()
+    
+    uvicorn.run(create_app(args.latency, args.jitter, args.rps), host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import asyncio
+import numpy as np
+from fakeredis import FakeServer, aioredis as fakeredis
+
+from app.services import analysis_cache as analysis_cache_module
+from app.services.analysis_cache import AnalysisCache
+from app.services.ai_agent import OumiAgent
+
+ANALYSIS = {"root_cause": "Connection pool exhausted", "resolution_steps": ["Raise pool size"], "confidence": "high"}
+
+def make_cache(server=None) -> AnalysisCache:
+    cache = AnalysisCache()
+    
+    class FakeRedisService:
+        client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    
+    cache.attach_redis(FakeRedisService())
+    return cache
+
+def test_exact_and_semantic_tiers():
+    async def scenario():
+        cache = make_cache()
+        await cache.set("prompt A", ANALYSIS, embedding=[1.0, 0.0, 0.0])
+        
+        exact = await cache.get_exact("prompt A")
+        assert exact["root_cause"] == ANALYSIS["root_cause"]
+        assert exact["cache"] == "exact"
+        assert await cache.get_exact("prompt B") is None
+        
+        similar = await cache.get_similar([0.99, 0.05, 0.0])
+        assert similar["cache"] == "semantic"
+        assert similar["resolution_steps"] == ANALYSIS["resolution_steps"]
+        assert await cache.get_similar([0.0, 1.0, 0.0]) is None
+        
+        stats = await cache.stats()
+        assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+        assert stats["hit_rate"] == round(2 / 3, 4)
+    
+    asyncio.run(scenario())
+
+def test_semantic_tier_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(analysis_cache_module.settings, "ANALYSIS_CACHE_MAX_ENTRIES", 2)
+    
+    async def scenario():
+        cache = make_cache()
+        await cache.set("first", ANALYSIS, embedding=[1.0, 0.0])
+        await cache.set("second", ANALYSIS, embedding=[0.0, 1.0])
+        # Touch "first" so "second" becomes the eviction candidate
+        await cache.get_exact("first")
+        await cache.set("third", ANALYSIS, embedding=[-1.0, 0.0])
+        
+        remaining = await cache.client.zrange(cache.SEMANTIC_LRU, 0, -1)
+        assert sorted(remaining) == sorted([cache.prompt_key("first"), cache.prompt_key("third")])
+    
+    asyncio.run(scenario())
+
+def test_agent_skips_llm_on_cache_hit(monkeypatch):
+    cache = make_cache()
+    monkeypatch.setattr("app.services.ai_agent.analysis_cache", cache)
+    calls = []
+    
+    async def fake_call_llm(self, prompt, max_retries=3, severity=None):
+        calls.append(prompt)
+        return '{"root_cause": "Bad deploy", "resolution_steps": ["Roll back"], "confidence": "high"}'
+    
+    async def fake_embed(self, context):
+        return np.array([0.2, 0.4, 0.1], dtype=np.float32)
+    
+    monkeypatch.setattr(OumiAgent, "_call_llm", fake_call_llm)
+    monkeypatch.setattr(OumiAgent, "_embed_for_cache", fake_embed)
+    
+    async def scenario():
+        agent = OumiAgent()
+        context = {"title": "5xx spike", "service": "api", "error_type": "http_500"}
+        first = await agent.analyze_incident(context)
+        second = await agent.analyze_incident(context)
+        near_duplicate = await agent.analyze_incident({**context, "description": "seen again"})
+        return first, second, near_duplicate
+    
+    first, second, near_duplicate = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert "cache" not in first
+    assert second["cache"] == "exact"
+    assert near_duplicate["cache"] == "semantic"
+
+def test_agent_survives_a_failing_cache_and_counts_exact_only_misses(monkeypatch):
+    server = FakeServer()
+    cache = make_cache(server)
+    monkeypatch.setattr("app.services.ai_agent.analysis_cache", cache)
+    calls = []
+    
+    async def fake_call_llm(self, prompt, max_retries=3, severity=None):
+        calls.append(prompt)
+        return '{"root_cause": "Bad deploy", "resolution_steps": ["Roll back"], "confidence": "high"}'
+    
+    monkeypatch.setattr(OumiAgent, "_call_llm", fake_call_llm)
+    
+    async def scenario():
+        agent = OumiAgent()
+        # Group prompts only use the exact tier
+        contexts = [{"title": "5xx spike", "service": "api"}, {"title": "Timeouts", "service": "gateway"}]
+        await agent.analyze_incident_group(contexts)
+        stats = await cache.stats()
+        assert stats["misses"] == 1 and stats["hit_rate"] == 0.0
+        
+        server.connected = False
+        analysis = await agent.analyze_incident_group([*contexts, {"title": "OOM", "service": "worker"}])
+        assert analysis["root_cause"] == "Bad deploy" and "error" not in analysis
+    
+    asyncio.run(scenario())
+    assert len(calls) == 2
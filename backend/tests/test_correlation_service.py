@@ -0,0 +1,137 @@
+import asyncio
+import numpy as np
+import pytest
+
+from app.models.incident import Base, Incident, IncidentAction
+from app.services import correlation_service as correlation_module
+from app.services import incident_processor
+from app.services.ai_agent import OumiAgent
+from app.services.correlation_service import CorrelationService
+from app.services.incident_processor import IncidentProcessor
+from app.services.knowledge_index import KnowledgeIndex
+from tests.conftest import engine, TestingSessionLocal, AsyncTestingSessionLocal
+
+DEPENDENCIES = {"checkout": ["payments"], "orders": ["postgres"], "payments": ["postgres"]}
+
+async def fake_embed(texts):
+    return np.array([[1.0, 0.0] if "db_timeout" in text else [0.0, 1.0] for text in texts])
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(incident_processor, "AsyncSessionLocal", AsyncTestingSessionLocal)
+    monkeypatch.setattr(correlation_module, "AsyncSessionLocal", AsyncTestingSessionLocal)
+    monkeypatch.setattr(incident_processor, "knowledge_index", KnowledgeIndex())
+    monkeypatch.setattr(correlation_module.settings, "CORRELATION_GATHER_SECONDS", 0.05)
+    monkeypatch.setattr(correlation_module.settings, "CORRELATION_POLL_INTERVAL", 0.01)
+    
+    service = CorrelationService(DEPENDENCIES)
+    monkeypatch.setattr(service, "_embed", fake_embed)
+    monkeypatch.setattr(incident_processor, "correlation_service", service)
+    Base.metadata.create_all(bind=engine)
+    yield service
+    Base.metadata.drop_all(bind=engine)
+
+def add_incidents(*specs):
+    db = TestingSessionLocal()
+    incidents = [Incident(title=f"{error} in {service}", service_name=service, error_type=error) for service, error in specs]
+    db.add_all(incidents)
+    db.commit()
+    ids = [incident.id for incident in incidents]
+    db.close()
+    return ids
+
+def test_dependency_graph_relates_shared_upstreams():
+    service = CorrelationService(DEPENDENCIES)
+    assert service.services_related("checkout", "orders")  # both reach postgres
+    assert service.services_related("payments", "payments")
+    assert not service.services_related("checkout", "search")
+    assert not service.services_related("search", "search")  # undeclared
+
+def test_same_service_needs_similarity_without_dependencies(service, monkeypatch):
+    undeclared = CorrelationService({})
+    first, similar, _ = add_incidents(
+        ("checkout", "db_timeout"),
+        ("checkout", "db_timeout"),
+        ("checkout", "disk_full"),
+    )
+    monkeypatch.setattr(undeclared, "_embed", fake_embed)
+    
+    async def scenario():
+        async with AsyncTestingSessionLocal() as db:
+            return await undeclared.find_correlated(db, await db.get(Incident, first))
+    
+    assert [incident.id for incident in asyncio.run(scenario())] == [similar]
+
+def test_cascading_outage_is_analyzed_once(service, monkeypatch):
+    ids = add_incidents(
+        ("checkout", "db_timeout"),
+        ("orders", "db_timeout"),
+        ("payments", "db_timeout"),
+        ("billing", "db_timeout"),  # no declared dependency, similar error
+        ("search", "disk_full"),  # unrelated
+    )
+    calls = {"single": 0, "group": []}
+    
+    async def analyze_incident(self, context, on_partial=None):
+        calls["single"] += 1
+        return {"root_cause": "Search disk full", "resolution_steps": ["Clean up"]}
+    
+    async def analyze_incident_group(self, contexts, on_partial=None):
+        calls["group"].append(sorted(context["service"] for context in contexts))
+        return {"root_cause": "Postgres primary down", "resolution_steps": ["Fail over"]}
+    
+    async def succeed(*args):
+        return {"success": True}
+    
+    async def knowledge(incident):
+        return {"error_pattern": incident.error_type, "embedding": [0.1, 0.2]}
+    
+    monkeypatch.setattr(OumiAgent, "analyze_incident", analyze_incident)
+    monkeypatch.setattr(OumiAgent, "analyze_incident_group", analyze_incident_group)
+    monkeypatch.setattr(IncidentProcessor, "_execute_resolution", succeed)
+    monkeypatch.setattr(IncidentProcessor, "_create_knowledge_embedding", knowledge)
+    monkeypatch.setattr(IncidentProcessor, "_notify", succeed)
+    
+    async def run_all():
+        await asyncio.gather(*(IncidentProcessor.process_incident(incident_id) for incident_id in ids))
+    
+    asyncio.run(run_all())
+    
+    assert calls["group"] == [["billing", "checkout", "orders", "payments"]]
+    assert calls["single"] == 1
+    
+    db = TestingSessionLocal()
+    try:
+        incidents = {incident.service_name: incident for incident in db.query(Incident)}
+        correlation_ids = {incidents[name].correlation_id for name in ("checkout", "orders", "payments", "billing")}
+        assert len(correlation_ids) == 1 and None not in correlation_ids
+        assert incidents["search"].correlation_id is None
+        assert incidents["orders"].root_cause == "Postgres primary down"
+        assert incidents["search"].root_cause == "Search disk full"
+    finally:
+        db.close()
+
+def test_late_arrival_reuses_group_analysis(service, monkeypatch):
+    first, = add_incidents(("payments", "db_timeout"))
+    late, = add_incidents(("checkout", "db_timeout"))
+    
+    async def scenario():
+        correlation_id, leader = await service.claim(first)
+        assert leader
+        assert await service.claim(late) == (correlation_id, False)
+        return correlation_id
+    
+    correlation_id = asyncio.run(scenario())
+    assert [incident.id for incident in asyncio.run(service.members(correlation_id))] == [first, late]
+
+def test_followers_stop_waiting_on_a_failed_group_analysis(service):
+    leader, follower = add_incidents(("payments", "db_timeout"), ("checkout", "db_timeout"))
+    
+    db = TestingSessionLocal()
+    db.query(Incident).update({Incident.correlation_id: "group"})
+    db.add(IncidentAction(incident_id=leader, action_type="analysis", result={"error": "LLM down"}, success=-1))
+    db.commit()
+    db.close()
+    
+    analysis = asyncio.run(service.wait_for_analysis("group", follower, timeout=5))
+    assert analysis == {"error": "LLM down"}
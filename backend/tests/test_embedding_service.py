@@ -0,0 +1,35 @@
+import asyncio
+import numpy as np
+
+from app.services import embedding_service
+from app.services.embedding_service import EmbeddingBatcher, EmbeddingService
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+    
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.batches.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+def test_concurrent_requests_are_encoded_in_one_batch(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(embedding_service, "get_model", lambda: model)
+    monkeypatch.setattr(embedding_service, "embedding_batcher", EmbeddingBatcher(max_batch_size=16, max_wait_ms=20))
+    
+    async def scenario():
+        service = EmbeddingService()
+        texts = ["a" * n for n in range(1, 11)]
+        return await asyncio.gather(*(service.create_embedding(text) for text in texts))
+    
+    vectors = asyncio.run(scenario())
+    assert vectors == [[float(n), 1.0] for n in range(1, 11)]
+    assert len(model.batches) == 1
+
+def test_batches_are_capped(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(embedding_service, "get_model", lambda: model)
+    batcher = EmbeddingBatcher(max_batch_size=4, max_wait_ms=20)
+    
+    asyncio.run(batcher.encode_many([str(n) for n in range(10)]))
+    assert [len(batch) for batch in model.batches] == [4, 4, 2]
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import fakeredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.event_relay import EventRelay
+from app.services.redis_service import RedisService
+from app.services.websocket_manager import ConnectionManager
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+class Node:
+    """One API process: its own Redis connection, WebSocket manager and relay"""
+    
+    def __init__(self, server):
+        self.redis = RedisService()
+        self.redis.client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        self.manager = ConnectionManager()
+        self.relay = EventRelay(self.redis, self.manager)
+    
+    async def client(self, *topics) -> FakeWebSocket:
+        websocket = FakeWebSocket()
+        await self.manager.connect(websocket)
+        self.manager.subscribe(websocket, topics)
+        return websocket
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+def test_events_reach_clients_on_every_node():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        nodes = [Node(server), Node(server)]
+        dashboard = await nodes[0].client("*")
+        watcher = await nodes[1].client("incident:7")
+        bystander = await nodes[1].client("incident:8")
+        for node in nodes:
+            node.relay.start()
+            await asyncio.wait_for(node.relay.subscribed.wait(), 2)
+        
+        # Published from a third process, e.g. the worker
+        publisher = Node(server).redis
+        await publisher.publish_incident(7, "checkout", "high")
+        await publisher.publish_incident_update(7, "analyzing", {"partial": True})
+        await wait_for(lambda: len(dashboard.sent) == 2 and len(watcher.sent) == 2)
+        
+        assert dashboard.sent == watcher.sent
+        assert dashboard.sent[0] == {"incident_id": 7, "service_name": "checkout", "severity": "high"}
+        assert bystander.sent == []
+        assert [node.relay.relayed for node in nodes] == [2, 2]
+        
+        for node in nodes:
+            await node.relay.stop()
+    
+    asyncio.run(scenario())
+
+def test_relay_resubscribes_and_asks_clients_to_resync(monkeypatch):
+    monkeypatch.setattr("app.services.event_relay.settings.WS_RELAY_RETRY_SECONDS", 0.01)
+    
+    async def scenario():
+        node = Node(fakeredis.FakeServer())
+        dashboard = await node.client("*")
+        pubsub = node.redis.client.pubsub
+        failures = []
+        
+        def flaky_pubsub():
+            if not failures:
+                failures.append(1)
+                raise RedisConnectionError("Connection refused")
+            return pubsub()
+        
+        node.redis.client.pubsub = flaky_pubsub
+        node.relay.start()
+        await asyncio.wait_for(node.relay.subscribed.wait(), 2)
+        await node.redis.publish_incident(3)
+        await wait_for(lambda: len(dashboard.sent) == 2)
+        
+        assert dashboard.sent == [{"type": "resync"}, {"incident_id": 3}]
+        await node.relay.stop()
+    
+    asyncio.run(scenario())
+
+class QuietRedisServer:
+    """Bare RESP server: acknowledges PSUBSCRIBE, then stays silent until told to push"""
+    
+    def __init__(self):
+        self.connections = 0
+        self.subscribers = []
+    
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    await reader.readline()
+                    args.append((await reader.readline()).strip().decode())
+                if args[0].upper() == "PSUBSCRIBE":
+                    pattern = args[1]
+                    writer.write(f"*3\r\n$10\r\npsubscribe\r\n${len(pattern)}\r\n{pattern}\r\n:1\r\n".encode())
+                    self.subscribers.append((writer, pattern))
+                elif args[0].upper() == "PING" and len(args) > 1:
+                    # Health checks on a subscribed connection are answered as a message
+                    writer.write(f"*2\r\n$4\r\npong\r\n${len(args[1])}\r\n{args[1]}\r\n".encode())
+                elif args[0].upper() == "PING":
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+    
+    def push(self, channel: str, data: str):
+        for writer, pattern in self.subscribers:
+            if not writer.is_closing():
+                parts = ["pmessage", pattern, channel, data]
+                writer.write(b"*4\r\n" + b"".join(f"${len(p)}\r\n{p}\r\n".encode() for p in parts))
+
+def test_quiet_subscription_outlives_the_socket_timeout(monkeypatch):
+    monkeypatch.setattr("app.services.redis_service.settings.REDIS_SOCKET_TIMEOUT", 0.2)
+    
+    async def scenario():
+        fake = QuietRedisServer()
+        server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        redis_service = RedisService()
+        redis_service.redis_url = f"redis://127.0.0.1:{port}/0"
+        await redis_service.connect()
+        manager = ConnectionManager()
+        dashboard = FakeWebSocket()
+        await manager.connect(dashboard)
+        manager.subscribe(dashboard, ["*"])
+        relay = EventRelay(redis_service, manager)
+        relay.start()
+        await asyncio.wait_for(relay.subscribed.wait(), 2)
+        
+        # Several socket timeouts of silence, then an event
+        await asyncio.sleep(1.5)
+        fake.push("incidents:new", json.dumps({"incident_id": 9}))
+        await wait_for(lambda: len(dashboard.sent) == 1)
+        
+        assert dashboard.sent == [{"incident_id": 9}]
+        assert fake.connections == 1
+        await relay.stop()
+        await redis_service.disconnect()
+        server.close()
+        await server.wait_closed()
+    
+    asyncio.run(scenario())
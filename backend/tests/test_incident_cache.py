@@ -0,0 +1,119 @@
+import asyncio
+from fakeredis import aioredis as fakeredis
+
+from app.services.incident_cache import IncidentCache
+
+DETAIL = {"id": 7, "title": "Checkout 500s", "status": "detected"}
+
+def make_cache() -> IncidentCache:
+    cache = IncidentCache()
+    
+    class FakeRedisService:
+        client = fakeredis.FakeRedis(decode_responses=True)
+    
+    cache.attach_redis(FakeRedisService())
+    return cache
+
+def returning(value):
+    async def load():
+        return value
+    return load
+
+def test_reads_hit_the_database_once_until_invalidated():
+    async def scenario():
+        cache = make_cache()
+        loads = []
+        
+        async def load():
+            loads.append(1)
+            return {**DETAIL, "status": "detected" if len(loads) == 1 else "resolved"}
+        
+        assert (await cache.get_incident(7, load))["status"] == "detected"
+        assert (await cache.get_incident(7, load))["status"] == "detected"
+        assert len(loads) == 1
+        
+        await cache.invalidate(7)
+        assert (await cache.get_incident(7, load))["status"] == "resolved"
+        assert len(loads) == 2
+    
+    asyncio.run(scenario())
+
+def test_invalidation_is_per_incident_but_covers_every_list_page():
+    async def scenario():
+        cache = make_cache()
+        loads = []
+        
+        def load(name):
+            async def run():
+                loads.append(name)
+                return [DETAIL] if name != "detail-8" else {**DETAIL, "id": 8}
+            return run
+        
+        await cache.get_incident(8, load("detail-8"))
+        await cache.get_list({"status": "detected"}, load("list-detected"))
+        await cache.get_list({"status": None}, load("list-all"))
+        
+        await cache.invalidate(7)
+        await cache.get_incident(8, load("detail-8"))
+        await cache.get_list({"status": "detected"}, load("list-detected"))
+        await cache.get_list({"status": None}, load("list-all"))
+        
+        assert loads == ["detail-8", "list-detected", "list-all", "list-detected", "list-all"]
+    
+    asyncio.run(scenario())
+
+def test_write_through_serves_the_update_without_a_reload():
+    async def scenario():
+        cache = make_cache()
+        await cache.get_incident(7, returning(DETAIL))
+        await cache.write_through(7, {**DETAIL, "status": "resolved"})
+        
+        async def unexpected_load():
+            raise AssertionError("write-through entry should be served")
+        
+        assert (await cache.get_incident(7, unexpected_load))["status"] == "resolved"
+    
+    asyncio.run(scenario())
+
+def test_concurrent_misses_load_once(monkeypatch):
+    monkeypatch.setattr("app.services.incident_cache.settings.INCIDENT_CACHE_POLL_INTERVAL", 0.01)
+    
+    async def scenario():
+        cache = make_cache()
+        loads = []
+        original_set = cache.client.set
+        
+        async def slow_set(key, *args, **kwargs):
+            # Hold the lock long enough for every caller to miss
+            if not key.endswith(":lock"):
+                await asyncio.sleep(0.05)
+            return await original_set(key, *args, **kwargs)
+        
+        cache.client.set = slow_set
+        
+        async def load():
+            loads.append(1)
+            return DETAIL
+        
+        results = await asyncio.gather(*[cache.get_incident(7, load) for _ in range(20)])
+        assert all(result == DETAIL for result in results)
+        assert len(loads) == 1
+    
+    asyncio.run(scenario())
+
+def test_missing_incident_is_not_cached_and_does_not_stall_waiters():
+    async def scenario():
+        cache = make_cache()
+        results = await asyncio.gather(*[cache.get_incident(404, returning(None)) for _ in range(5)])
+        assert results == [None] * 5
+        assert await cache.client.keys(f"{cache.PREFIX}detail:*") == []
+    
+    asyncio.run(scenario())
+
+def test_without_redis_reads_go_to_the_database():
+    async def scenario():
+        cache = IncidentCache()
+        assert await cache.get_list({}, returning([DETAIL])) == [DETAIL]
+        assert await cache.invalidate(7) == []
+    
+    asyncio.run(scenario())
@@ -1,22 +1,18 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from app.main import app
 from app.models.incident import Base
 from app.services.database import get_db
+from app.routes.incidents import IncidentResponse
+from tests.conftest import engine, TestingSessionLocal, AsyncTestingSessionLocal, override_get_db
 
-# Test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
+def run_with_session(work):
+    """Run an async helper that takes a session, e.g. RollupService.rebuild"""
+    async def run():
+        async with AsyncTestingSessionLocal() as db:
+            return await work(db)
+    return asyncio.run(run())
 
 app.dependency_overrides[get_db] = override_get_db
 
@@ -42,3 +38,193 @@ def test_get_dashboard_stats(client):
     data = response.json()
     assert "total_incidents" in data
     assert "active_incidents" in data
+
+def seed_incidents(count: int, service: str = "api"):
+    from datetime import datetime, timedelta
+    from app.models.incident import Incident, IncidentStatus
+    
+    db = TestingSessionLocal()
+    start = datetime(2026, 1, 1)
+    # Pairs share a detected_at so the id tie-breaker is exercised
+    db.add_all([
+        Incident(
+            title=f"Incident {n}",
+            service_name=service,
+            error_type="500_errors",
+            status=IncidentStatus.DETECTED,
+            detected_at=start + timedelta(minutes=n // 2)
+        )
+        for n in range(count)
+    ])
+    db.commit()
+    db.close()
+
+def test_list_incidents_cursor_pagination(client):
+    seed_incidents(7)
+    seed_incidents(3, service="billing")
+    
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, "service": "api"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/incidents", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen += page
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    
+    assert len(seen) == 7
+    assert len({i["id"] for i in seen}) == 7
+    assert all(i["service_name"] == "api" for i in seen)
+    keys = [(i["detected_at"], i["id"]) for i in seen]
+    assert keys == sorted(keys, reverse=True)
+
+def test_list_incidents_rejects_bad_cursor(client):
+    response = client.get("/api/v1/incidents", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_list_incidents_sparse_fields(client):
+    seed_incidents(4)
+    
+    response = client.get("/api/v1/incidents", params={"fields": "id,status", "limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert [set(i) for i in page] == [{"id", "status"}] * 2
+    assert page[0]["status"] == "detected"
+    
+    # The cursor still works when the sort key was not requested
+    cursor = response.headers["X-Next-Cursor"]
+    rest = client.get("/api/v1/incidents", params={"fields": "title", "limit": 2, "cursor": cursor}).json()
+    assert [set(i) for i in rest] == [{"title"}] * 2
+    
+    full = client.get("/api/v1/incidents").json()
+    assert set(full[0]) == set(IncidentResponse.model_fields)
+    assert full[0]["resolution_steps"] == [] and full[0]["occurrence_count"] == 1
+
+def test_get_incident_sparse_fields(client):
+    seed_incidents(1)
+    incident_id = client.get("/api/v1/incidents").json()[0]["id"]
+    
+    response = client.get(f"/api/v1/incidents/{incident_id}", params={"fields": "title,severity"})
+    assert response.json() == {"title": "Incident 0", "severity": "medium"}
+    assert client.get(f"/api/v1/incidents/{incident_id}", params={"fields": "stack_trace"}).status_code == 400
+
+def seed_resolved(durations_minutes):
+    from datetime import datetime, timedelta
+    from app.models.incident import Incident, IncidentStatus, SeverityLevel
+    
+    db = TestingSessionLocal()
+    now = datetime.utcnow()
+    for minutes in durations_minutes:
+        db.add(Incident(
+            title="Resolved", service_name="api", error_type="500_errors",
+            severity=SeverityLevel.HIGH, status=IncidentStatus.RESOLVED,
+            detected_at=now - timedelta(minutes=minutes), resolved_at=now
+        ))
+    db.add(Incident(title="Open", service_name="web", error_type="timeout", status=IncidentStatus.ANALYZING))
+    db.commit()
+    db.close()
+
+@pytest.mark.parametrize("aggregate_filter", [True, False])
+def test_dashboard_stats_aggregate_in_sql(client, monkeypatch, aggregate_filter):
+    monkeypatch.setattr("app.services.rollup_service.settings.ANALYTICS_ROLLUPS_ENABLED", False)
+    monkeypatch.setattr("app.routes.analytics.supports_aggregate_filter", lambda dialect: aggregate_filter)
+    seed_resolved([10, 30])
+    
+    data = client.get("/api/v1/analytics/dashboard").json()
+    assert data["total_incidents"] == 3
+    assert data["active_incidents"] == 1
+    assert data["avg_resolution_time_minutes"] == 20.0
+    assert data["severity_distribution"] == {"SeverityLevel.HIGH": 2, "SeverityLevel.MEDIUM": 1}
+    assert data["top_services"][0] == {"service": "api", "count": 2}
+
+def test_mttr(client, monkeypatch):
+    monkeypatch.setattr("app.services.rollup_service.settings.ANALYTICS_ROLLUPS_ENABLED", False)
+    assert client.get("/api/v1/analytics/mttr").json() == {"mttr_minutes": 0, "sample_size": 0}
+    seed_resolved([15, 45, 60])
+    
+    data = client.get("/api/v1/analytics/mttr").json()
+    assert data["sample_size"] == 3
+    assert data["mttr_minutes"] == 40.0
+
+def rollup_rows():
+    from app.models.incident import IncidentRollup
+    
+    db = TestingSessionLocal()
+    rows = {
+        (r.granularity, r.bucket_start, r.dimension, r.value): (r.incidents, r.resolved, round(r.resolution_seconds, 3))
+        for r in db.query(IncidentRollup).all()
+        if r.incidents or r.resolved
+    }
+    db.close()
+    return rows
+
+def test_rollups_backfill_matches_live_aggregation(client):
+    from app.routes.analytics import live_dashboard_stats, rollup_dashboard_stats
+    from app.services.rollup_service import RollupService
+    
+    seed_resolved([10, 30, 50])
+    seed_incidents(4, service="billing")
+    
+    assert run_with_session(RollupService.rebuild) == 8
+    rollup = run_with_session(rollup_dashboard_stats)
+    live = run_with_session(live_dashboard_stats)
+    
+    assert rollup["total_incidents"] == live["total_incidents"] == 8
+    assert rollup["active_incidents"] == live["active_incidents"] == 5
+    assert rollup["avg_resolution_time_minutes"] == live["avg_resolution_time_minutes"] == 30.0
+    assert rollup["severity_distribution"] == live["severity_distribution"]
+    assert rollup["top_services"] == live["top_services"]
+    assert client.get("/api/v1/analytics/mttr").json()["sample_size"] == 3
+
+def test_rollups_follow_incident_changes(client):
+    from datetime import datetime
+    from app.services.rollup_service import RollupService
+    
+    seed_incidents(3)
+    run_with_session(RollupService.rebuild)
+    
+    incident_ids = [i["id"] for i in client.get("/api/v1/incidents").json()]
+    client.put(f"/api/v1/incidents/{incident_ids[0]}/status", params={"status": "analyzing"})
+    client.put(f"/api/v1/incidents/{incident_ids[1]}/status", params={"status": "resolved"})
+    
+    stats = client.get("/api/v1/analytics/dashboard").json()
+    assert stats["total_incidents"] == 3
+    assert stats["active_incidents"] == 2
+    assert stats["resolved_today"] == 1
+    # MTTR windows on detection: the seeded incidents were detected on 2026-01-01
+    assert client.get("/api/v1/analytics/mttr").json()["sample_size"] == 0
+    days = (datetime.utcnow() - datetime(2026, 1, 1)).days + 1
+    assert client.get("/api/v1/analytics/mttr", params={"days": days}).json()["sample_size"] == 1
+    
+    # Incremental counters end up exactly where a full recount would
+    incremental = rollup_rows()
+    run_with_session(RollupService.rebuild)
+    assert rollup_rows() == incremental
+
+def test_rollup_mttr_matches_live_over_the_detection_window(client):
+    from datetime import datetime, timedelta
+    from app.models.incident import Incident, IncidentStatus
+    from app.routes.analytics import live_mttr, rollup_mttr
+    from app.services.rollup_service import RollupService
+    
+    now = datetime.utcnow()
+    db = TestingSessionLocal()
+    for detected_ago, resolved_ago in [
+        (timedelta(days=31), timedelta(0)),  # resolved in the window, detected before it
+        (timedelta(days=30) - timedelta(minutes=5), timedelta(days=29)),  # detected in the window's first hour
+        (timedelta(hours=3), timedelta(hours=1)),
+    ]:
+        db.add(Incident(title="Resolved", service_name="api", status=IncidentStatus.RESOLVED,
+                        detected_at=now - detected_ago, resolved_at=now - resolved_ago))
+    db.commit()
+    db.close()
+    run_with_session(RollupService.rebuild)
+    
+    live = run_with_session(lambda db: live_mttr(db, 30))
+    assert live["sample_size"] == 2
+    assert run_with_session(lambda db: rollup_mttr(db, 30)) == live
@@ -0,0 +1,120 @@
+import asyncio
+from fakeredis import aioredis as fakeredis
+
+from app.services.job_queue import JobQueue
+from app.worker import IncidentWorker, JOB_HANDLERS
+
+def make_queue() -> JobQueue:
+    queue = JobQueue(fakeredis.FakeRedis(decode_responses=True), stream="test:jobs", group="test-workers")
+    queue.max_attempts = 2
+    return queue
+
+def test_enqueue_read_ack():
+    async def scenario():
+        queue = make_queue()
+        await queue.ensure_group()
+        await queue.ensure_group()  # Idempotent
+        
+        await queue.enqueue_many("process_incident", [{"incident_id": 1}, {"incident_id": 2}])
+        jobs = await queue.read("consumer-1", count=10, block_ms=10)
+        
+        assert [job["payload"] for job in jobs] == [{"incident_id": 1}, {"incident_id": 2}]
+        assert all(job["attempts"] == 0 for job in jobs)
+        
+        for job in jobs:
+            await queue.ack(job)
+        pending = await queue.client.xpending(queue.stream, queue.group)
+        assert pending["pending"] == 0
+    
+    asyncio.run(scenario())
+
+def test_failed_job_is_retried_then_dead_lettered():
+    async def scenario():
+        queue = make_queue()
+        await queue.ensure_group()
+        await queue.enqueue("process_incident", {"incident_id": 7})
+        
+        job = (await queue.read("consumer-1", block_ms=10))[0]
+        assert await queue.retry(job, "boom") is True
+        
+        job = (await queue.read("consumer-1", block_ms=10))[0]
+        assert job["attempts"] == 1
+        assert await queue.retry(job, "boom again") is False
+        
+        assert await queue.read("consumer-1", block_ms=10) == []
+        dead = await queue.client.xrange(queue.dead_letter_stream)
+        assert len(dead) == 1
+        assert dead[0][1]["error"] == "boom again"
+    
+    asyncio.run(scenario())
+
+def test_stale_jobs_are_recovered():
+    async def scenario():
+        queue = make_queue()
+        await queue.ensure_group()
+        await queue.enqueue("process_incident", {"incident_id": 3})
+        
+        # Consumer reads the job and dies without acking
+        await queue.read("crashed-consumer", block_ms=10)
+        assert await queue.recover_stale("recovery", min_idle_ms=0) == 1
+        
+        job = (await queue.read("consumer-2", block_ms=10))[0]
+        assert job["payload"] == {"incident_id": 3}
+        assert job["attempts"] == 1
+    
+    asyncio.run(scenario())
+
+def test_worker_acks_successful_jobs(monkeypatch):
+    handled = []
+    
+    async def fake_handler(payload, redis_service):
+        handled.append(payload["incident_id"])
+    
+    monkeypatch.setitem(JOB_HANDLERS, "process_incident", fake_handler)
+    
+    async def scenario():
+        worker = IncidentWorker(concurrency=1, name="test")
+        worker.queue = make_queue()
+        await worker.queue.ensure_group()
+        await worker.queue.enqueue("process_incident", {"incident_id": 11})
+        await worker.queue.enqueue("unknown_job", {})
+        
+        for job in await worker.queue.read("test-0", count=10, block_ms=10):
+            await worker.handle(job)
+        
+        assert handled == [11]
+        pending = await worker.queue.client.xpending(worker.queue.stream, worker.queue.group)
+        assert pending["pending"] == 0
+        # The unknown job was handed back for another attempt
+        retried = await worker.queue.read("test-0", count=10, block_ms=10)
+        assert [job["type"] for job in retried] == ["unknown_job"]
+    
+    asyncio.run(scenario())
+
+def test_consumer_survives_errors_while_handling(monkeypatch):
+    handled = []
+    
+    async def fake_handler(payload, redis_service):
+        handled.append(payload["incident_id"])
+    
+    monkeypatch.setitem(JOB_HANDLERS, "process_incident", fake_handler)
+    
+    async def scenario():
+        worker = IncidentWorker(concurrency=1, name="test")
+        worker.queue = make_queue()
+        await worker.queue.ensure_group()
+        ack = worker.queue.ack
+        
+        async def flaky_ack(job):
+            if job["payload"]["incident_id"] == 1:
+                raise ConnectionError("Redis went away")
+            await ack(job)
+            worker.stop()
+        
+        worker.queue.ack = flaky_ack
+        await worker.queue.enqueue("process_incident", {"incident_id": 1})
+        await worker.queue.enqueue("process_incident", {"incident_id": 2})
+        await asyncio.wait_for(worker._consume("test-0"), 2)
+        assert handled == [1, 2]
+    
+    asyncio.run(scenario())
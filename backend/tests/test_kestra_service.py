@@ -0,0 +1,78 @@
+import asyncio
+
+from app.services import kestra_service
+from app.services.kestra_service import ExecutionTracker, KestraService
+
+def test_waiters_complete_from_callback():
+    async def scenario():
+        tracker = ExecutionTracker()
+        waiters = [asyncio.create_task(tracker.wait(f"exec-{i}", timeout=5)) for i in range(3)]
+        await asyncio.sleep(0)
+        assert tracker.pending == 3
+        
+        for i in range(3):
+            state = "SUCCESS" if i < 2 else "FAILED"
+            assert tracker.complete({"id": f"exec-{i}", "state": {"current": state}})
+        
+        results = await asyncio.gather(*waiters)
+        assert [r["success"] for r in results] == [True, True, False]
+        assert tracker.pending == 0
+        
+        # Running executions and unknown IDs are ignored
+        assert not tracker.complete({"id": "exec-9", "state": {"current": "SUCCESS"}})
+    
+    asyncio.run(scenario())
+
+def test_shared_poller_batches_outstanding_executions(monkeypatch):
+    searches = []
+    
+    async def fake_search(self, since, flow_id=None, page=1, size=100):
+        searches.append(page)
+        return [
+            {"id": "exec-1", "state": {"current": "SUCCESS"}, "outputs": {"ok": True}},
+            {"id": "exec-2", "state": {"current": "KILLED"}}
+        ]
+    
+    monkeypatch.setattr(KestraService, "search_finished_executions", fake_search)
+    monkeypatch.setattr(kestra_service.settings, "KESTRA_POLL_INTERVAL", 0.01)
+    
+    async def scenario():
+        tracker = ExecutionTracker()
+        return await asyncio.gather(tracker.wait("exec-1", 5), tracker.wait("exec-2", 5))
+    
+    first, second = asyncio.run(scenario())
+    assert first == {"success": True, "execution_id": "exec-1", "outputs": {"ok": True}, "duration": None}
+    assert second["success"] is False
+    # Both waiters were answered by a single search request
+    assert len(searches) == 1
+
+def test_poller_pages_through_busy_flows(monkeypatch):
+    searches = []
+    # Three full pages of other executions before the one we wait for
+    finished = [{"id": f"other-{i}", "state": {"current": "SUCCESS"}} for i in range(6)]
+    finished.append({"id": "exec-7", "state": {"current": "SUCCESS"}})
+    
+    async def fake_search(self, since, flow_id=None, page=1, size=100):
+        searches.append((flow_id, page))
+        return finished[(page - 1) * size:page * size]
+    
+    monkeypatch.setattr(KestraService, "search_finished_executions", fake_search)
+    monkeypatch.setattr(kestra_service.settings, "KESTRA_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(kestra_service.settings, "KESTRA_POLL_PAGE_SIZE", 2)
+    
+    async def scenario():
+        return await ExecutionTracker().wait("exec-7", 5, flow_id="incident-resolution")
+    
+    result = asyncio.run(scenario())
+    assert result["success"] is True
+    assert searches == [("incident-resolution", page) for page in (1, 2, 3, 4)]
+
+def test_wait_times_out(monkeypatch):
+    monkeypatch.setattr(kestra_service.settings, "KESTRA_POLL_INTERVAL", 10)
+    
+    async def scenario():
+        return await ExecutionTracker().wait("exec-slow", timeout=0.01)
+    
+    result = asyncio.run(scenario())
+    assert result["success"] is False
+    assert result["error"] == "Execution timeout"
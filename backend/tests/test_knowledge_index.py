@@ -0,0 +1,98 @@
+import numpy as np
+
+from app.models.incident import Base, KnowledgeBase
+from app.services.knowledge_index import KnowledgeIndex
+from tests.conftest import engine, TestingSessionLocal
+
+def legacy_ranking(query, embeddings, top_k):
+    """The original per-entry Python loop, used as the reference ranking"""
+    scored = [
+        (i, np.dot(query, e) / (np.linalg.norm(query) * np.linalg.norm(e)))
+        for i, e in enumerate(embeddings)
+    ]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [i for i, _ in scored[:top_k]]
+
+def test_search_matches_legacy_ranking():
+    rng = np.random.default_rng(7)
+    embeddings = rng.normal(size=(500, 32)).astype(np.float32)
+    query = rng.normal(size=32).astype(np.float32)
+    
+    index = KnowledgeIndex(initial_capacity=8)  # Forces several resizes
+    index.add_many(range(500), embeddings)
+    
+    results = index.search(query, top_k=10)
+    assert [i for i, _ in results] == legacy_ranking(query, embeddings, 10)
+    assert results[0][1] >= results[-1][1]
+
+def test_incremental_add_and_remove():
+    index = KnowledgeIndex()
+    index.add(1, [1.0, 0.0])
+    index.add(2, [0.0, 1.0])
+    index.add(3, [0.7, 0.7])
+    
+    assert [i for i, _ in index.search([1.0, 0.1], top_k=2)] == [1, 3]
+    
+    assert index.remove(1)
+    assert not index.remove(1)
+    assert len(index) == 2
+    assert [i for i, _ in index.search([1.0, 0.1], top_k=5)] == [3, 2]
+    
+    # Re-adding replaces the stored vector
+    index.add(2, [1.0, 0.0])
+    assert index.search([1.0, 0.0], top_k=1)[0][0] == 2
+
+def test_empty_index():
+    assert KnowledgeIndex().search([1.0, 0.0]) == []
+
+def test_embeddings_round_trip_as_float32_and_sync_incrementally():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            KnowledgeBase(error_pattern="oom", embedding=[1.0, 0.0, 0.0]),
+            KnowledgeBase(error_pattern="disk", embedding=np.array([0.0, 1.0, 0.0]))
+        ])
+        db.commit()
+        
+        stored = db.query(KnowledgeBase).order_by(KnowledgeBase.id).first()
+        assert stored.embedding.dtype == np.float32
+        assert stored.embedding.tolist() == [1.0, 0.0, 0.0]
+        
+        index = KnowledgeIndex()
+        assert index.sync(db) == 2
+        assert index.sync(db) == 0
+        
+        db.add(KnowledgeBase(error_pattern="cpu", embedding=[0.0, 0.0, 1.0]))
+        db.commit()
+        assert index.sync(db) == 1
+        assert len(index) == 3
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def test_sync_picks_up_rows_committed_below_the_watermark():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        index = KnowledgeIndex()
+        # This node's own entry, added locally right after its commit
+        db.add(KnowledgeBase(id=5, error_pattern="oom", embedding=[1.0, 0.0]))
+        db.commit()
+        index.add(5, [1.0, 0.0])
+        
+        # Another worker commits a lower id afterwards
+        db.add(KnowledgeBase(id=4, error_pattern="disk", embedding=[0.0, 1.0]))
+        db.commit()
+        assert index.sync(db) == 1
+        assert 4 in index and index.synced_id == 5
+        
+        # Late commits below the sync watermark are found as well
+        db.add(KnowledgeBase(id=3, error_pattern="cpu", embedding=[0.7, 0.7]))
+        db.commit()
+        assert index.sync(db) == 1
+        assert index.sync(db) == 0
+        assert len(index) == 3
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
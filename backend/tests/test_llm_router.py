@@ -0,0 +1,80 @@
+import asyncio
+import time
+import pytest
+
+from app.services.ai_agent import LLMScheduler
+from app.services.llm_router import CircuitBreaker, LLMProvider, LLMRouter, NoProviderAvailable
+
+def make_provider(name: str) -> LLMProvider:
+    return LLMProvider(name, f"http://{name}.test/v1", "key", "model", LLMScheduler(name, max_concurrency=4, rate=0))
+
+def warm_up(provider: LLMProvider, latency: float, samples: int = 20):
+    for _ in range(samples):
+        provider.stats.record(latency, ok=True)
+
+def test_slow_primary_is_hedged_and_loser_cancelled():
+    primary, backup = make_provider("primary"), make_provider("backup")
+    warm_up(primary, 0.02)
+    cancelled = []
+    
+    async def call(provider):
+        try:
+            await asyncio.sleep(5 if provider is primary else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(provider.name)
+            raise
+        return provider.name
+    
+    async def scenario():
+        router = LLMRouter([primary, backup], hedge=True)
+        start = time.monotonic()
+        result = await router.complete(call)
+        return result, time.monotonic() - start
+    
+    result, elapsed = asyncio.run(scenario())
+    assert result == "backup"
+    assert elapsed < 1  # bounded by the primary's p95, not its 5s tail
+    assert cancelled == ["primary"]
+
+def test_failed_provider_fails_over_immediately():
+    primary, backup = make_provider("primary"), make_provider("backup")
+    
+    async def call(provider):
+        if provider is primary:
+            raise RuntimeError("502 from primary")
+        return "ok"
+    
+    assert asyncio.run(LLMRouter([primary, backup], hedge=False).complete(call)) == "ok"
+    assert primary.stats.error_rate == 1.0
+    assert backup.stats.error_rate == 0.0
+
+def test_fastest_provider_goes_first():
+    slow, fast = make_provider("slow"), make_provider("fast")
+    warm_up(slow, 2.0)
+    warm_up(fast, 0.5)
+    assert [p.name for p in LLMRouter([slow, fast]).available()] == ["fast", "slow"]
+
+def test_circuit_breaker_opens_and_recovers():
+    provider = make_provider("flaky")
+    provider.breaker = CircuitBreaker(error_rate=0.5, min_requests=4, cooldown=0.05)
+    router = LLMRouter([provider], hedge=False)
+    
+    async def failing(provider):
+        raise RuntimeError("503")
+    
+    async def succeeding(provider):
+        return "ok"
+    
+    async def scenario():
+        for _ in range(4):
+            with pytest.raises(RuntimeError):
+                await router.complete(failing)
+        assert provider.breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(NoProviderAvailable):
+            await router.complete(succeeding)
+        
+        await asyncio.sleep(0.06)
+        assert await router.complete(succeeding) == "ok"  # half-open trial
+        assert provider.breaker.state == CircuitBreaker.CLOSED
+    
+    asyncio.run(scenario())
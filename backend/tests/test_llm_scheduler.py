@@ -0,0 +1,111 @@
+import asyncio
+import time
+import httpx
+
+from app.services import ai_agent
+from app.services.ai_agent import LLMScheduler, OumiAgent, parse_retry_after
+from app.services.llm_router import LLMProvider, LLMRouter
+
+def single_provider_router() -> LLMRouter:
+    scheduler = LLMScheduler("test", max_concurrency=1, rate=0)
+    return LLMRouter([LLMProvider("test", "http://llm.test/v1", "key", "test-model", scheduler)])
+
+def test_waiters_are_admitted_by_severity():
+    async def scenario():
+        scheduler = LLMScheduler("test", max_concurrency=1, rate=0)
+        order = []
+        
+        async def request(severity):
+            async with scheduler.slot(severity):
+                order.append(severity)
+                await asyncio.sleep(0)
+        
+        await scheduler.acquire("low")  # occupy the only slot
+        tasks = [asyncio.create_task(request(severity)) for severity in ("low", "medium", "high", "critical")]
+        await asyncio.sleep(0)
+        assert scheduler.queued == 4
+        
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order
+    
+    assert asyncio.run(scenario()) == ["critical", "high", "medium", "low"]
+
+def test_concurrency_and_rate_are_bounded():
+    async def scenario():
+        scheduler = LLMScheduler("test", max_concurrency=2, rate=50, burst=1)
+        peak = 0
+        
+        async def request():
+            nonlocal peak
+            async with scheduler.slot():
+                peak = max(peak, scheduler.in_flight)
+                await asyncio.sleep(0.01)
+        
+        start = time.monotonic()
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak, time.monotonic() - start
+    
+    peak, elapsed = asyncio.run(scenario())
+    assert peak <= 2
+    assert elapsed >= 5 / 50 * 0.9  # burst of one, then one token per 20ms
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert 0 <= parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+def test_call_llm_honours_retry_after(monkeypatch):
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "0.05"}),
+        httpx.Response(200, json={"choices": [{"message": {"content": "{}"}}]}),
+    ])
+    requests = []
+    
+    def handler(request):
+        requests.append(time.monotonic())
+        return next(responses)
+    
+    sleeps = []
+    real_sleep = asyncio.sleep
+    
+    async def record_sleep(seconds):
+        sleeps.append(seconds)
+        await real_sleep(seconds)
+    
+    monkeypatch.setattr(ai_agent.asyncio, "sleep", record_sleep)
+    
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(ai_agent.http_clients, "get", lambda name: client)
+        agent = OumiAgent(router=single_provider_router())
+        try:
+            return await agent._call_llm("prompt", severity="critical")
+        finally:
+            await client.aclose()
+    
+    assert asyncio.run(scenario()) == "{}"
+    assert len(requests) == 2
+    assert sleeps == [0.05]
+
+def test_call_llm_does_not_retry_client_errors(monkeypatch):
+    calls = []
+    
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(401, json={"error": "bad key"})
+    
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(ai_agent.http_clients, "get", lambda name: client)
+        agent = OumiAgent(router=single_provider_router())
+        try:
+            await agent._call_llm("prompt")
+        except httpx.HTTPStatusError as e:
+            return e.response.status_code
+        finally:
+            await client.aclose()
+    
+    assert asyncio.run(scenario()) == 401
+    assert len(calls) == 1
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import time
+import httpx
+
+from app.services import ai_agent
+from app.services.ai_agent import LLMScheduler, OumiAgent
+from app.services.llm_router import LLMProvider, LLMRouter
+from app.services.llm_stream import PartialJSONParser
+
+ANALYSIS = {
+    "root_cause": "Connection pool exhausted",
+    "impact": "Checkout requests time out",
+    "resolution_steps": ["Restart the service", "Raise the pool size"],
+    "prevention_steps": ["Alert on pool saturation"],
+    "confidence": "high"
+}
+
+def single_provider_router() -> LLMRouter:
+    scheduler = LLMScheduler("test", max_concurrency=1, rate=0)
+    return LLMRouter([LLMProvider("test", "http://llm.test/v1", "key", "test-model", scheduler)])
+
+def test_partial_parser_closes_open_strings_and_brackets():
+    parser = PartialJSONParser()
+    assert parser.snapshot() is None
+    
+    parser.feed('```json\n{"root_cause": "Connection po')
+    assert parser.snapshot() == {"root_cause": "Connection po"}
+    
+    parser.feed('ol exhausted", "resolution_steps": ["Restart", "Ra')
+    assert parser.snapshot() == {
+        "root_cause": "Connection pool exhausted",
+        "resolution_steps": ["Restart", "Ra"]
+    }
+    
+    parser.feed('ise pool"], "conf')
+    assert parser.snapshot() is None  # dangling key
+    
+    parser.feed('idence": "high"}')
+    assert parser.snapshot()["confidence"] == "high"
+
+def test_partial_parser_handles_escapes():
+    parser = PartialJSONParser()
+    parser.feed('{"root_cause": "quote \\"x\\" and brace } inside \\')
+    assert parser.snapshot() == {"root_cause": 'quote "x" and brace } inside '}
+
+def sse_body(text: str, size: int = 7) -> bytes:
+    events = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": text[i:i + size]}}]})
+        for i in range(0, len(text), size)
+    ]
+    return ("\n\n".join(events + ["data: [DONE]"]) + "\n\n").encode()
+
+def test_analysis_streams_partial_fields(monkeypatch):
+    monkeypatch.setattr(ai_agent.settings, "LLM_STREAM_PUSH_INTERVAL", 0)
+    requests = []
+    
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=sse_body(json.dumps(ANALYSIS)),
+                              headers={"Content-Type": "text/event-stream"})
+    
+    partials = []
+    
+    async def on_partial(fields):
+        partials.append(fields)
+    
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(ai_agent.http_clients, "get", lambda name: client)
+        agent = OumiAgent(router=single_provider_router())
+        try:
+            return await agent.analyze_incident({"title": "Checkout down", "severity": "critical"}, on_partial=on_partial)
+        finally:
+            await client.aclose()
+    
+    analysis = asyncio.run(scenario())
+    
+    assert requests[0]["stream"] is True
+    assert analysis["root_cause"] == ANALYSIS["root_cause"]
+    assert len(partials) > 2
+    # Root cause text grows token by token before the steps arrive
+    assert partials[0]["root_cause"] != ANALYSIS["root_cause"]
+    assert "resolution_steps" not in partials[0]
+    assert partials[-1] == {key: ANALYSIS[key] for key in ai_agent.STREAMED_FIELDS}
+
+def test_stream_failure_falls_back_to_plain_completion(monkeypatch):
+    def handler(request):
+        if json.loads(request.content).get("stream"):
+            return httpx.Response(400, json={"error": "stream unsupported"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(ANALYSIS)}}]})
+    
+    async def on_partial(fields):
+        pass
+    
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(ai_agent.http_clients, "get", lambda name: client)
+        agent = OumiAgent(router=single_provider_router())
+        try:
+            return await agent.analyze_incident({"title": "Checkout down"}, on_partial=on_partial)
+        finally:
+            await client.aclose()
+    
+    assert asyncio.run(scenario())["resolution_steps"] == ANALYSIS["resolution_steps"]
+
+def two_provider_router() -> LLMRouter:
+    providers = [
+        LLMProvider(name, f"http://{name}.test/v1", "key", "test-model", LLMScheduler(name, max_concurrency=2, rate=0))
+        for name in ("primary", "backup")
+    ]
+    for _ in range(20):
+        providers[0].stats.record(0.05, ok=True)
+    return LLMRouter(providers, hedge=True)
+
+def run_analysis(monkeypatch, handler, router):
+    partials = []
+    
+    async def on_partial(fields):
+        partials.append(fields)
+    
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(ai_agent.http_clients, "get", lambda name: client)
+        agent = OumiAgent(router=router)
+        try:
+            return await agent.analyze_incident({"title": "Checkout down"}, on_partial=on_partial)
+        finally:
+            await client.aclose()
+    
+    return asyncio.run(scenario()), partials
+
+def test_stream_without_a_first_token_is_hedged(monkeypatch):
+    seen = []
+    
+    async def handler(request):
+        streamed = bool(json.loads(request.content).get("stream"))
+        seen.append((request.url.host, streamed))
+        if streamed:
+            await asyncio.sleep(5)  # stalled before the first token
+        return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(ANALYSIS)}}]})
+    
+    started = time.monotonic()
+    analysis, _ = run_analysis(monkeypatch, handler, two_provider_router())
+    
+    assert analysis["root_cause"] == ANALYSIS["root_cause"]
+    assert time.monotonic() - started < 1  # bounded by the primary's p95, not its stall
+    assert seen == [("primary.test", True), ("backup.test", False)]
+
+def test_stream_broken_part_way_fails_over(monkeypatch):
+    seen = []
+    
+    async def broken_stream():
+        yield sse_body(json.dumps(ANALYSIS))[:60]
+        raise httpx.ReadError("connection reset")
+    
+    def handler(request):
+        streamed = bool(json.loads(request.content).get("stream"))
+        seen.append(streamed)
+        if streamed:
+            return httpx.Response(200, content=broken_stream(), headers={"Content-Type": "text/event-stream"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(ANALYSIS)}}]})
+    
+    analysis, _ = run_analysis(monkeypatch, handler, single_provider_router())
+    
+    assert "error" not in analysis
+    assert analysis["resolution_steps"] == ANALYSIS["resolution_steps"]
+    assert seen == [True, False]
@@ -0,0 +1,64 @@
+import json
+
+from app.services.prompt_builder import (
+    build_analysis_prompt, compact_metadata, compact_stack_trace, count_tokens
+)
+
+RECURSIVE_TRACE = (
+    "Traceback (most recent call last):\n"
+    + '  File "/app/tree.py", line 42, in walk\n    return walk(node.child)\n' * 50
+    + "RecursionError: maximum recursion depth exceeded"
+)
+
+def test_repeated_frames_are_collapsed():
+    compacted = compact_stack_trace(RECURSIVE_TRACE)
+    assert compacted.count('File "/app/tree.py"') == 1
+    assert "... 49 repeated frames" in compacted
+    assert compacted.endswith("RecursionError: maximum recursion depth exceeded")
+
+def test_long_traces_keep_both_ends():
+    trace = "\n".join(["NullPointerException: order"] + [f"\tat com.shop.Frame{n}.run(Frame.java:{n})" for n in range(60)])
+    compacted = compact_stack_trace(trace, max_frames=9)
+    assert "Frame0." in compacted and "Frame59." in compacted
+    assert "... 51 frames omitted" in compacted
+    assert compacted.startswith("NullPointerException")
+
+def test_metadata_drops_noise_and_repeats():
+    metadata = {
+        "service": "checkout",
+        "message": "Timeout talking to db",
+        "timestamp": "2024-05-01T12:00:00Z",
+        "trace_id": "abc123",
+        "headers": {"user-agent": "probe"},
+        "empty": None,
+        "pool": {"active": 50, "idle": 0},
+        "logs": [f"attempt {n}" for n in range(30)],
+    }
+    compacted = json.loads(compact_metadata(metadata, shown={"checkout", "Timeout talking to db"}))
+    assert compacted == {
+        "pool": {"active": 50, "idle": 0},
+        "logs": [f"attempt {n}" for n in range(10)] + ["…(+20 more)"],
+    }
+
+def test_prompt_fits_budget_and_ranks_sections():
+    context = {
+        "title": "Checkout failing",
+        "service": "checkout",
+        "error_type": "exception",
+        "description": "Orders fail with 500",
+        "stack_trace": "\n".join(f"\tat com.shop.Frame{n}.run(Frame.java:{n}) " + "x" * 80 for n in range(200)),
+        "metadata": {"blob": ["y" * 300 for _ in range(10)]},
+        "severity": "critical",
+    }
+    prompt = build_analysis_prompt(context, budget=400)
+    
+    assert count_tokens(prompt) <= 400
+    assert "- Severity: critical" in prompt
+    assert "- Description: Orders fail with 500" in prompt
+    assert prompt.index("STACK TRACE:") < prompt.index("METADATA:")
+    assert prompt.rstrip().endswith("not symptoms.")
+
+def test_prompt_handles_missing_fields():
+    prompt = build_analysis_prompt({"title": "Disk full", "stack_trace": None, "metadata": None})
+    assert "STACK TRACE" not in prompt and "METADATA" not in prompt
+    assert "- Service: unknown" in prompt
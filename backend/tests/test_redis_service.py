@@ -0,0 +1,28 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config import get_settings
+from app.services.redis_service import RedisService, get_redis
+
+settings = get_settings()
+
+def test_connect_builds_one_shared_pool():
+    async def scenario():
+        service = RedisService()
+        await service.connect()
+        try:
+            assert service.client.connection_pool is service.pool
+            assert service.pool.max_connections == settings.REDIS_MAX_CONNECTIONS
+            kwargs = service.pool.connection_kwargs
+            assert kwargs["health_check_interval"] == settings.REDIS_HEALTH_CHECK_INTERVAL
+            assert kwargs["retry_on_timeout"] is True
+            assert kwargs["retry"]._retries == settings.REDIS_RETRIES
+        finally:
+            await service.disconnect()
+    
+    asyncio.run(scenario())
+
+def test_get_redis_returns_the_app_instance():
+    service = RedisService()
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(redis=service)))
+    assert get_redis(request) is service
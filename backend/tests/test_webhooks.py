@@ -1,16 +1,67 @@
+import asyncio
 import pytest
 import hmac
 import hashlib
 import json
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
+import fakeredis
+from redis.exceptions import RedisError
 from app.main import app
 from app.config import get_settings
+from app.models.incident import Base, Incident
+from app.services.database import get_db
+from app.services.deduplication_service import DeduplicationService
+from app.services.dispatch_service import DispatchService
+from app.services.incident_processor import IncidentProcessor
+from app.services.redis_service import RedisService, get_redis
+from tests.conftest import engine, TestingSessionLocal, AsyncTestingSessionLocal, override_get_db
 
 settings = get_settings()
 
+class FakeRedisService(RedisService):
+    """In-memory Redis that also records published incident IDs"""
+    
+    def __init__(self):
+        super().__init__()
+        self.server = fakeredis.FakeServer()
+        self.published = []
+    
+    @property
+    def client(self):
+        # TestClient runs each request on a fresh event loop, so hand out a
+        # new connection to the shared in-memory server every time
+        return fakeredis.aioredis.FakeRedis(server=self.server, decode_responses=True)
+    
+    @client.setter
+    def client(self, value):
+        pass
+    
+    def jobs(self) -> list:
+        """Jobs queued on the worker stream, read back synchronously"""
+        sync_client = fakeredis.FakeRedis(server=self.server, decode_responses=True)
+        return [
+            (fields["type"], json.loads(fields["payload"]))
+            for _, fields in sync_client.xrange(settings.JOB_STREAM)
+        ]
+    
+    def publish_on(self, pipe, events):
+        self.published.extend(event["incident_id"] for event in events)
+        super().publish_on(pipe, events)
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedisService()
+
 @pytest.fixture
-def client():
-    return TestClient(app)
+def client(monkeypatch, fake_redis):
+    # Match the secret create_test_signature signs with, whatever the environment says
+    monkeypatch.setattr(settings, "WEBHOOK_SECRET", "test-secret")
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    monkeypatch.setitem(app.dependency_overrides, get_redis, lambda: fake_redis)
+    Base.metadata.create_all(bind=engine)
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
 
 def create_test_signature(payload: str) -> str:
     return "sha256=" + hmac.new(
@@ -19,7 +70,7 @@ def create_test_signature(payload: str) -> str:
         hashlib.sha256
     ).hexdigest()
 
-def test_webhook_incident_valid(client):
+def test_webhook_incident_valid(client, fake_redis):
     payload = {
         "title": "Test Incident",
         "service": "test-service",
@@ -42,3 +93,248 @@ def test_webhook_incident_valid(client):
     
     # Will return 401 if signature doesn't match
     assert response.status_code in [200, 401]
+    if response.status_code == 200:
+        incident_id = response.json()["incident_id"]
+        # Announced and queued through the app-wide Redis connection
+        assert fake_redis.published == [incident_id]
+        assert fake_redis.jobs() == [("process_incident", {"incident_id": incident_id})]
+
+def test_webhook_incident_batch(client, fake_redis):
+    payloads = [
+        {"title": "Disk full", "service": "db", "error_type": "disk", "severity": "critical"},
+        {"title": "Bad severity", "service": "api", "severity": "apocalyptic"},
+        {"title": "Slow queries", "service": "db", "error_type": "latency"}
+    ]
+    payload_str = json.dumps(payloads)
+    
+    response = client.post(
+        "/api/v1/webhooks/incident/batch",
+        content=payload_str,
+        headers={
+            "X-Webhook-Signature": create_test_signature(payload_str),
+            "Content-Type": "application/json"
+        }
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["received"] == 2
+    assert data["rejected"] == 1
+    assert [r["status"] for r in data["results"]] == ["received", "rejected", "received"]
+    
+    ids = [r["incident_id"] for r in data["results"] if r["status"] == "received"]
+    assert fake_redis.published == ids
+    assert fake_redis.jobs() == [
+        ("process_incident", {"incident_id": incident_id}) for incident_id in ids
+    ]
+    
+    db = TestingSessionLocal()
+    try:
+        titles = [db.get(Incident, incident_id).title for incident_id in ids]
+    finally:
+        db.close()
+    assert titles == ["Disk full", "Slow queries"]
+
+def test_webhook_incident_batch_ndjson(client):
+    lines = [
+        json.dumps({"title": "Pod crashloop", "service": "worker"}),
+        json.dumps({"title": "OOM killed", "service": "worker"})
+    ]
+    payload_str = "\n".join(lines)
+    
+    response = client.post(
+        "/api/v1/webhooks/incident/batch",
+        content=payload_str,
+        headers={
+            "X-Webhook-Signature": create_test_signature(payload_str),
+            "Content-Type": "application/x-ndjson"
+        }
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["received"] == 2
+
+def test_webhook_incident_batch_invalid_signature(client):
+    response = client.post(
+        "/api/v1/webhooks/incident/batch",
+        content="[]",
+        headers={"X-Webhook-Signature": "sha256=bogus"}
+    )
+    assert response.status_code == 401
+
+def test_fingerprint_ignores_volatile_values():
+    first = DeduplicationService.fingerprint(
+        "api", "timeout", "Request 4411 timed out", "at handler (app.py:120) 0x7f3a"
+    )
+    repeat = DeduplicationService.fingerprint(
+        "api", "timeout", "Request 9812 timed out", "at handler (app.py:131) 0x7f9c"
+    )
+    other = DeduplicationService.fingerprint(
+        "billing", "timeout", "Request 4411 timed out", "at handler (app.py:120) 0x7f3a"
+    )
+    assert first == repeat
+    assert first != other
+
+def test_webhook_batch_coalesces_repeats(client):
+    alert = {"title": "Error rate 12% on /checkout", "service": "checkout", "error_type": "5xx"}
+    repeat = {**alert, "title": "Error rate 17% on /checkout"}
+    
+    def post(payloads):
+        payload_str = json.dumps(payloads)
+        return client.post(
+            "/api/v1/webhooks/incident/batch",
+            content=payload_str,
+            headers={"X-Webhook-Signature": create_test_signature(payload_str)}
+        ).json()
+    
+    first = post([alert, repeat])
+    assert first["received"] == 1
+    assert first["deduplicated"] == 1
+    incident_id = first["results"][0]["incident_id"]
+    assert first["results"][1] == {"index": 1, "status": "deduplicated", "incident_id": incident_id}
+    
+    second = post([repeat])
+    assert second["received"] == 0
+    assert second["results"][0]["incident_id"] == incident_id
+    
+    db = TestingSessionLocal()
+    try:
+        assert db.query(Incident).count() == 1
+        assert db.get(Incident, incident_id).occurrence_count == 3
+    finally:
+        db.close()
+
+def test_dedup_falls_back_to_the_database_when_redis_is_down(client):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    redis_service = RedisService()
+    redis_service.client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    dedup = DeduplicationService(redis_service)
+    fingerprint = dedup.fingerprint("checkout", "5xx", "Error rate 12% on /checkout")
+    
+    db = TestingSessionLocal()
+    try:
+        incident = Incident(title="Error rate 12% on /checkout", service_name="checkout", fingerprint=fingerprint)
+        db.add(incident)
+        db.commit()
+        incident_id = incident.id
+    finally:
+        db.close()
+    
+    async def scenario():
+        async with AsyncTestingSessionLocal() as db:
+            duplicate = await dedup.find_duplicate(db, fingerprint)
+            await dedup.remember({fingerprint: incident_id})
+            return duplicate.id
+    
+    assert asyncio.run(scenario()) == incident_id
+
+def test_incident_survives_a_failed_enqueue_and_is_queued_later(client, fake_redis):
+    payload_str = json.dumps({"title": "Disk full", "service": "db", "error_type": "disk"})
+    headers = {"X-Webhook-Signature": create_test_signature(payload_str)}
+    
+    fake_redis.server.connected = False
+    response = client.post("/api/v1/webhooks/incident", content=payload_str, headers=headers)
+    assert response.status_code == 200
+    incident_id = response.json()["incident_id"]
+    
+    fake_redis.server.connected = True
+    assert fake_redis.jobs() == []
+    db = TestingSessionLocal()
+    try:
+        incident = db.get(Incident, incident_id)
+        assert incident.queued_at is None
+        # Past the grace period the request queueing it would have had
+        incident.detected_at = datetime.utcnow() - timedelta(seconds=settings.JOB_DISPATCH_GRACE_SECONDS + 1)
+        db.commit()
+    finally:
+        db.close()
+    
+    # A repeat alert coalesces into the incident and queues its missing job
+    response = client.post("/api/v1/webhooks/incident", content=payload_str, headers=headers)
+    assert response.json()["status"] == "deduplicated"
+    assert fake_redis.jobs() == [("process_incident", {"incident_id": incident_id})]
+    
+    async def sweep():
+        async with AsyncTestingSessionLocal() as db:
+            return await DispatchService.queue_unqueued(db, fake_redis)
+    
+    # Already queued, so the sweep leaves it alone
+    assert asyncio.run(sweep()) == 0
+    
+    db = TestingSessionLocal()
+    try:
+        assert db.get(Incident, incident_id).queued_at is not None
+    finally:
+        db.close()
+
+def test_dispatch_sweep_queues_incidents_without_a_job(client, fake_redis):
+    old = datetime.utcnow() - timedelta(seconds=settings.JOB_DISPATCH_GRACE_SECONDS + 1)
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Incident(title="Unqueued", detected_at=old),
+            Incident(title="Just created", detected_at=datetime.utcnow()),
+            Incident(title="Queued", detected_at=old, queued_at=old)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    
+    async def sweep():
+        async with AsyncTestingSessionLocal() as db:
+            return await DispatchService.queue_unqueued(db, fake_redis)
+    
+    fake_redis.server.connected = False
+    with pytest.raises(RedisError):
+        asyncio.run(sweep())
+    fake_redis.server.connected = True
+    # The failed attempt released its claim
+    assert asyncio.run(sweep()) == 1
+    assert asyncio.run(sweep()) == 0
+    assert fake_redis.jobs() == [("process_incident", {"incident_id": 1})]
+
+def test_ingest_degrades_when_redis_is_down(client, fake_redis, monkeypatch):
+    ran_locally = []
+    
+    async def record(payload, redis_service=None):
+        ran_locally.append(payload["service"])
+    
+    monkeypatch.setattr(IncidentProcessor, "create_from_logs", record)
+    monkeypatch.setattr(IncidentProcessor, "create_from_metrics", record)
+    fake_redis.server.connected = False
+    
+    incident = json.dumps({"title": "Disk full", "service": "db"})
+    batch = json.dumps([{"title": "Slow queries", "service": "db"}])
+    for path, body in (("incident", incident), ("incident/batch", batch)):
+        response = client.post(
+            f"/api/v1/webhooks/{path}",
+            content=body,
+            headers={"X-Webhook-Signature": create_test_signature(body)}
+        )
+        assert response.status_code == 200
+    
+    assert client.post("/api/v1/webhooks/logs", json={"service": "api", "level": "error"}).status_code == 200
+    assert client.post("/api/v1/webhooks/metrics", json={"service": "cache", "value": 120}).status_code == 200
+    # Log and metric jobs ran in-process instead of on the worker pool
+    assert ran_locally == ["api", "cache"]
+
+def test_kestra_callback_needs_its_own_secret(client, monkeypatch):
+    from app.services.kestra_service import execution_tracker
+    
+    completed = []
+    
+    async def publish_completion(execution):
+        completed.append(execution["id"])
+    
+    monkeypatch.setattr(execution_tracker, "publish_completion", publish_completion)
+    body = {"execution_id": "exec-1", "state": "SUCCESS"}
+    url = "/api/v1/webhooks/kestra/execution"
+    
+    # Disabled until a callback secret is configured
+    assert client.post(url, json=body, headers={"X-Callback-Secret": ""}).status_code == 401
+    
+    monkeypatch.setattr(settings, "KESTRA_CALLBACK_SECRET", "callback-secret")
+    assert client.post(url, json=body, headers={"X-Callback-Secret": "test-secret"}).status_code == 401
+    assert client.post(url, json=body, headers={"X-Callback-Secret": "callback-secret"}).status_code == 200
+    assert completed == ["exec-1"]
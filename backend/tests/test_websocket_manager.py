@@ -0,0 +1,177 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.websocket_manager import ConnectionManager, event_topics, parse_topic
+
+class FakeWebSocket:
+    def __init__(self, fail: bool = False, delay: float = 0.0):
+        self.sent = []
+        self.fail = fail
+        self.delay = delay
+        self.closed = None
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+    
+    async def close(self, code: int = 1000):
+        self.closed = code
+
+async def connected(manager: ConnectionManager, *subscriptions) -> list:
+    clients = []
+    for topics in subscriptions:
+        websocket = FakeWebSocket()
+        await manager.connect(websocket)
+        await manager.handle_message(websocket, json.dumps({"action": "subscribe", "topics": topics}))
+        clients.append(websocket)
+    await manager.flush()
+    for websocket in clients:
+        websocket.sent.clear()
+    return clients
+
+def test_parse_topic_normalizes_and_rejects():
+    assert parse_topic("incident:042") == "incident:42"
+    assert parse_topic("severity:CRITICAL") == "severity:critical"
+    assert parse_topic("service:checkout") == "service:checkout"
+    for bad in ("incident:abc", "severity:urgent", "team:sre", "service:", 7):
+        try:
+            parse_topic(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} should be rejected")
+
+def test_events_reach_only_subscribed_clients():
+    async def scenario():
+        manager = ConnectionManager()
+        dashboard, watcher, checkout, critical, idle = await connected(
+            manager, ["*"], ["incident:7"], ["service:checkout"], ["severity:critical"], []
+        )
+        
+        event = {"incident_id": 7, "service_name": "checkout", "severity": "high", "status": "analyzing"}
+        assert event_topics(event) == ["*", "incident:7", "service:checkout", "severity:high"]
+        assert await manager.publish(event) == 3
+        await manager.flush()
+        
+        assert dashboard.sent == watcher.sent == checkout.sent == [event]
+        assert critical.sent == idle.sent == []
+    
+    asyncio.run(scenario())
+
+def test_unsubscribe_and_disconnect_leave_no_index_entries():
+    async def scenario():
+        manager = ConnectionManager()
+        first, second = await connected(manager, ["incident:1", "incident:2"], ["incident:2"])
+        
+        await manager.handle_message(first, json.dumps({"action": "unsubscribe", "topics": ["incident:1"]}))
+        await manager.flush()
+        assert first.sent == [{"type": "subscriptions", "topics": ["incident:2"]}]
+        assert await manager.publish({"incident_id": 1}) == 0
+        
+        manager.disconnect(first)
+        manager.disconnect(second)
+        assert manager.subscribers == {} and manager.active_connections == set()
+    
+    asyncio.run(scenario())
+
+def test_invalid_requests_get_an_error_reply():
+    async def scenario():
+        manager = ConnectionManager()
+        websocket, = await connected(manager, [])
+        
+        for request in ("not json", {"action": "watch", "topics": []}, {"action": "subscribe", "topics": ["incident:x"]}):
+            text = request if isinstance(request, str) else json.dumps(request)
+            await manager.handle_message(websocket, text)
+        await manager.flush()
+        assert [reply["type"] for reply in websocket.sent] == ["error"] * 3
+        assert manager.subscribers == {}
+    
+    asyncio.run(scenario())
+
+def test_failed_clients_are_dropped():
+    async def scenario():
+        manager = ConnectionManager()
+        healthy, = await connected(manager, ["*"])
+        broken = FakeWebSocket(fail=True)
+        await manager.connect(broken)
+        manager.subscribe(broken, ["*"])
+        
+        await manager.publish({"incident_id": 3})
+        await manager.flush()
+        assert healthy.sent == [{"incident_id": 3}]
+        assert broken not in manager.clients and manager.subscribers["*"] == {healthy}
+    
+    asyncio.run(scenario())
+
+def test_slow_client_does_not_delay_the_others(monkeypatch):
+    monkeypatch.setattr("app.services.websocket_manager.settings.WS_SEND_QUEUE_SIZE", 3)
+    monkeypatch.setattr("app.services.websocket_manager.settings.WS_SLOW_CLIENT_POLICY", "coalesce")
+    
+    async def scenario():
+        manager = ConnectionManager()
+        fast, slow = await connected(manager, ["*"], ["*"])
+        slow.delay = 0.2
+        
+        for n in range(10):
+            await manager.publish({"incident_id": n})
+            await asyncio.sleep(0.001)
+        # The fast client has everything while the slow one is still on its first message
+        assert [m["incident_id"] for m in fast.sent] == list(range(10))
+        assert slow.sent == []
+        
+        await manager.flush()
+        # The slow client got the first message plus the newest ones that fit its queue
+        assert [m["incident_id"] for m in slow.sent] == [0, 7, 8, 9]
+        assert manager.clients[slow].dropped == 6
+    
+    asyncio.run(scenario())
+
+def test_evict_policy_disconnects_clients_that_fall_behind(monkeypatch):
+    monkeypatch.setattr("app.services.websocket_manager.settings.WS_SEND_QUEUE_SIZE", 2)
+    monkeypatch.setattr("app.services.websocket_manager.settings.WS_SLOW_CLIENT_POLICY", "evict")
+    
+    async def scenario():
+        manager = ConnectionManager()
+        fast, slow = await connected(manager, ["*"], ["*"])
+        slow.delay = 0.2
+        
+        delivered = []
+        for n in range(5):
+            delivered.append(await manager.publish({"incident_id": n}))
+            await asyncio.sleep(0.001)
+        assert delivered == [2, 2, 2, 1, 1]
+        await manager.flush()
+        await asyncio.sleep(0)
+        assert slow not in manager.clients and slow.closed == 1013
+        assert len(fast.sent) == 5
+    
+    asyncio.run(scenario())
+
+def test_stalled_client_is_evicted_on_the_next_message(monkeypatch):
+    monkeypatch.setattr("app.services.websocket_manager.settings.WS_SEND_TIMEOUT_SECONDS", 0.05)
+    
+    async def scenario():
+        manager = ConnectionManager()
+        healthy, stalled = await connected(manager, ["*"], ["*"])
+        stalled.delay = 60
+        
+        assert await manager.publish({"incident_id": 1}) == 2
+        await asyncio.sleep(0.1)
+        assert await manager.publish({"incident_id": 2}) == 1
+        await asyncio.sleep(0.01)
+        assert stalled not in manager.clients and stalled.closed == 1013
+        await manager.flush()
+        assert [m["incident_id"] for m in healthy.sent] == [1, 2]
+    
+    asyncio.run(scenario())
+
+def test_ws_endpoint_acknowledges_subscriptions():
+    with TestClient(app).websocket_connect("/ws") as websocket:
+        websocket.send_text(json.dumps({"action": "subscribe", "topics": ["*", "incident:5"]}))
+        assert websocket.receive_json() == {"type": "subscriptions", "topics": ["*", "incident:5"]}
@@ -119,14 +119,21 @@ export default function Home() {
 
       websocket.onopen = () => {
         console.log('WebSocket connected');
+        // The dashboard follows every incident
+        websocket.send(JSON.stringify({ action: 'subscribe', topics: ['*'] }));
       };
 
       websocket.onmessage = (event) => {
         const data = JSON.parse(event.data);
         console.log('Real-time update:', data);
         
-        // Refresh data when new incident arrives
-        if (data.incident_id) {
+        // Streamed analysis fragments arrive many times per second; only the final result refetches
+        if (data.partial) {
+          return;
+        }
+
+        // Refresh data when new incident arrives, or when the server may have missed some
+        if (data.incident_id || data.type === 'resync') {
           fetchDashboardData();
         }
       };
@@ -24,6 +24,21 @@ export const incidentApi = {
     return response.data;
   },
 
+  // Get one page of incidents; pass nextCursor back to get the following page
+  getIncidentPage: async (params?: {
+    status?: string;
+    severity?: string;
+    service?: string;
+    limit?: number;
+    cursor?: string;
+  }): Promise<{ incidents: Incident[]; nextCursor: string | null }> => {
+    const response = await api.get('/incidents', { params });
+    return {
+      incidents: response.data,
+      nextCursor: response.headers['x-next-cursor'] ?? null,
+    };
+  },
+
   // Get incident by ID
   getIncident: async (id: number): Promise<Incident> => {
     const response = await api.get(`/incidents/${id}`);
@@ -4,6 +4,8 @@ type MessageHandler = (data: any) => void;
 class WebSocketManager {
   private ws: WebSocket | null = null;
   private handlers: MessageHandler[] = [];
+  // Topics ("*", "incident:<id>", "service:<name>", "severity:<level>"), re-sent on reconnect
+  private topics: Set<string> = new Set();
   private reconnectInterval: number = 5000;
   private reconnectTimer: NodeJS.Timeout | null = null;
 
@@ -17,6 +19,9 @@ class WebSocketManager {
           clearTimeout(this.reconnectTimer);
           this.reconnectTimer = null;
         }
+        if (this.topics.size > 0) {
+          this.send({ action: 'subscribe', topics: Array.from(this.topics) });
+        }
       };
 
       this.ws.onmessage = (event) => {
@@ -51,6 +56,22 @@ class WebSocketManager {
     }
   }
 
+  subscribeTopics(topics: string[]) {
+    topics.forEach(topic => this.topics.add(topic));
+    this.send({ action: 'subscribe', topics });
+  }
+
+  unsubscribeTopics(topics: string[]) {
+    topics.forEach(topic => this.topics.delete(topic));
+    this.send({ action: 'unsubscribe', topics });
+  }
+
+  private send(message: object) {
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify(message));
+    }
+  }
+
   subscribe(handler: MessageHandler) {
     this.handlers.push(handler);
     return () => {